@@ -0,0 +1,99 @@
+"""
+In-memory bitmap index of citizen attributes.
+
+For every eye colour, state of life, company and tag there's a Bitmap of
+ids of citizens having it, so filters on these attributes are intersections
+of bitmaps instead of joins. The index is cached for the current dataset
+generation, like the friend graph.
+"""
+from array import array
+from collections import defaultdict
+from typing import Dict, Optional
+from uuid import UUID
+
+from citizens.bitmaps import Bitmap
+from citizens.generations import GenerationCache
+from citizens.models import Citizen, Tag
+
+
+class AttributeIndex:
+
+    def __init__(self, generation: UUID, eye_colors: Dict[str, Bitmap],
+                 has_died: Dict[bool, Bitmap], companies: Dict[int, Bitmap],
+                 tags: Dict[str, Bitmap]):
+        self.generation = generation
+        self.eye_colors = eye_colors
+        self.has_died = has_died
+        self.companies = companies
+        self.tags = tags
+
+    @classmethod
+    def build(cls, generation: UUID) -> 'AttributeIndex':
+        """Load the index from the database."""
+        eye_colors = defaultdict(lambda: array('i'))
+        has_died = defaultdict(lambda: array('i'))
+        companies = defaultdict(lambda: array('i'))
+        citizens = Citizen.objects.order_by('id').values_list(
+            'id', 'eye_color__color_name', 'has_died', 'company_id'
+        )
+        for citizen_id, eye_color, citizen_has_died, company_id \
+                in citizens.iterator():
+            eye_colors[eye_color].append(citizen_id)
+            has_died[citizen_has_died].append(citizen_id)
+            if company_id is not None:
+                companies[company_id].append(citizen_id)
+
+        tag_names = dict(Tag.objects.values_list('id', 'name'))
+        tags = defaultdict(lambda: array('i'))
+        taggings = Citizen.tags.through.objects \
+            .order_by('citizen_id') \
+            .values_list('tag_id', 'citizen_id')
+        for tag_id, citizen_id in taggings.iterator():
+            tags[tag_names[tag_id]].append(citizen_id)
+
+        return cls(
+            generation,
+            eye_colors=_to_bitmaps(eye_colors),
+            has_died=_to_bitmaps(has_died),
+            companies=_to_bitmaps(companies),
+            tags=_to_bitmaps(tags),
+        )
+
+    def with_eye_color(self, eye_color: str) -> Bitmap:
+        return self.eye_colors.get(eye_color, Bitmap())
+
+    def with_has_died(self, has_died: bool) -> Bitmap:
+        return self.has_died.get(has_died, Bitmap())
+
+    def in_company(self, company_id: int) -> Bitmap:
+        return self.companies.get(company_id, Bitmap())
+
+    def with_tag(self, tag: str) -> Bitmap:
+        return self.tags.get(tag, Bitmap())
+
+    def memory_usage(self) -> dict:
+        """Bytes taken by bitmaps of every attribute."""
+        usage = {
+            attribute: sum(bitmap.nbytes for bitmap in bitmaps.values())
+            for attribute, bitmaps in [
+                ('eye_colors', self.eye_colors),
+                ('has_died', self.has_died),
+                ('companies', self.companies),
+                ('tags', self.tags),
+            ]
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
+
+def _to_bitmaps(ids_by_value: Dict) -> Dict:
+    return {value: Bitmap.from_sorted(ids)
+            for value, ids in ids_by_value.items()}
+
+
+_indexes = GenerationCache(AttributeIndex.build)
+
+
+def get_attribute_index(generation: Optional[UUID] = None) -> AttributeIndex:
+    """The index of the current dataset generation, built if needed."""
+    return _indexes.get(generation)
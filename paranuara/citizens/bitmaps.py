@@ -0,0 +1,159 @@
+"""
+Compressed bitmaps of citizen ids.
+
+Bitmaps follow the layout of roaring bitmaps: ids are split by their high
+16 bits into containers of up to 65536 ids, and every container is stored
+either as a sorted array of the low 16 bits, while it has few members, or
+as a plain 8 kB bitmap once it's dense. Sparse sets like employees of a
+company take 2 bytes per member and dense sets like all living citizens
+take a bit per citizen, while intersections of dense containers are done
+on whole containers at once.
+"""
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, Sequence, Union
+
+CONTAINER_BITS = 16
+LOW_BITS_MASK = (1 << CONTAINER_BITS) - 1
+BITMAP_CONTAINER_BYTES = (1 << CONTAINER_BITS) // 8
+# Containers with more members take less memory as bitmaps.
+ARRAY_CONTAINER_LIMIT = BITMAP_CONTAINER_BYTES // 2
+
+Container = Union[array, bytes]
+
+# Bits set in every possible byte, for iterating over bitmap containers.
+_BYTE_BITS = [
+    [bit for bit in range(8) if byte & 1 << bit] for byte in range(256)
+]
+
+
+class Bitmap:
+    """Immutable set of non-negative integers."""
+
+    __slots__ = ('_containers',)
+
+    def __init__(self, containers: Dict[int, Container] = None):
+        self._containers = containers or {}
+
+    @classmethod
+    def from_sorted(cls, values: Sequence[int]) -> 'Bitmap':
+        """Build a bitmap of unique values sorted in ascending order."""
+        containers = {}
+        start = 0
+        while start < len(values):
+            key = values[start] >> CONTAINER_BITS
+            end = bisect_left(values, (key + 1) << CONTAINER_BITS, start)
+            containers[key] = _compact(
+                _get_low_bits(values[start:end], key << CONTAINER_BITS)
+            )
+            start = end
+        return cls(containers)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the containers of the bitmap."""
+        return sum(
+            len(container) * container.itemsize
+            if isinstance(container, array) else len(container)
+            for container in self._containers.values()
+        )
+
+    def __and__(self, other: 'Bitmap') -> 'Bitmap':
+        if len(self._containers) > len(other._containers):
+            self, other = other, self
+        containers = {}
+        for key, container in self._containers.items():
+            other_container = other._containers.get(key)
+            if other_container is None:
+                continue
+            common = _intersect(container, other_container)
+            if common:
+                containers[key] = common
+        return Bitmap(containers)
+
+    def __contains__(self, value: int) -> bool:
+        container = self._containers.get(value >> CONTAINER_BITS)
+        if container is None:
+            return False
+        low_bits = value & LOW_BITS_MASK
+        if isinstance(container, array):
+            position = bisect_left(container, low_bits)
+            return position < len(container) \
+                and container[position] == low_bits
+        return bool(container[low_bits >> 3] & 1 << (low_bits & 7))
+
+    def __iter__(self) -> Iterator[int]:
+        for key in sorted(self._containers):
+            base = key << CONTAINER_BITS
+            for low_bits in _as_array(self._containers[key]):
+                yield base + low_bits
+
+    def __len__(self) -> int:
+        return sum(
+            len(container) if isinstance(container, array)
+            else _count_bits(container)
+            for container in self._containers.values()
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self._containers)
+
+    def __repr__(self):
+        return f'Bitmap({list(self)})'
+
+
+def _get_low_bits(values: Sequence[int], base: int) -> array:
+    if isinstance(values, array) and values.itemsize == 4 \
+            and sys.byteorder == 'little':
+        # Low halves of little endian 32 bit values, without a Python level
+        # operation per value.
+        halves = array('H', values.tobytes())
+        return halves[::2]
+    return array('H', map(base.__rsub__, values))
+
+
+def _compact(low_bits: array) -> Container:
+    if len(low_bits) <= ARRAY_CONTAINER_LIMIT:
+        return low_bits
+    bitmap = bytearray(BITMAP_CONTAINER_BYTES)
+    for value in low_bits:
+        bitmap[value >> 3] |= 1 << (value & 7)
+    return bytes(bitmap)
+
+
+def _as_array(container: Container) -> array:
+    if isinstance(container, array):
+        return container
+    return array('H', [
+        byte_index * 8 + bit
+        for byte_index, byte in enumerate(container) if byte
+        for bit in _BYTE_BITS[byte]
+    ])
+
+
+def _count_bits(bitmap: bytes) -> int:
+    return bin(int.from_bytes(bitmap, 'little')).count('1')
+
+
+def _intersect(a: Container, b: Container) -> Container:
+    """Intersection of two containers, empty if there are no common bits."""
+    if isinstance(a, array) and isinstance(b, array):
+        if len(a) > len(b):
+            a, b = b, a
+        return array('H', sorted(set(a).intersection(b)))
+
+    if isinstance(a, array) or isinstance(b, array):
+        values, bitmap = (a, b) if isinstance(a, array) else (b, a)
+        return array('H', [
+            value for value in values
+            if bitmap[value >> 3] & 1 << (value & 7)
+        ])
+
+    common = int.from_bytes(a, 'little') & int.from_bytes(b, 'little')
+    if not common:
+        return b''
+    bitmap = common.to_bytes(BITMAP_CONTAINER_BYTES, 'little')
+    if bin(common).count('1') > ARRAY_CONTAINER_LIMIT:
+        return bitmap
+    return _as_array(bitmap)
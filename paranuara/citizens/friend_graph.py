@@ -0,0 +1,217 @@
+"""
+In-memory graph of friendships between citizens.
+
+Friendships are kept in compressed sparse row (CSR) arrays. Citizens are
+numbered by rows in the order of their ids and friends of the citizen in
+row r are the rows friends[offsets[r]:offsets[r + 1]], sorted. That's
+4 bytes per friendship and 12 bytes per citizen. Attributes of citizens
+friends are filtered on are in the attribute index.
+
+The graph is cached for the current dataset generation (see generations),
+so relationship queries don't touch the friends table at all.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from citizens.bitmaps import Bitmap
+from citizens.generations import GenerationCache
+from citizens.models import Citizen
+
+# Rows of citizens and friends are 32 bit like Citizen ids.
+ROW_TYPECODE = 'i'
+OFFSET_TYPECODE = 'q'
+
+# Minimal ratio of lengths of friend lists intersected by galloping.
+GALLOPING_RATIO = 32
+
+
+class FriendGraph:
+
+    def __init__(self, generation: UUID, ids: array, offsets: array,
+                 friends: array):
+        self.generation = generation
+        self.ids = ids
+        self.offsets = offsets
+        self.friends = friends
+        # Ids are usually consecutive, which turns the lookup of rows into
+        # a subtraction instead of a binary search.
+        self._first_id = ids[0] if ids else 0
+        self._dense = not ids or ids[-1] - ids[0] == len(ids) - 1
+
+    @classmethod
+    def build(cls, generation: UUID) -> 'FriendGraph':
+        """Load the graph from the database."""
+        ids = array(ROW_TYPECODE, Citizen.objects.order_by('id')
+                    .values_list('id', flat=True).iterator())
+        graph = cls(generation, ids, array(OFFSET_TYPECODE, [0]),
+                    array(ROW_TYPECODE))
+
+        friendships = Citizen.friends.through.objects \
+            .order_by('from_citizen_id', 'to_citizen_id') \
+            .values_list('from_citizen_id', 'to_citizen_id')
+        row = 0
+        for citizen_id, friend_id in friendships.iterator():
+            citizen_row = graph.get_row(citizen_id)
+            friend_row = graph.get_row(friend_id)
+            # Citizens imported after they were loaded above belong to the
+            # next generation.
+            if citizen_row is None or friend_row is None:
+                continue
+            while row < citizen_row:
+                graph.offsets.append(len(graph.friends))
+                row += 1
+            graph.friends.append(friend_row)
+        while row < len(ids):
+            graph.offsets.append(len(graph.friends))
+            row += 1
+        return graph
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the arrays of the graph."""
+        return sum(
+            len(values) * values.itemsize
+            for values in [self.ids, self.offsets, self.friends]
+        )
+
+    def get_row(self, citizen_id: int) -> Optional[int]:
+        if self._dense:
+            row = citizen_id - self._first_id
+            return row if 0 <= row < len(self.ids) else None
+        row = bisect_left(self.ids, citizen_id)
+        if row < len(self.ids) and self.ids[row] == citizen_id:
+            return row
+        return None
+
+    def get_friend_ids(self, citizen_id: int) -> Sequence[int]:
+        """Ids of friends of the citizen in ascending order."""
+        row = self.get_row(citizen_id)
+        if row is None:
+            return []
+        return self._get_ids(
+            self.friends[self.offsets[row]:self.offsets[row + 1]]
+        )
+
+    def get_friend_bitmap(self, citizen_id: int) -> Bitmap:
+        return Bitmap.from_sorted(self.get_friend_ids(citizen_id))
+
+    def get_common_friend_ids(self,
+                              citizen_ids: Sequence[int]) -> Sequence[int]:
+        """
+        Ids of friends common to all the citizens, in ascending order.
+
+        Friend lists are intersected starting from the shortest one and
+        the intersection stops as soon as nothing is left, so its cost
+        depends on the shortest friend list rather than on all of them.
+        """
+        rows = []
+        for citizen_id in citizen_ids:
+            row = self.get_row(citizen_id)
+            if row is None:
+                return []
+            rows.append(row)
+        if not rows:
+            return []
+
+        rows.sort(key=lambda row: self.offsets[row + 1] - self.offsets[row])
+        common = self.friends[self.offsets[rows[0]]:self.offsets[rows[0] + 1]]
+        for row in rows[1:]:
+            if not common:
+                break
+            common = intersect_sorted(common, self.friends,
+                                      self.offsets[row], self.offsets[row + 1])
+        return self._get_ids(common)
+
+    def iter_common_friend_counts(
+            self, citizen_ids: Iterable[int],
+            friends_filter: Optional[Bitmap] = None
+    ) -> Iterator[Tuple[int, int, int]]:
+        """
+        Numbers of common friends of every pair of the citizens, as
+        (citizen_a_id, citizen_b_id, count) with citizen_a_id < citizen_b_id,
+        ordered by ids. Pairs without common friends are left out and only
+        friends in friends_filter are counted, if given.
+
+        That's the product of the citizens' rows of the adjacency matrix
+        with its transpose. Its columns are inverted first into lists of
+        citizens having each friend, so every row of the product only adds
+        up the lists of its friends, and rows are produced one at a time
+        without ever holding the whole matrix.
+        """
+        citizen_ids = sorted(set(citizen_ids))
+        friends_of = {}
+        citizens_with_friend = defaultdict(list)
+        for citizen_id in citizen_ids:
+            friend_ids = self.get_friend_ids(citizen_id)
+            if friends_filter is not None:
+                friend_ids = list(Bitmap.from_sorted(friend_ids)
+                                  & friends_filter)
+            friends_of[citizen_id] = friend_ids
+            for friend_id in friend_ids:
+                citizens_with_friend[friend_id].append(citizen_id)
+
+        for citizen_id in citizen_ids:
+            counts = Counter()
+            for friend_id in friends_of[citizen_id]:
+                citizens = citizens_with_friend[friend_id]
+                # Citizens are in ascending order, so only pairs with
+                # greater ids are counted.
+                counts.update(
+                    islice(citizens, bisect_right(citizens, citizen_id), None)
+                )
+            for other_citizen_id in sorted(counts):
+                yield citizen_id, other_citizen_id, counts[other_citizen_id]
+
+    def _get_ids(self, rows: Sequence[int]) -> Sequence[int]:
+        if not self._dense:
+            return [self.ids[row] for row in rows]
+        if self._first_id == 0:
+            return rows
+        return array(ROW_TYPECODE, map(self._first_id.__add__, rows))
+
+
+_graphs = GenerationCache(FriendGraph.build)
+
+
+def get_friend_graph(generation: Optional[UUID] = None) -> FriendGraph:
+    """The graph of the current dataset generation, built if needed."""
+    return _graphs.get(generation)
+
+
+def intersect_sorted(shorter: Sequence[int], values: array, start: int,
+                     end: int) -> List[int]:
+    """
+    Values of the sorted shorter sequence that are also in the sorted range
+    values[start:end].
+
+    When the range is much longer, each value is searched for in it by
+    galloping: steps from the previous match double until they overshoot
+    the value and the last step is bisected. That's O(m log(n / m)) for
+    m values and a range of n, so a citizen with a handful of friends is
+    intersected with one with thousands in a few comparisons. Sequences of
+    similar length are intersected in linear time, which is done by sets
+    since they run in C.
+    """
+    if len(shorter) * GALLOPING_RATIO >= end - start:
+        return sorted(set(shorter).intersection(values[start:end]))
+
+    common = []
+    position = start
+    for value in shorter:
+        step = 1
+        bound = position
+        while bound < end and values[bound] < value:
+            position = bound + 1
+            bound += step
+            step *= 2
+        position = bisect_left(values, value, position, min(bound, end))
+        if position == end:
+            break
+        if values[position] == value:
+            common.append(value)
+            position += 1
+    return common
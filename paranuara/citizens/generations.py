@@ -0,0 +1,140 @@
+"""
+In-memory structures derived from a generation of the dataset.
+
+Structures are built from the database when they're first needed and
+rebuilt once the DatasetGeneration changes, i.e. after an import, purge or
+swap of the dataset. Rebuilds run in a background thread while requests
+keep getting the structure of the previous generation, so no request waits
+for them. Only the very first build, with nothing to serve yet, is waited
+for.
+
+Responses built from a previous generation mustn't be cached as responses
+of the current one, which is what track_previous_generations() is for.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Generic, Iterator, Optional, TypeVar
+from uuid import UUID
+
+from django.db import connection
+
+from citizens.models import DatasetGeneration
+from citizens.single_flight import SingleFlight
+
+T = TypeVar('T')
+
+logger = logging.getLogger(__name__)
+
+# Every GenerationCache, so they can be cleared at once.
+_caches = []
+
+_tracking = threading.local()
+
+
+class PreviousGenerationUse:
+    """Whether a previous generation was served within a tracked block."""
+
+    def __init__(self):
+        self.used = False
+
+
+@contextmanager
+def track_previous_generations() -> Iterator[PreviousGenerationUse]:
+    """
+    Track whether structures of a previous generation are served to this
+    thread while their rebuild runs.
+    """
+    tracker = _tracking.tracker = PreviousGenerationUse()
+    try:
+        yield tracker
+    finally:
+        _tracking.tracker = None
+
+
+class GenerationCache(Generic[T]):
+    """Holder of a structure built by build() for the current generation."""
+
+    def __init__(self, build: Callable[[UUID], T]):
+        self._build = build
+        # Generation and the structure built for it, replaced together.
+        self._entry = (None, None)
+        self._first_builds = SingleFlight()
+        self._rebuild = None
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def get(self, generation: Optional[UUID] = None) -> T:
+        """
+        The structure of the given generation, the current one by default.
+        Callers needing several structures should look up the generation
+        once and pass it to all of them, so they're consistent.
+
+        While the structure of a new generation is being rebuilt, the one
+        of the previous generation is returned.
+        """
+        if generation is None:
+            generation = DatasetGeneration.current_token()
+
+        built_generation, value = self._entry
+        if built_generation == generation:
+            return value
+        if built_generation is None:
+            return self._first_builds.do(
+                generation, lambda: self._build_entry(generation)
+            )
+
+        self._start_rebuild(generation)
+        tracker = getattr(_tracking, 'tracker', None)
+        if tracker is not None:
+            tracker.used = True
+        return value
+
+    def wait(self):
+        """Wait for the rebuild in progress, if any."""
+        rebuild = self._rebuild
+        if rebuild is not None:
+            rebuild.join()
+
+    def clear(self):
+        """Drop the structure, so the next one is built on first use."""
+        self.wait()
+        self._entry = (None, None)
+
+    def _build_entry(self, generation: UUID) -> T:
+        value = self._build(generation)
+        self._entry = (generation, value)
+        return value
+
+    def _start_rebuild(self, generation: UUID):
+        with self._lock:
+            # Newer generations are picked up once the running rebuild
+            # finishes.
+            if self._rebuild is not None and self._rebuild.is_alive():
+                return
+            self._rebuild = threading.Thread(
+                target=self._run_rebuild, args=(generation,), daemon=True,
+            )
+            self._rebuild.start()
+
+    def _run_rebuild(self, generation: UUID):
+        try:
+            self._build_entry(generation)
+        except Exception:
+            # The rebuild is started again by the next request.
+            logger.exception('Rebuild of generation %s failed', generation)
+        finally:
+            # Threads get their own connections, closed when they're done.
+            connection.close()
+
+
+def wait_for_rebuilds():
+    """Wait for rebuilds in progress of all structures."""
+    for cache in _caches:
+        cache.wait()
+
+
+def clear_generation_caches():
+    """Drop structures of all generations, e.g. between tests."""
+    for cache in _caches:
+        cache.clear()
@@ -0,0 +1,95 @@
+import json
+import os
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from citizens.resources.benchmark import ImportBenchmark, IMPORT_METHODS
+from citizens.resources.importers import DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Benchmark the import of resources and report the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'resources_dir',
+            help="Directory containing people.json and companies.json, "
+                 "e.g. generated by the generate_dataset command.",
+        )
+        parser.add_argument(
+            '--method',
+            action='append',
+            choices=IMPORT_METHODS,
+            dest='methods',
+            help="Import method to benchmark. Can be used multiple times. "
+                 "All methods supported by the database are benchmarked by "
+                 "default.",
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help="Number of processes used to parse people entries.",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of entries written to the database at once.",
+        )
+        parser.add_argument(
+            '--trace-memory',
+            action='store_true',
+            help="Also report peak memory allocated by Python during each "
+                 "stage. Slows down the benchmarked code.",
+        )
+        parser.add_argument(
+            '--output',
+            help="File the JSON results are written into instead of stdout.",
+        )
+        parser.add_argument(
+            '--noinput', '--no-input',
+            action='store_false',
+            dest='interactive',
+            help="Don't ask for a confirmation before purging the database.",
+        )
+
+    def handle(self, **options):
+        methods = options['methods'] or [
+            method for method in IMPORT_METHODS
+            if method != 'copy' or connection.vendor == 'postgresql'
+        ]
+        if 'copy' in methods and connection.vendor != 'postgresql':
+            raise CommandError("copy is only supported on PostgreSQL")
+
+        people_filename = os.path.join(options['resources_dir'],
+                                       'people.json')
+        companies_filename = os.path.join(options['resources_dir'],
+                                          'companies.json')
+        for filename in [people_filename, companies_filename]:
+            if not os.path.isfile(filename):
+                raise CommandError(f"{filename} doesn't exist")
+
+        if options['interactive']:
+            confirm = input(
+                "The benchmark purges all data from the database. "
+                "Type 'yes' to continue: "
+            )
+            if confirm != 'yes':
+                raise CommandError("Benchmark cancelled")
+
+        benchmark = ImportBenchmark(
+            people_filename,
+            companies_filename,
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            trace_memory=options['trace_memory'],
+        )
+        results = json.dumps(benchmark.run(methods), indent=2)
+
+        if options['output']:
+            with open(options['output'], mode='w') as file:
+                file.write(results + '\n')
+        else:
+            self.stdout.write(results)
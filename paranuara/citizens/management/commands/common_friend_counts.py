@@ -0,0 +1,104 @@
+import csv
+import sys
+
+from django.core.management import BaseCommand, CommandError
+
+from citizens.models import Citizen
+from citizens.resources.formats import STDIN_FILENAME
+from citizens.use_cases import get_common_friend_counts
+
+STDOUT_FILENAME = '-'
+
+# Unknown ids listed in the error message at most.
+MAX_REPORTED_IDS = 10
+
+
+class Command(BaseCommand):
+    help = "Count common friends of every pair of citizens in a cohort and " \
+           "write the pairs having some as CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'cohort',
+            help="File with ids of the citizens in the cohort, separated by "
+                 "whitespace or commas, '-' for the standard input.",
+        )
+        parser.add_argument(
+            '--eye-color',
+            help="Only count friends with this eye colour.",
+        )
+        state_of_life = parser.add_mutually_exclusive_group()
+        state_of_life.add_argument(
+            '--alive',
+            action='store_true',
+            help="Only count friends that are alive.",
+        )
+        state_of_life.add_argument(
+            '--dead',
+            action='store_true',
+            help="Only count friends that have died.",
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            help="Only write this many pairs with most common friends, in "
+                 "descending order of the count. By default every pair is "
+                 "written in order of ids.",
+        )
+        parser.add_argument(
+            '--output',
+            default=STDOUT_FILENAME,
+            help="File the CSV is written into, '-' for the standard output.",
+        )
+
+    def handle(self, **options):
+        if options['top'] is not None and options['top'] < 1:
+            raise CommandError("--top must be positive")
+
+        citizen_ids = self._read_cohort(options['cohort'])
+        if len(citizen_ids) < 2:
+            raise CommandError("The cohort needs at least two citizens")
+        unknown_ids = citizen_ids.difference(
+            Citizen.objects.filter(id__in=citizen_ids)
+            .values_list('id', flat=True)
+        )
+        if unknown_ids:
+            raise CommandError(
+                f"Unknown citizen ids: "
+                f"{', '.join(map(str, sorted(unknown_ids)[:MAX_REPORTED_IDS]))}"
+                + (" ..." if len(unknown_ids) > MAX_REPORTED_IDS else "")
+            )
+
+        has_died = True if options['dead'] else \
+            False if options['alive'] else None
+        counts = get_common_friend_counts(
+            citizen_ids, eye_color=options['eye_color'], has_died=has_died,
+            top=options['top'],
+        )
+
+        if options['output'] == STDOUT_FILENAME:
+            self._write_counts(self.stdout, counts)
+        else:
+            with open(options['output'], 'w', newline='') as output:
+                self._write_counts(output, counts)
+
+    @staticmethod
+    def _read_cohort(filename):
+        if filename == STDIN_FILENAME:
+            text = sys.stdin.read()
+        else:
+            try:
+                with open(filename) as cohort:
+                    text = cohort.read()
+            except OSError as error:
+                raise CommandError(f"Can't read the cohort: {error}")
+        try:
+            return {int(value) for value in text.replace(',', ' ').split()}
+        except ValueError as error:
+            raise CommandError(f"Invalid citizen id in the cohort: {error}")
+
+    @staticmethod
+    def _write_counts(output, counts):
+        writer = csv.writer(output, lineterminator='\n')
+        writer.writerow(['citizen_a_id', 'citizen_b_id', 'common_friends'])
+        writer.writerows(counts)
@@ -0,0 +1,73 @@
+import os
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from citizens.resources.synthetic import generate_companies, \
+    generate_people, write_json_array
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic people.json and companies.json resources " \
+           "of a given size"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output_dir',
+            help="Directory the people.json and companies.json files are "
+                 "written into.",
+        )
+        parser.add_argument(
+            '--citizens',
+            type=int,
+            default=10000,
+            help="Number of generated citizens.",
+        )
+        parser.add_argument(
+            '--companies',
+            type=int,
+            default=100,
+            help="Number of generated companies.",
+        )
+        parser.add_argument(
+            '--mean-friends',
+            type=float,
+            default=10,
+            help="Average number of friends of a citizen. Degrees follow "
+                 "a heavy-tailed distribution around this value.",
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help="Seed of the random generator. The same seed always "
+                 "generates the same dataset.",
+        )
+
+    def handle(self, **options):
+        if options['citizens'] < 1 or options['companies'] < 1:
+            raise CommandError(
+                "At least one citizen and one company must be generated"
+            )
+        if options['mean_friends'] <= 0:
+            raise CommandError("--mean-friends must be positive")
+
+        output_dir = options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+        started_at = time.monotonic()
+
+        write_json_array(
+            os.path.join(output_dir, 'companies.json'),
+            generate_companies(options['companies'])
+        )
+        citizens_count = write_json_array(
+            os.path.join(output_dir, 'people.json'),
+            generate_people(options['citizens'], options['companies'],
+                            mean_friends=options['mean_friends'],
+                            seed=options['seed'])
+        )
+
+        self.stdout.write(
+            f"Generated {citizens_count} citizens and {options['companies']} "
+            f"companies in {time.monotonic() - started_at:.2f}s"
+        )
@@ -1,18 +1,260 @@
-from django.core.management import BaseCommand
-from django.db import transaction
+import json
 
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from citizens.models import DatasetGeneration
+from citizens.resources.checkpoints import import_resumable, \
+    DEFAULT_CHUNK_SIZE
+from citizens.resources.formats import STDIN_FILENAME
+from citizens.resources.incremental import upsert_companies, upsert_people
 from citizens.resources.importers import import_companies, import_people, \
-    get_data_from_json_file, COMPANIES_RESOURCE_FILENAME, \
-    PEOPLE_RESOURCE_FILENAME
+    get_data_from_json_file, stream_data_from_json_file, \
+    COMPANIES_RESOURCE_FILENAME, PEOPLE_RESOURCE_FILENAME, DEFAULT_BATCH_SIZE
+from citizens.resources.instrumentation import ImportProgress
+from citizens.resources.parsing import DataImportError
+from citizens.resources.pg_copy import copy_people, DEFAULT_COPY_BATCH_SIZE
+from citizens.resources.shadow_tables import shadow_tables, \
+    swap_shadow_tables, rollback_to_previous_generation
+from citizens.resources.validation import validate_resources
 
 
 class Command(BaseCommand):
-    help = "Import people.json and companies.json resources"
+    help = "Import people.json and companies.json resources. A summary of " \
+           "the import with timings of its stages is printed as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--people',
+            default=PEOPLE_RESOURCE_FILENAME,
+            help="People resource to import, '-' for the standard input. "
+                 "Either a JSON array or newline-delimited JSON, optionally "
+                 "compressed with gzip, bzip2, xz or zstd.",
+        )
+        parser.add_argument(
+            '--companies',
+            default=COMPANIES_RESOURCE_FILENAME,
+            help="Companies resource to import, '-' for the standard input. "
+                 "Supports the same formats as --people.",
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help="Parse the resources one entry at a time instead of loading "
+                 "whole files into memory. Use for very large resources.",
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help="Load people with PostgreSQL COPY FROM STDIN instead of "
+                 "ORM inserts. Secondary indexes are rebuilt after the load.",
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help="Update an already populated database in place. Only new, "
+                 "changed and removed entries are written.",
+        )
+        parser.add_argument(
+            '--shadow',
+            action='store_true',
+            help="Load the resources into shadow tables and swap them with "
+                 "the live ones once complete, so the API keeps serving the "
+                 "previous data during the import. PostgreSQL only.",
+        )
+        parser.add_argument(
+            '--rollback',
+            action='store_true',
+            help="Swap the live data back with the generation replaced by "
+                 "the last --shadow import. Nothing is imported.",
+        )
+        parser.add_argument(
+            '--resumable',
+            action='store_true',
+            help="Commit people in chunks and record a checkpoint after "
+                 "every chunk. An interrupted import continues from the last "
+                 "checkpoint when ran again. Implies --stream.",
+        )
+        parser.add_argument(
+            '--validate-only',
+            action='store_true',
+            help="Check the resources without importing them and report "
+                 "every malformed entry and broken reference between "
+                 "entries. The database isn't touched.",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of entries committed at once by --resumable.",
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help="Number of processes used to parse and validate people "
+                 "entries. Database writes are still done by a single "
+                 "process.",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help=f"Number of entries written to the database at once. "
+                 f"Defaults to {DEFAULT_BATCH_SIZE}, or to "
+                 f"{DEFAULT_COPY_BATCH_SIZE} with --copy.",
+        )
 
-    @transaction.atomic
     def handle(self, **options):
-        companies_data = get_data_from_json_file(COMPANIES_RESOURCE_FILENAME)
-        import_companies(companies_data)
+        postgres_only_options = ['copy', 'shadow', 'rollback']
+        for option in postgres_only_options:
+            if options[option] and connection.vendor != 'postgresql':
+                raise CommandError(
+                    f"--{option} is only supported on PostgreSQL"
+                )
+        if options['incremental'] and (options['copy'] or options['shadow']):
+            raise CommandError(
+                "--incremental can't be combined with --copy or --shadow"
+            )
+        if options['resumable'] and (options['copy'] or options['shadow']
+                                     or options['incremental']):
+            raise CommandError(
+                "--resumable can't be combined with --copy, --shadow or "
+                "--incremental"
+            )
+        if options['batch_size'] is None:
+            options['batch_size'] = DEFAULT_COPY_BATCH_SIZE \
+                if options['copy'] else DEFAULT_BATCH_SIZE
+
+        stdin_resources = [
+            option for option in ['people', 'companies']
+            if options[option] == STDIN_FILENAME
+        ]
+        if len(stdin_resources) > 1:
+            raise CommandError(
+                "Only one resource can be read from the standard input"
+            )
+        if stdin_resources and options['resumable']:
+            raise CommandError(
+                "--resumable can't read resources from the standard input"
+            )
+
+        if options['validate_only']:
+            if options['rollback']:
+                raise CommandError(
+                    "--validate-only can't be combined with --rollback"
+                )
+            self._validate(options)
+            return
+
+        if options['rollback']:
+            try:
+                rollback_to_previous_generation()
+            except LookupError as error:
+                raise CommandError(error)
+            self.stdout.write("Restored the previous generation of the data")
+            return
+
+        # The progress line is only drawn when stderr is a terminal.
+        progress = ImportProgress(stream=self.stderr)
+
+        if options['resumable']:
+            changes = None
+            self._import_resumable(options, progress)
+        else:
+            with transaction.atomic():
+                changes = self._import_resources(options, progress)
+
+        progress.finish()
+        summary = progress.summary()
+        if changes:
+            summary['changes'] = changes
+        self.stdout.write(json.dumps(summary, indent=2))
+
+    def _import_resources(self, options, progress):
+        if options['stream']:
+            read_resource = stream_data_from_json_file
+        else:
+            read_resource = get_data_from_json_file
+
+        companies_data = read_resource(options['companies'])
+        people_data = read_resource(options['people'])
+
+        if not options['shadow']:
+            changes = self._import(companies_data, people_data, options,
+                                   progress)
+            # An incremental import that changed nothing leaves the dataset,
+            # and everything cached for its generation, as it was.
+            if changes is None or _has_changes(changes):
+                DatasetGeneration.bump()
+            return changes
+
+        with shadow_tables():
+            changes = self._import(companies_data, people_data, options,
+                                   progress)
+        with progress.stage('swap'):
+            swap_shadow_tables()
+        return changes
+
+    def _validate(self, options):
+        try:
+            errors = validate_resources(
+                stream_data_from_json_file(options['companies']),
+                stream_data_from_json_file(options['people']),
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+            )
+        except DataImportError as error:
+            raise CommandError(error)
+
+        for error in errors:
+            self.stdout.write(str(error))
+        if errors:
+            raise CommandError(f"Found {len(errors)} errors in the resources")
+        self.stdout.write("The resources are valid")
+
+    def _import_resumable(self, options, progress):
+        try:
+            import_resumable(
+                options['companies'],
+                options['people'],
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                progress=progress,
+            )
+        except KeyboardInterrupt:
+            progress.finish()
+            raise CommandError(
+                "Import interrupted. Run the same command again to continue "
+                "from the last committed chunk."
+            )
+
+    def _import(self, companies_data, people_data, options, progress):
+        batch_size = options['batch_size']
+        workers = options['workers']
+
+        if options['incremental']:
+            return {
+                'companies': upsert_companies(companies_data,
+                                              progress=progress),
+                'people': upsert_people(people_data, batch_size=batch_size,
+                                        workers=workers, progress=progress),
+            }
+
+        import_companies(companies_data, batch_size=batch_size,
+                         progress=progress)
+        if options['copy']:
+            copy_people(people_data, batch_size=batch_size, workers=workers,
+                        progress=progress)
+        else:
+            import_people(people_data, batch_size=batch_size, workers=workers,
+                          progress=progress)
+        return None
+
 
-        people_data = get_data_from_json_file(PEOPLE_RESOURCE_FILENAME)
-        import_people(people_data)
+def _has_changes(changes) -> bool:
+    return any(
+        summary[change]
+        for summary in changes.values()
+        for change in ['created', 'updated', 'deleted']
+    )
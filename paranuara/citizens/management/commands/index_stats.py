@@ -0,0 +1,39 @@
+import json
+import time
+
+from django.core.management import BaseCommand
+
+from citizens.attribute_index import AttributeIndex
+from citizens.friend_graph import FriendGraph
+from citizens.models import DatasetGeneration
+
+
+class Command(BaseCommand):
+    help = "Build the in-memory friend graph and attribute index of the " \
+           "current dataset and print their build times and memory usage " \
+           "as JSON."
+
+    def handle(self, **options):
+        generation = DatasetGeneration.current()
+
+        started_at = time.perf_counter()
+        graph = FriendGraph.build(generation.token)
+        graph_seconds = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        index = AttributeIndex.build(generation.token)
+        index_seconds = time.perf_counter() - started_at
+
+        self.stdout.write(json.dumps({
+            'generation': generation.number,
+            'friend_graph': {
+                'citizens': len(graph.ids),
+                'friendships': len(graph.friends),
+                'seconds': round(graph_seconds, 4),
+                'bytes': graph.nbytes,
+            },
+            'attribute_index': {
+                'seconds': round(index_seconds, 4),
+                'bytes': index.memory_usage(),
+            },
+        }, indent=2))
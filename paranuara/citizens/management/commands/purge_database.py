@@ -1,7 +1,10 @@
+import time
+
 from django.core.management import BaseCommand
-from django.db import transaction
+from django.db import connection, transaction
 
-from citizens.models import Citizen, EyeColor, Food, Tag, Company, Address
+from citizens.models import Citizen, EyeColor, Food, Tag, Company, Address, \
+    DatasetGeneration, ImportCheckpoint, get_dataset_tables
 
 
 class Command(BaseCommand):
@@ -10,9 +13,42 @@ class Command(BaseCommand):
 
     @transaction.atomic
     def handle(self, **options):
-        Citizen.objects.all().delete()
-        EyeColor.objects.all().delete()
-        Food.objects.all().delete()
-        Tag.objects.all().delete()
-        Company.objects.all().delete()
-        Address.objects.all().delete()
+        started_at = time.monotonic()
+
+        if connection.vendor == 'postgresql':
+            truncate_dataset_tables()
+        else:
+            delete_dataset()
+        # Checkpoints of unfinished imports refer to the purged data.
+        ImportCheckpoint.objects.all().delete()
+        DatasetGeneration.bump()
+
+        self.stdout.write(
+            f"Purged the database in {time.monotonic() - started_at:.2f}s"
+        )
+
+
+def truncate_dataset_tables():
+    """
+    Empty all dataset tables, including many-to-many through tables, in a
+    single statement and reset their sequences.
+
+    Unlike deleting through the ORM, this doesn't load any rows into memory,
+    doesn't fire signals and takes the same time regardless of the size of
+    the dataset.
+    """
+    tables = ', '.join(
+        connection.ops.quote_name(table) for table in get_dataset_tables()
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'TRUNCATE {tables} RESTART IDENTITY')
+
+
+def delete_dataset():
+    """Fallback for database backends that don't support TRUNCATE."""
+    Citizen.objects.all().delete()
+    EyeColor.objects.all().delete()
+    Food.objects.all().delete()
+    Tag.objects.all().delete()
+    Company.objects.all().delete()
+    Address.objects.all().delete()
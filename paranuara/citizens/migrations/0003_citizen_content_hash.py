@@ -0,0 +1,22 @@
+# Generated by Django 3.0.7 on 2026-10-17 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citizens', '0002_auto_20200608_1358'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='citizen',
+            options={'ordering': ('id',)},
+        ),
+        migrations.AddField(
+            model_name='citizen',
+            name='content_hash',
+            field=models.CharField(default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.0.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citizens', '0003_citizen_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=255, unique=True)),
+                ('resource_size', models.BigIntegerField()),
+                ('phase', models.CharField(choices=[('citizens', 'citizens'), ('friends', 'friends')], max_length=255)),
+                ('offset', models.BigIntegerField(default=0)),
+                ('last_index', models.IntegerField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.0.7 on 2026-10-17 10:26
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+ADDRESS_FIELDS = ['street_address', 'city_name', 'state_name', 'post_code']
+
+
+def deduplicate_addresses(apps, schema_editor):
+    """Point citizens to one of identical addresses and delete the rest."""
+    Address = apps.get_model('citizens', 'Address')
+    Citizen = apps.get_model('citizens', 'Citizen')
+
+    duplicates = Address.objects \
+        .values(*ADDRESS_FIELDS) \
+        .annotate(kept_id=Min('id'), count=Count('id')) \
+        .filter(count__gt=1) \
+        .order_by()
+    for duplicate in duplicates.iterator():
+        kept_id = duplicate.pop('kept_id')
+        del duplicate['count']
+        duplicated_addresses = Address.objects \
+            .filter(**duplicate) \
+            .exclude(id=kept_id)
+        Citizen.objects \
+            .filter(address__in=duplicated_addresses) \
+            .update(address_id=kept_id)
+        duplicated_addresses.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citizens', '0004_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_addresses,
+                             migrations.RunPython.noop),
+    ]
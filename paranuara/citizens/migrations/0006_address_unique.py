@@ -0,0 +1,17 @@
+# Generated by Django 3.0.7 on 2026-10-17 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citizens', '0005_deduplicate_addresses'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(fields=('street_address', 'city_name', 'state_name', 'post_code'), name='citizens_address_unique'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.0.7 on 2026-10-17 14:05
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citizens', '0006_address_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetGeneration',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.BigIntegerField(default=0)),
+                ('token', models.UUIDField(default=uuid.UUID('00000000-0000-0000-0000-000000000000'))),
+                ('changed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.7 on 2026-10-17 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citizens', '0007_datasetgeneration'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='citizen',
+            index=models.Index(fields=['company', 'id'], name='citizen_company_id_idx'),
+        ),
+    ]
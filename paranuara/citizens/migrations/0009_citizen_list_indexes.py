@@ -0,0 +1,36 @@
+# Generated by Django 3.0.7 on 2026-10-17 17:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citizens', '0008_citizen_company_id_idx'),
+    ]
+
+    operations = [
+        # Lookups by company are covered by citizen_company_id_idx.
+        migrations.AlterField(
+            model_name='citizen',
+            name='company',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='citizens.Company'),
+        ),
+        migrations.AddIndex(
+            model_name='citizen',
+            index=models.Index(fields=['eye_color', 'has_died', 'age', 'id'], name='citizen_eye_color_age_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='citizen',
+            index=models.Index(fields=['gender_code', 'age', 'id'], name='citizen_gender_age_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='citizen',
+            index=models.Index(condition=models.Q(has_died=False), fields=['age', 'id'], name='citizen_alive_age_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='citizen',
+            index=models.Index(condition=models.Q(has_died=True), fields=['id'], name='citizen_dead_idx'),
+        ),
+    ]
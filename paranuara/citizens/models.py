@@ -1,4 +1,8 @@
-from django.db import models
+import time
+import uuid
+from typing import Optional
+
+from django.db import models, transaction
 from django.db.models import fields
 
 # Postgres documentation states that enforcing the default 255 character
@@ -63,7 +67,17 @@ class Address(models.Model):
     All the fields here could potentially be their own models if functionality
     related to addresses is needed. The current implementation is a safe
     middle-ground between fully normalised and purely string-based addresses.
+
+    Addresses are shared by all citizens living at the same address.
     """
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['street_address', 'city_name', 'state_name',
+                        'post_code'],
+                name='citizens_address_unique'
+            ),
+        ]
 
     street_address = fields.CharField(max_length=DEFAULT_CHARFIELD_LENGTH)
     city_name = fields.CharField(max_length=DEFAULT_CHARFIELD_LENGTH)
@@ -89,10 +103,32 @@ class Citizen(models.Model):
     """A citizen of Paranuara"""
     class Meta:
         ordering = ('id',)
+        # Filters of the citizen list. Ids come last, so pages of filtered
+        # citizens are read in the order of ids.
+        indexes = [
+            # Pages of employees of a company, in the order of ids.
+            models.Index(fields=['company', 'id'],
+                         name='citizen_company_id_idx'),
+            models.Index(fields=['eye_color', 'has_died', 'age', 'id'],
+                         name='citizen_eye_color_age_idx'),
+            models.Index(fields=['gender_code', 'age', 'id'],
+                         name='citizen_gender_age_idx'),
+            # Most citizens are alive, so living ones are listed by age and
+            # the few dead ones have an index of their own.
+            models.Index(fields=['age', 'id'], name='citizen_alive_age_idx',
+                         condition=models.Q(has_died=False)),
+            models.Index(fields=['id'], name='citizen_dead_idx',
+                         condition=models.Q(has_died=True)),
+        ]
 
     _id = fields.CharField(max_length=DEFAULT_CHARFIELD_LENGTH, unique=True)
     guid = fields.CharField(max_length=DEFAULT_CHARFIELD_LENGTH, unique=True)
 
+    # Hash of the source entry the citizen was imported from. Incremental
+    # imports use it to skip entries that haven't changed since the last run.
+    content_hash = fields.CharField(max_length=DEFAULT_CHARFIELD_LENGTH,
+                                    default='')
+
     registered_at = fields.DateTimeField()
 
     # Name would ideally be split to first and last name but the current
@@ -136,7 +172,8 @@ class Citizen(models.Model):
     # All citizens in the initial provided resources are employed by a company
     # but that doesn't mean that will always be true. This field is nullable to
     # accommodate potential future unemployed citizens.
-    company = models.ForeignKey(to=Company, null=True,
+    # It's indexed together with ids, see Meta.indexes.
+    company = models.ForeignKey(to=Company, null=True, db_index=False,
                                 on_delete=models.SET_NULL)
 
     # Although common understanding of "friends" implies a symmetrical relation,
@@ -146,3 +183,113 @@ class Citizen(models.Model):
     tags = models.ManyToManyField(to=Tag)
 
     favourite_food = models.ManyToManyField(to=Food)
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of a resumable import of a people resource.
+
+    Bookkeeping of the import only, so it's not a part of the dataset and
+    it's left out of swaps of the dataset tables.
+    """
+
+    CITIZENS = 'citizens'
+    FRIENDS = 'friends'
+    PHASES = [CITIZENS, FRIENDS]
+
+    resource = fields.CharField(max_length=DEFAULT_CHARFIELD_LENGTH,
+                                unique=True)
+    # Used to detect resources that changed since the import started.
+    resource_size = fields.BigIntegerField()
+    phase = fields.CharField(
+        max_length=DEFAULT_CHARFIELD_LENGTH,
+        choices=[(phase, phase) for phase in PHASES]
+    )
+    # Position in the resource right after the last imported entry.
+    offset = fields.BigIntegerField(default=0)
+    last_index = fields.IntegerField(null=True)
+    updated_at = fields.DateTimeField(auto_now=True)
+
+
+class DatasetGeneration(models.Model):
+    """
+    Version of the dataset, bumped whenever the dataset is imported, purged
+    or swapped.
+
+    Like ImportCheckpoint it's bookkeeping, not a part of the dataset, and
+    it's kept in a single row. In-memory structures derived from the
+    dataset are rebuilt once the generation they were built from isn't the
+    current one anymore.
+    """
+
+    # Token of the generation before the first bump.
+    INITIAL_TOKEN = uuid.UUID(int=0)
+
+    # Seconds current_token() keeps the token in memory. Bumps of this
+    # process are seen right away, bumps of other processes once the kept
+    # token expires.
+    TOKEN_TTL = 1.0
+
+    # Token kept by current_token() and the time it expires at.
+    _kept_token = (None, 0.0)
+
+    number = fields.BigIntegerField(default=0)
+    # Unlike the number, the token never repeats, even when a transaction
+    # that bumped the generation is rolled back.
+    token = fields.UUIDField(default=INITIAL_TOKEN)
+    changed_at = fields.DateTimeField(auto_now=True)
+
+    @classmethod
+    def current(cls) -> 'DatasetGeneration':
+        generation = cls.objects.filter(id=1).first()
+        if generation is None:
+            return cls(id=1)
+        return generation
+
+    @classmethod
+    def current_token(cls) -> uuid.UUID:
+        """
+        Token of the current generation, only queried once the token kept
+        in memory expires.
+        """
+        token, expires_at = cls._kept_token
+        if token is None or time.monotonic() >= expires_at:
+            token = cls.current().token
+            cls._keep_token(token)
+        return token
+
+    @classmethod
+    def _keep_token(cls, token: Optional[uuid.UUID]):
+        cls._kept_token = (token, time.monotonic() + cls.TOKEN_TTL)
+
+    @classmethod
+    def bump(cls) -> 'DatasetGeneration':
+        """Start a new generation. Call in the transaction changing the data."""
+        with transaction.atomic():
+            generation, _ = cls.objects.select_for_update() \
+                .get_or_create(id=1)
+            generation.number += 1
+            generation.token = uuid.uuid4()
+            generation.save()
+        # Other threads only see the new generation once it's committed,
+        # until then the kept token is looked up again.
+        cls._keep_token(None)
+        transaction.on_commit(lambda: cls._keep_token(generation.token))
+        return generation
+
+
+# Models holding the imported dataset. Commands that load, swap or purge
+# the dataset operate on these and their many-to-many through tables only.
+DATASET_MODELS = [Company, EyeColor, Food, Tag, Address, Citizen]
+
+
+def get_dataset_tables():
+    """Names of all database tables holding the imported dataset."""
+    tables = []
+    for model in DATASET_MODELS:
+        tables.append(model._meta.db_table)
+        tables.extend(
+            field.remote_field.through._meta.db_table
+            for field in model._meta.local_many_to_many
+        )
+    return tables
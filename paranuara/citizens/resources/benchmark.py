@@ -0,0 +1,150 @@
+"""
+Benchmark of the import of people and companies resources.
+
+Every stage of an import is timed separately and reported together with the
+number of processed rows and the number of executed queries, so results of
+different commits can be compared. The peak memory of the process is
+reported once for the whole benchmark; memory allocated by every stage is
+only measured when tracing memory, which slows the stages down.
+"""
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from io import StringIO
+from typing import List, Optional
+
+from django.core.management import call_command
+from django.db import connection
+
+from citizens.models import DatasetGeneration
+from citizens.resources.importers import import_companies, import_people, \
+    stream_data_from_json_file, DEFAULT_BATCH_SIZE
+from citizens.resources.incremental import upsert_people
+from citizens.resources.instrumentation import ImportProgress, \
+    QueryCounter, get_peak_rss_kb
+from citizens.resources.parsing import parse_citizen_batches
+from citizens.resources.pg_copy import copy_people
+
+# Import methods that can be benchmarked. 'incremental' refreshes the data
+# loaded by the preceding method with the same resources, so it measures
+# the cost of an import where nothing has changed.
+IMPORT_METHODS = ['orm', 'copy', 'incremental']
+
+
+class ImportBenchmark:
+
+    def __init__(self, people_filename: str, companies_filename: str,
+                 batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 1,
+                 trace_memory: bool = False):
+        self.people_filename = people_filename
+        self.companies_filename = companies_filename
+        self.batch_size = batch_size
+        self.workers = workers
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    def run(self, methods: List[str]) -> dict:
+        """Run the benchmark of given import methods and return the results."""
+        people_count = self._measure(
+            'parse_people', lambda: sum(
+                len(records) for records in parse_citizen_batches(
+                    self._read_people(), self.batch_size, self.workers
+                )
+            )
+        )
+
+        for method in methods:
+            if method != 'incremental':
+                self._measure(f'{method}.purge', self._purge)
+                self._measure(f'{method}.import_companies',
+                              self._import_companies)
+            progress = ImportProgress()
+            self._measure(
+                f'{method}.import_people',
+                lambda: self._import_people(method, progress, people_count)
+            )
+            # Breakdown of the people import into the importer's own stages.
+            self.stages[-1]['stages'] = progress.summary()['stages']
+            # Like import_resources, so running servers don't keep serving
+            # what they derived from the purged or half imported dataset.
+            DatasetGeneration.bump()
+
+        return {
+            'commit': _get_current_commit(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': sys.version.split()[0],
+            'database': connection.vendor,
+            'batch_size': self.batch_size,
+            'workers': self.workers,
+            'people': people_count,
+            'peak_rss_kb': get_peak_rss_kb(),
+            'stages': self.stages,
+        }
+
+    def _measure(self, name: str, stage) -> Optional[int]:
+        """Run a stage returning the number of processed rows and record it."""
+        query_counter = QueryCounter()
+        if self.trace_memory:
+            tracemalloc.start()
+
+        started_at = time.perf_counter()
+        with connection.execute_wrapper(query_counter):
+            rows = stage()
+        seconds = time.perf_counter() - started_at
+
+        result = {
+            'stage': name,
+            'seconds': round(seconds, 4),
+            'rows': rows,
+            'rows_per_second': round(rows / seconds, 1) if rows else None,
+            'queries': query_counter.count,
+        }
+        if self.trace_memory:
+            _, peak_traced = tracemalloc.get_traced_memory()
+            result['peak_traced_kb'] = peak_traced // 1024
+            tracemalloc.stop()
+
+        self.stages.append(result)
+        return rows
+
+    def _read_people(self):
+        return stream_data_from_json_file(self.people_filename)
+
+    @staticmethod
+    def _purge():
+        call_command('purge_database', stdout=StringIO())
+
+    def _import_companies(self) -> int:
+        companies_data = list(
+            stream_data_from_json_file(self.companies_filename)
+        )
+        import_companies(companies_data, batch_size=self.batch_size)
+        return len(companies_data)
+
+    def _import_people(self, method: str, progress: ImportProgress,
+                       people_count: int) -> int:
+        if method == 'orm':
+            import_function = import_people
+        elif method == 'copy':
+            import_function = copy_people
+        elif method == 'incremental':
+            import_function = upsert_people
+        else:
+            raise ValueError(f'Unknown import method {method}')
+
+        import_function(self._read_people(), batch_size=self.batch_size,
+                        workers=self.workers, progress=progress)
+        return people_count
+
+
+def _get_current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(__file__),
+            capture_output=True, check=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
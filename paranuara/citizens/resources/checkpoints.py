@@ -0,0 +1,102 @@
+"""
+Resumable import of resources committed in chunks.
+
+Instead of a single transaction for the whole import, people are imported
+in chunks of entries that are committed one by one. Every commit also
+stores the position of the last imported entry in an ImportCheckpoint, so
+an import that crashed or was interrupted continues from the last committed
+chunk when started again.
+
+Chunks can only be committed when all foreign keys of their rows are
+satisfied, and friends of a citizen might be in any chunk. Citizens are
+therefore imported without friends first and friends are imported in
+a second pass over the resource, once all citizens exist.
+"""
+import os
+from itertools import islice
+from typing import Callable, List, Optional
+
+from django.db import transaction
+
+from citizens.models import DatasetGeneration, ImportCheckpoint
+from citizens.resources.formats import open_resource
+from citizens.resources.importers import import_companies, import_friends, \
+    import_people, stream_data_from_json_file, JsonEntryReader, \
+    DEFAULT_BATCH_SIZE
+from citizens.resources.instrumentation import ImportProgress
+from citizens.resources.parsing import DataImportError
+
+# Number of entries committed at once. Smaller chunks lose less work when
+# the import is interrupted, bigger ones have less overhead.
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def import_resumable(companies_filename: str, people_filename: str,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 1,
+                     progress: Optional[ImportProgress] = None):
+    """
+    Import resources, or continue the interrupted import of the same
+    people resource.
+    """
+    progress = progress or ImportProgress()
+    people_filename = os.path.abspath(people_filename)
+    resource_size = os.path.getsize(people_filename)
+
+    checkpoint = ImportCheckpoint.objects \
+        .filter(resource=people_filename).first()
+    if checkpoint is None:
+        with transaction.atomic():
+            import_companies(stream_data_from_json_file(companies_filename),
+                             batch_size=batch_size, progress=progress)
+            DatasetGeneration.bump()
+            checkpoint = ImportCheckpoint.objects.create(
+                resource=people_filename,
+                resource_size=resource_size,
+                phase=ImportCheckpoint.CITIZENS,
+            )
+    elif checkpoint.resource_size != resource_size:
+        raise DataImportError(
+            f'{people_filename} changed since its import started. Purge the '
+            f'database and import it again.'
+        )
+
+    if checkpoint.phase == ImportCheckpoint.CITIZENS:
+        _import_in_chunks(
+            checkpoint, chunk_size,
+            lambda entries: import_people(entries, batch_size=batch_size,
+                                          workers=workers, progress=progress,
+                                          with_friends=False)
+        )
+        checkpoint.phase = ImportCheckpoint.FRIENDS
+        checkpoint.offset = 0
+        checkpoint.last_index = None
+        checkpoint.save()
+
+    _import_in_chunks(
+        checkpoint, chunk_size,
+        lambda entries: import_friends(entries, batch_size=batch_size,
+                                       progress=progress)
+    )
+    checkpoint.delete()
+
+
+def _import_in_chunks(checkpoint: ImportCheckpoint, chunk_size: int,
+                      import_entries: Callable[[List[dict]], None]):
+    """Import entries following the checkpoint, committing every chunk."""
+    # Compressed resources are resumed by decompressing and skipping
+    # everything up to the offset, which is still much faster than importing.
+    with open_resource(checkpoint.resource) as file:
+        reader = JsonEntryReader(file, offset=checkpoint.offset)
+        entries = iter(reader)
+        while True:
+            chunk = list(islice(entries, chunk_size))
+            if not chunk:
+                return
+
+            with transaction.atomic():
+                import_entries(chunk)
+                checkpoint.offset = reader.offset
+                checkpoint.last_index = chunk[-1].get('index')
+                checkpoint.save()
+                DatasetGeneration.bump()
@@ -0,0 +1,64 @@
+"""
+Opening of compressed resources.
+
+Resources compressed with gzip, bzip2, xz or zstd are recognized by the
+magic bytes at their beginning, regardless of their file name, and are
+decompressed on the fly while they're read. Nothing is inflated to disk.
+"""
+import bz2
+import gzip
+import io
+import lzma
+import sys
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+
+from citizens.resources.parsing import DataImportError
+
+# Reads the resource from the standard input instead of a file.
+STDIN_FILENAME = '-'
+
+GZIP_MAGIC = b'\x1f\x8b'
+BZIP2_MAGIC = b'BZh'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+@contextmanager
+def open_resource(filename: str) -> Iterator[BinaryIO]:
+    """
+    Open a resource file, or the standard input for '-', as a binary file
+    of decompressed content.
+    """
+    if filename == STDIN_FILENAME:
+        yield decompressed(sys.stdin.buffer)
+        return
+
+    with open(filename, mode='rb') as file:
+        yield decompressed(file)
+
+
+def decompressed(file: BinaryIO) -> BinaryIO:
+    """Wrap the file in a decompressor matching its content, if needed."""
+    if not hasattr(file, 'peek'):
+        file = io.BufferedReader(file)
+    magic = file.peek(len(XZ_MAGIC))
+
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=file)
+    if magic.startswith(BZIP2_MAGIC):
+        return bz2.BZ2File(file)
+    if magic.startswith(XZ_MAGIC):
+        return lzma.LZMAFile(file)
+    if magic.startswith(ZSTD_MAGIC):
+        try:
+            import zstandard
+        except ImportError:
+            raise DataImportError(
+                'Reading zstd compressed resources requires the zstandard '
+                'package'
+            )
+        return zstandard.ZstdDecompressor().stream_reader(
+            file, read_across_frames=True
+        )
+    return file
@@ -1,170 +1,506 @@
+import codecs
 import json
 import os
-from datetime import datetime
-from typing import List
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, \
+    Type
 
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, models, transaction
 
 from citizens.models import Company, Citizen, EyeColor, Address, Food, Tag
+from citizens.resources.formats import open_resource
+from citizens.resources.instrumentation import ImportProgress
+from citizens.resources.parsing import CitizenRecord, DataImportError, \
+    parse_citizen_batches, parse_company_entry, parse_friends_entry, \
+    _batched
 
 CURRENT_DIR = os.path.dirname(__file__)
 PEOPLE_RESOURCE_FILENAME = os.path.join(CURRENT_DIR, 'json', 'people.json')
 COMPANIES_RESOURCE_FILENAME = os.path.join(CURRENT_DIR, 'json',
                                            'companies.json')
 
-# See: https://en.wikipedia.org/wiki/ISO/IEC_5218
-GENDER_TO_GENDER_CODE = {'male': 1, 'female': 2}
 
-EXPECTED_FIELDS_PEOPLE = {
-    '_id', 'index', 'guid', 'has_died', 'balance', 'picture', 'age',
-    'eyeColor', 'name', 'gender', 'company_id', 'email', 'phone', 'address',
-    'about', 'registered', 'tags', 'friends', 'greeting', 'favouriteFood'
-}
+# Number of entries written to the database at once. Peak memory of the
+# importers is proportional to this value rather than to the size of the
+# imported file.
+DEFAULT_BATCH_SIZE = 1000
 
+ADDRESS_FIELDS = ['street_address', 'city_name', 'state_name', 'post_code']
 
-class DataImportError(Exception):
-    pass
+# Number of characters read from a file at a time when streaming entries.
+READ_CHUNK_SIZE = 64 * 1024
+# Longest entry read from a file, in characters. Entries of the resources
+# take a few kB, so longer ones are most likely malformed.
+MAX_ENTRY_LENGTH = 16 * 1024 * 1024
+
+# Characters that end a token, so errors followed by them aren't caused by
+# a token cut at the end of the buffer.
+_TOKEN_ENDS = frozenset(' \t\n\r,:[]{}"')
+# Longest token fragment that fails to decode, e.g. "fals" or "\u00e9".
+_MAX_CUT_TOKEN_LENGTH = 8
 
 
 def get_data_from_json_file(filename):
-    with open(filename, mode='r') as file:
-        json_data = json.load(file)
-    return json_data
+    """Read all entries of a resource file into a list."""
+    return list(stream_data_from_json_file(filename))
 
 
-@transaction.atomic()
-def import_companies(json_data):
-    companies_to_create = []
-    for entry in json_data:
-        try:
-            index = entry['index']
-            name = entry['company']
-        except KeyError:
-            raise DataImportError(f'Found malformed company entry:\n{entry}')
+def stream_data_from_json_file(filename, offset=0):
+    """
+    Lazily yield the entries of a resource file one at a time.
 
+    The file may contain a JSON array or newline-delimited JSON and may be
+    compressed (see formats.open_resource()). Standard input is read when
+    the filename is '-'.
 
-        new_company = Company(id=index, name=name)
-        companies_to_create.append(new_company)
+    Unlike get_data_from_json_file(), only a single read chunk and the entry
+    currently being decoded are held in memory, so arbitrarily large files
+    can be imported. A non-zero offset (see JsonEntryReader.offset) resumes
+    reading after a previously read entry.
+    """
+    with open_resource(filename) as file:
+        yield from JsonEntryReader(file, offset=offset)
 
-    Company.objects.bulk_create(companies_to_create)
 
+class JsonEntryReader:
+    """
+    Incremental reader of entries of a top-level JSON array or of
+    newline-delimited JSON, told apart by the first character of the file.
 
-@transaction.atomic
-def import_people(json_data):
-    friends_relations = {}
+    Relies on the standard library decoder to parse one entry at a time out
+    of a buffer that is refilled from the file as needed. Files opened in
+    binary mode are decoded as UTF-8 and can be resumed from the offset of
+    an already read entry.
+    """
 
-    citizens_to_create = []
-    for entry in json_data:
-        if set(entry.keys()) != EXPECTED_FIELDS_PEOPLE:
-            raise DataImportError(f'Found malformed citizen entry:\n{entry}')
+    _decoder = json.JSONDecoder()
+    _whitespace = ' \t\n\r'
+
+    def __init__(self, file, chunk_size: int = READ_CHUNK_SIZE,
+                 offset: int = 0, max_entry_length: int = MAX_ENTRY_LENGTH):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._max_entry_length = max_entry_length
+        self._buffer = ''
+        self._position = 0
+        self._eof = False
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        # Bytes of the file preceding the buffer.
+        self._buffer_offset = offset
+        # End of the last yielded entry. Either a position in the buffer or,
+        # once it's dropped from the buffer, an offset in the file.
+        self._entry_end = None
+        self._entry_offset = offset
+        if offset:
+            file.seek(offset)
+
+    @property
+    def offset(self) -> int:
+        """
+        Position in the file right after the last yielded entry, in bytes.
+
+        A new reader created with this offset continues with the following
+        entry.
+        """
+        if self._entry_end is None:
+            return self._entry_offset
+        return self._buffer_offset + _utf8_length(
+            self._buffer[:self._entry_end]
+        )
 
-        friends_relations[entry['index']] = [
-            friend['index'] for friend in entry['friends']
+    def __iter__(self) -> Iterator:
+        char = self._next_significant_char()
+        if self._entry_offset == 0:
+            is_array = char == '['
+            if is_array:
+                self._position += 1
+                char = self._next_significant_char()
+                if char == ']':
+                    self._position += 1
+                    self._expect_end_of_file()
+                    return
+        else:
+            # Resuming after an entry, which is followed by a separator
+            # only in arrays.
+            is_array = char in (',', ']')
+            if is_array and not self._skip_separator():
+                return
+        if not char:
+            return
+
+        while True:
+            yield self._decode_next_value()
+
+            if is_array:
+                if not self._skip_separator():
+                    return
+            elif not self._next_significant_char():
+                return
+
+    def _skip_separator(self) -> bool:
+        """Consume the separator after an entry. False at the end of array."""
+        char = self._next_significant_char()
+        self._position += 1
+        if char == ']':
+            self._expect_end_of_file()
+            return False
+        if not char:
+            raise DataImportError('Unexpected end of the JSON array')
+        if char != ',':
+            raise DataImportError(
+                f'Malformed JSON array: expected "," or "]", got "{char}"'
+            )
+        if not self._next_significant_char():
+            raise DataImportError('Unexpected end of the JSON array')
+        return True
+
+    def _expect_end_of_file(self):
+        if self._next_significant_char():
+            raise DataImportError('Unexpected content after the JSON array')
+
+    def _read_chunk(self) -> bool:
+        """Append the next chunk of the file to the buffer."""
+        if self._eof:
+            return False
+
+        # Drop the already consumed part so the buffer doesn't grow with the
+        # size of the file.
+        self._entry_offset = self.offset
+        self._entry_end = None
+        self._buffer_offset += _utf8_length(self._buffer[:self._position])
+        self._buffer = self._buffer[self._position:]
+        self._position = 0
+
+        chunk = self._file.read(self._chunk_size)
+        if isinstance(chunk, bytes):
+            chunk = self._text_decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer += chunk
+        return True
+
+    def _next_significant_char(self) -> str:
+        """
+        Skip whitespace and return the next character without consuming it.
+        Returns an empty string at the end of the file.
+        """
+        while True:
+            while (self._position < len(self._buffer)
+                   and self._buffer[self._position] in self._whitespace):
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._read_chunk():
+                return ''
+
+    def _decode_next_value(self):
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer,
+                                                      self._position)
+            except json.JSONDecodeError as error:
+                # Only a value cut in half by the chunk boundary is read
+                # further, an error in the middle of the buffer won't go away
+                # with more data.
+                if _is_cut_at_end(error) and self._read_more_of_entry():
+                    continue
+                raise DataImportError(f'Malformed JSON entry: {error}')
+
+            # A number ending at the end of the buffer, or followed by just a
+            # part of its fraction or exponent, e.g. "-0.", might continue in
+            # the next chunk.
+            if _may_continue(value, self._buffer[end:]) \
+                    and self._read_more_of_entry():
+                continue
+
+            self._position = end
+            self._entry_end = end
+            return value
+
+    def _read_more_of_entry(self) -> bool:
+        if len(self._buffer) - self._position > self._max_entry_length:
+            raise DataImportError(
+                f'JSON entry longer than {self._max_entry_length} characters'
+            )
+        return self._read_chunk()
+
+
+def _may_continue(value, rest: str) -> bool:
+    if not rest:
+        return True
+    return isinstance(value, (int, float)) and not isinstance(value, bool) \
+        and len(rest) <= _MAX_CUT_TOKEN_LENGTH \
+        and not _TOKEN_ENDS.intersection(rest)
+
+
+def _is_cut_at_end(error: json.JSONDecodeError) -> bool:
+    """Whether the decoding error is caused by the end of the document."""
+    if error.msg.startswith('Unterminated string'):
+        # The string runs to the end of the document.
+        return True
+    rest = error.doc[error.pos:]
+    return len(rest) <= _MAX_CUT_TOKEN_LENGTH \
+        and not _TOKEN_ENDS.intersection(rest)
+
+
+def _utf8_length(text: str) -> int:
+    return len(text.encode('utf-8'))
+
+
+@transaction.atomic()
+def import_companies(json_data, batch_size=DEFAULT_BATCH_SIZE,
+                     progress: Optional[ImportProgress] = None):
+    progress = progress or ImportProgress()
+    for batch in _batched(json_data, batch_size):
+        with progress.stage('companies', rows=len(batch)):
+            companies_to_create = []
+            for entry in batch:
+                index, name = parse_company_entry(entry)
+                new_company = Company(id=index, name=name)
+                companies_to_create.append(new_company)
+
+            Company.objects.bulk_create(companies_to_create)
+        progress.advance(len(batch))
+
+
+class DimensionCache:
+    """
+    In-memory map of names to ids of rows in a dimension table.
+
+    Names are resolved for a whole batch at once and stay cached for the rest
+    of the import, so a dimension table is only queried when a batch contains
+    names that haven't been seen before.
+    """
+
+    def __init__(self, model: Type[models.Model], name_field: str,
+                 build_instance: Callable[[str], models.Model]):
+        self._model = model
+        self._name_field = name_field
+        self._build_instance = build_instance
+        self._ids = {}
+
+    def resolve(self, names: Iterable):
+        # Names are created in the order of their first appearance, so ids
+        # don't depend on the hashing of a set.
+        missing_names = [
+            name for name in dict.fromkeys(names) if name not in self._ids
         ]
+        if not missing_names:
+            return
 
-        balance_in_cents = _raw_balance_to_cents(entry['balance'])
-        favourite_food = _create_food_data(entry['favouriteFood'])
-        tags = _create_tags(entry['tags'])
-        registered_at = datetime.fromisoformat(entry['registered'])
-        eye_color, _ = EyeColor.objects.get_or_create(
-            color_name=entry['eyeColor']
-        )
-        address = _create_address(entry['address'])
-        citizen = Citizen(
-            _id=entry['_id'],
-            id=entry['index'],
-            guid=entry['guid'],
-            has_died=entry['has_died'],
-            picture_url=entry['picture'],
-            age=entry['age'],
-            name=entry['name'],
-            email=entry['email'],
-            about=entry['about'],
-            greeting=entry['greeting'],
-            gender_code=GENDER_TO_GENDER_CODE.get(entry['gender'], 0),
-            registered_at=registered_at,
-            balance_in_cents=balance_in_cents,
-            eye_color=eye_color,
-            phone_number=entry['phone'],
-            address=address,
-            company_id=_company_id_to_index(entry['company_id'])
+        self._model.objects.bulk_create(
+            [self._build_instance(name) for name in missing_names],
+            ignore_conflicts=True
         )
-        citizen.favourite_food.set(favourite_food)
-        citizen.tags.set(tags)
-        citizens_to_create.append(citizen)
+        # Ignoring conflicts on bulk creation causes the returned objects to
+        # not have ids so we have to refetch them.
+        self._ids.update(self._fetch_ids(missing_names))
 
-    created_citizens = Citizen.objects.bulk_create(citizens_to_create)
+    def _fetch_ids(self, names: List) -> Iterable[Tuple]:
+        return self._model.objects \
+            .filter(**{f'{self._name_field}__in': names}) \
+            .values_list(self._name_field, 'id')
 
-    # This implementation makes this function grow to O(2n) in complexity
-    # but ensures data integrity.
-    for citizen in created_citizens:
-        citizen.friends.set(friends_relations[citizen.id])
+    def __getitem__(self, name) -> int:
+        return self._ids[name]
 
 
-def _create_food_data(raw_favourite_food_list: List[str]) -> List[Food]:
-    favourite_food = []
-    for food in raw_favourite_food_list:
-        if food in Food.KNOWN_FRUITS:
-            _type = Food.FRUIT
-        elif food in Food.KNOWN_VEGETABLES:
-            _type = Food.VEGETABLE
-        else:
-            _type = Food.OTHER
-        new_food = Food(name=food, type=_type)
-        favourite_food.append(new_food)
-
-    Food.objects.bulk_create(favourite_food, ignore_conflicts=True)
-    # Ignoring conflicts on bulk creation causes the returned objects to not
-    # have ids so we have to refetch them. This causes a read on every citizen
-    # but it's better than multiple tag writes per citizen.
-    return Food.objects.filter(name__in=raw_favourite_food_list)
-
-
-def _create_tags(raw_tags_list: List[str]) -> List[Tag]:
-    tags = [Tag(name=tag) for tag in raw_tags_list]
-    Tag.objects.bulk_create(tags, ignore_conflicts=True)
-    # Ignoring conflicts on bulk creation causes the returned objects to not
-    # have ids so we have to refetch them. This causes a read on every citizen
-    # but it's better than multiple tag writes per citizen.
-    return Tag.objects.filter(name__in=raw_tags_list)
-
-
-def _create_address(raw_address_entry: str) -> Address:
-    (
-        street_address,
-        city_name,
-        state_name,
-        post_code
-    ) = raw_address_entry.split(',')
-    return Address.objects.create(
-        street_address=street_address.strip(),
-        city_name=city_name.strip(),
-        state_name=state_name.strip(),
-        post_code=post_code.strip(),
-    )
+class AddressCache(DimensionCache):
+    """
+    Map of (street, city, state, post code) tuples to ids of addresses.
+
+    There are nearly as many addresses as citizens, so unlike the other
+    dimensions, only the addresses of the last resolved batch are kept.
+    """
+
+    def __init__(self):
+        super().__init__(Address, 'street_address', build_address)
+
+    def resolve(self, addresses: Iterable[Tuple[str, str, str, str]]):
+        self._ids.clear()
+        super().resolve(addresses)
+
+    def _fetch_ids(self, addresses: List) -> Iterable[Tuple]:
+        # Filtering on the leading column of the unique constraint uses its
+        # index. Addresses sharing just the street are filtered out here.
+        wanted_addresses = set(addresses)
+        for *address, address_id in Address.objects \
+                .filter(street_address__in={address[0]
+                                            for address in addresses}) \
+                .values_list(*ADDRESS_FIELDS, 'id'):
+            if tuple(address) in wanted_addresses:
+                yield tuple(address), address_id
+
+
+class PeopleDimensions:
+    """Dimension caches shared by all batches of a single people import."""
+
+    def __init__(self):
+        self.eye_colors = DimensionCache(
+            EyeColor, 'color_name', lambda name: EyeColor(color_name=name)
+        )
+        self.food = DimensionCache(
+            Food, 'name', lambda name: Food(name=name, type=_food_type(name))
+        )
+        self.tags = DimensionCache(Tag, 'name', lambda name: Tag(name=name))
+        self.addresses = AddressCache()
+
+    def resolve(self, records: List[CitizenRecord]):
+        self.addresses.resolve(record.address for record in records)
+        self.eye_colors.resolve(record.eye_color for record in records)
+        self.food.resolve(
+            food for record in records for food in record.favourite_food
+        )
+        self.tags.resolve(tag for record in records for tag in record.tags)
 
 
-def _raw_balance_to_cents(raw_balance: str) -> int:
+@transaction.atomic
+def import_people(json_data, batch_size=DEFAULT_BATCH_SIZE, workers=1,
+                  progress: Optional[ImportProgress] = None,
+                  with_friends=True):
     """
-    Format a raw balance string into a number of cents.
+    Import citizens from an iterable of entries.
+
+    Entries are consumed lazily and written in batches of batch_size, so
+    passing a generator (e.g. stream_data_from_json_file()) keeps memory usage
+    flat regardless of the number of entries. Parsing of the batches is
+    spread over the given number of worker processes.
 
-    NOTE:
-    Supports one format of balance only: $2,418.59
-    Needs refactoring if we ever need to support different balance string types
+    Without friends, the imported citizens don't depend on any other
+    citizens. Their friends can be imported by import_friends() later.
     """
-    dollars, cents = raw_balance.replace('$', '').replace(',', '').split('.')
-    return int(dollars) * 100 + int(cents)
+    progress = progress or ImportProgress()
+    dimensions = PeopleDimensions()
+    batches = parse_citizen_batches(json_data, batch_size, workers)
+    for records in progress.timed_iter('people.parse', batches):
+        _import_people_batch(records, dimensions, progress, with_friends)
+        progress.advance(len(records))
 
 
-def _company_id_to_index(company_id: int) -> int:
+def _import_people_batch(records: List[CitizenRecord],
+                         dimensions: PeopleDimensions,
+                         progress: ImportProgress, with_friends: bool):
+    with progress.stage('people.dimensions', rows=len(records)):
+        dimensions.resolve(records)
+    with progress.stage('people.citizens', rows=len(records)):
+        create_citizens(records, dimensions)
+    create_relations(records, dimensions, progress, with_friends)
+
+
+@transaction.atomic
+def import_friends(json_data, batch_size=DEFAULT_BATCH_SIZE,
+                   progress: Optional[ImportProgress] = None):
+    """Import friends of already imported citizens from their entries."""
+    progress = progress or ImportProgress()
+    for batch in _batched(json_data, batch_size):
+        with progress.stage('friends.parse', rows=len(batch)):
+            friendships = [parse_friends_entry(entry) for entry in batch]
+        create_friendships(friendships, progress)
+        progress.advance(len(batch))
+
+
+def create_citizens(records: List[CitizenRecord],
+                    dimensions: PeopleDimensions):
+    """Create citizens. Dimensions, including addresses, must be resolved."""
+    citizens_to_create = [
+        Citizen(
+            **record.citizen_fields,
+            eye_color_id=dimensions.eye_colors[record.eye_color],
+            address_id=dimensions.addresses[record.address],
+        )
+        for record in records
+    ]
+    Citizen.objects.bulk_create(citizens_to_create)
+
+
+def create_relations(records: List[CitizenRecord],
+                     dimensions: PeopleDimensions,
+                     progress: Optional[ImportProgress] = None,
+                     with_friends=True):
     """
-    This is a very odd function that seem to make little sense. It exists since
-    after inspecting the provided resource files it looks like there's a
-    mismatch between the company_ids provided and the index values of the
-    companies themselves.
-
-    It looks like a safe guess that they are offset by one (the indexes go from
-    0 to 99 and the ids go from 1 to 100) but in a real life scenario this
-    would need confirmation and documentation.
+    Write citizens' favourite food, tags and friends straight into the through
+    tables, one statement per table for the whole batch.
     """
-    return company_id - 1
+    FoodRelation = Citizen.favourite_food.through
+    TagRelation = Citizen.tags.through
+
+    food_relations = []
+    tag_relations = []
+    for record in records:
+        citizen_id = record.citizen_fields['id']
+        food_relations.extend(
+            FoodRelation(citizen_id=citizen_id, food_id=food_id)
+            for food_id in _unique(
+                dimensions.food[food] for food in record.favourite_food
+            )
+        )
+        tag_relations.extend(
+            TagRelation(citizen_id=citizen_id, tag_id=tag_id)
+            for tag_id in _unique(
+                dimensions.tags[tag] for tag in record.tags
+            )
+        )
+
+    progress = progress or ImportProgress()
+    relations_count = len(food_relations) + len(tag_relations)
+    with progress.stage('people.relations', rows=relations_count):
+        FoodRelation.objects.bulk_create(food_relations)
+        TagRelation.objects.bulk_create(tag_relations)
+
+    if with_friends:
+        create_friendships(
+            [(record.citizen_fields['id'], record.friends)
+             for record in records],
+            progress
+        )
+
+
+def create_friendships(friendships: List[Tuple[int, List[int]]],
+                       progress: Optional[ImportProgress] = None):
+    """
+    Write (citizen id, friend ids) pairs into the friends through table.
+
+    Friends might live in a batch that hasn't been imported yet. Postgres
+    foreign keys created by Django are deferred until the end of the
+    transaction, so integrity is still checked once all batches are in.
+    """
+    FriendRelation = Citizen.friends.through
+    friend_relations = [
+        FriendRelation(from_citizen_id=citizen_id, to_citizen_id=friend_id)
+        for citizen_id, friend_ids in friendships
+        for friend_id in _unique(friend_ids)
+    ]
+
+    progress = progress or ImportProgress()
+    with progress.stage('people.friends', rows=len(friend_relations)):
+        FriendRelation.objects.bulk_create(friend_relations)
+
+
+def _unique(values: Iterable) -> List:
+    """Remove duplicates while preserving order, as relations must be unique."""
+    return list(dict.fromkeys(values))
+
+
+def _food_type(food_name: str) -> str:
+    if food_name in Food.KNOWN_FRUITS:
+        return Food.FRUIT
+    if food_name in Food.KNOWN_VEGETABLES:
+        return Food.VEGETABLE
+    return Food.OTHER
+
+
+def delete_orphaned_addresses(address_ids: Iterable[int]):
+    """Delete the given addresses unless some citizen still lives there."""
+    Address.objects \
+        .filter(id__in=list(address_ids), citizen__isnull=True) \
+        .delete()
+
+
+def build_address(address: Tuple[str, str, str, str]) -> Address:
+    street_address, city_name, state_name, post_code = address
+    return Address(
+        street_address=street_address,
+        city_name=city_name,
+        state_name=state_name,
+        post_code=post_code,
+    )
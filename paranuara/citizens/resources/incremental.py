@@ -0,0 +1,189 @@
+"""
+Incremental import of resources into an already populated database.
+
+Entries are matched with existing rows on their guid and compared using the
+content hash stored on every citizen, so only new, changed and removed
+citizens are written. Refreshing a mostly unchanged dataset costs a fraction
+of purging the database and importing it again.
+"""
+from collections import Counter
+from typing import List, Optional, Set, Tuple
+
+from django.db import transaction
+
+from citizens.models import Citizen, Company
+from citizens.resources.importers import PeopleDimensions, \
+    create_citizens, create_relations, delete_orphaned_addresses, \
+    DEFAULT_BATCH_SIZE
+from citizens.resources.instrumentation import ImportProgress
+from citizens.resources.parsing import CitizenRecord, DataImportError, \
+    parse_citizen_batches, parse_company_entry, _batched
+
+
+@transaction.atomic
+def upsert_companies(json_data,
+                     progress: Optional[ImportProgress] = None) -> Counter:
+    """Create new, rename changed and delete removed companies."""
+    progress = progress or ImportProgress()
+    with progress.stage('companies') as stage:
+        summary = _upsert_companies(json_data)
+        stage.rows = sum(summary.values())
+    progress.advance(stage.rows)
+    return summary
+
+
+def _upsert_companies(json_data) -> Counter:
+    existing_companies = dict(Company.objects.values_list('id', 'name'))
+    summary = Counter()
+
+    companies_to_create = []
+    companies_to_update = []
+    for entry in json_data:
+        index, name = parse_company_entry(entry)
+        if index not in existing_companies:
+            companies_to_create.append(Company(id=index, name=name))
+            summary['created'] += 1
+        elif existing_companies.pop(index) != name:
+            companies_to_update.append(Company(id=index, name=name))
+            summary['updated'] += 1
+        else:
+            summary['unchanged'] += 1
+
+    Company.objects.bulk_create(companies_to_create)
+    Company.objects.bulk_update(companies_to_update, ['name'])
+
+    # Whatever is left wasn't present in the resource anymore.
+    Company.objects.filter(id__in=existing_companies).delete()
+    summary['deleted'] = len(existing_companies)
+
+    return summary
+
+
+@transaction.atomic
+def upsert_people(json_data, batch_size=DEFAULT_BATCH_SIZE, workers=1,
+                  progress: Optional[ImportProgress] = None) -> Counter:
+    """
+    Bring citizens in line with the given entries.
+
+    Returns the number of created, updated, unchanged and deleted citizens.
+    Citizen ids are expected to be stable - an entry whose index doesn't
+    match the id of the citizen with the same guid is treated as an error.
+    """
+    progress = progress or ImportProgress()
+    dimensions = PeopleDimensions()
+    summary = Counter()
+    seen_ids = set()
+
+    batches = parse_citizen_batches(json_data, batch_size, workers)
+    for records in progress.timed_iter('people.parse', batches):
+        _upsert_people_batch(records, dimensions, summary, progress)
+        seen_ids.update(record.citizen_fields['id'] for record in records)
+        progress.advance(len(records))
+
+    with progress.stage('people.deletions') as stage:
+        summary['deleted'] = _delete_citizens_except(seen_ids, batch_size)
+        stage.rows = summary['deleted']
+    return summary
+
+
+def _upsert_people_batch(records: List[CitizenRecord],
+                         dimensions: PeopleDimensions, summary: Counter,
+                         progress: ImportProgress):
+    with progress.stage('people.lookup', rows=len(records)):
+        existing_citizens = {
+            guid: (citizen_id, content_hash, address_id)
+            for guid, citizen_id, content_hash, address_id
+            in Citizen.objects
+                .filter(guid__in=[record.citizen_fields['guid']
+                                  for record in records])
+                .values_list('guid', 'id', 'content_hash', 'address_id')
+                .order_by()
+        }
+
+    new_records = []
+    changed_records = []
+    for record in records:
+        fields = record.citizen_fields
+        if fields['guid'] not in existing_citizens:
+            new_records.append(record)
+            continue
+
+        citizen_id, content_hash, address_id = \
+            existing_citizens[fields['guid']]
+        if citizen_id != fields['id']:
+            raise DataImportError(
+                f"Citizen {fields['guid']} changed its index from "
+                f"{citizen_id} to {fields['id']}. A full import is required."
+            )
+        if content_hash != fields['content_hash']:
+            changed_records.append((record, address_id))
+
+    summary['created'] += len(new_records)
+    summary['updated'] += len(changed_records)
+    summary['unchanged'] += (
+        len(records) - len(new_records) - len(changed_records)
+    )
+    if not new_records and not changed_records:
+        return
+
+    records_to_write = new_records + [record for record, _ in changed_records]
+    with progress.stage('people.dimensions', rows=len(records_to_write)):
+        dimensions.resolve(records_to_write)
+    with progress.stage('people.citizens', rows=len(records_to_write)):
+        if new_records:
+            create_citizens(new_records, dimensions)
+        if changed_records:
+            _update_citizens(changed_records, dimensions)
+    create_relations(records_to_write, dimensions, progress)
+
+
+def _update_citizens(changed_records: List[Tuple[CitizenRecord, int]],
+                     dimensions: PeopleDimensions):
+    """Rewrite changed citizens and drop their relations."""
+    citizens = [
+        Citizen(
+            **record.citizen_fields,
+            eye_color_id=dimensions.eye_colors[record.eye_color],
+            address_id=dimensions.addresses[record.address],
+        )
+        for record, _ in changed_records
+    ]
+    citizen_fields = [
+        field for field in changed_records[0][0].citizen_fields
+        if field != 'id'
+    ]
+    Citizen.objects.bulk_update(citizens,
+                                citizen_fields + ['eye_color', 'address'])
+
+    # Addresses are shared, so the previous ones can only be deleted once
+    # nobody lives there anymore.
+    delete_orphaned_addresses(
+        address_id for _, address_id in changed_records
+    )
+
+    # Relations are recreated from scratch by create_relations().
+    changed_ids = [citizen.id for citizen in citizens]
+    Citizen.favourite_food.through.objects \
+        .filter(citizen_id__in=changed_ids).delete()
+    Citizen.tags.through.objects.filter(citizen_id__in=changed_ids).delete()
+    Citizen.friends.through.objects \
+        .filter(from_citizen_id__in=changed_ids).delete()
+
+
+def _delete_citizens_except(citizen_ids: Set[int], batch_size: int) -> int:
+    """Delete citizens (and addresses left empty) whose ids are not given."""
+    removed_ids = [
+        citizen_id
+        for citizen_id
+        in Citizen.objects.values_list('id', flat=True).order_by().iterator()
+        if citizen_id not in citizen_ids
+    ]
+
+    for batch in _batched(removed_ids, batch_size):
+        removed_citizens = Citizen.objects.filter(id__in=batch)
+        address_ids = list(removed_citizens.values_list('address_id',
+                                                        flat=True))
+        removed_citizens.delete()
+        delete_orphaned_addresses(address_ids)
+
+    return len(removed_ids)
@@ -0,0 +1,165 @@
+"""
+Instrumentation of resource imports.
+
+Importers report their work to an ImportProgress split into named stages.
+Every stage accumulates its duration, processed rows and executed queries,
+which tells where the time of an import goes and helps with tuning the
+batch size. Peak memory is only known for the whole process, so it's
+reported once for the import rather than per stage.
+"""
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional, TextIO
+
+from django.db import connection
+
+
+class QueryCounter:
+    """Database execute wrapper counting executed queries."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class StageStats:
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.rows = 0
+        self.queries = 0
+
+    @property
+    def rows_per_second(self) -> Optional[float]:
+        if not self.rows or not self.seconds:
+            return None
+        return round(self.rows / self.seconds, 1)
+
+    def as_dict(self) -> dict:
+        return {
+            'stage': self.name,
+            'seconds': round(self.seconds, 4),
+            'rows': self.rows,
+            'rows_per_second': self.rows_per_second,
+            'queries': self.queries,
+        }
+
+
+class ImportProgress:
+    """
+    Collector of import statistics.
+
+    When given a stream attached to a terminal, a progress line is kept up
+    to date on it while the import runs. Otherwise statistics are only
+    collected for summary().
+    """
+
+    # Minimal number of seconds between redraws of the progress line.
+    REFRESH_INTERVAL = 0.5
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self._stream = stream if stream is not None and stream.isatty() \
+            else None
+        self._stages = {}
+        self._current_stage = None
+        self._started_at = time.perf_counter()
+        self._refreshed_at = 0.0
+        self.rows = 0
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0) -> Iterator[StageStats]:
+        """
+        Account the block to the named stage.
+
+        Stages are accumulated across repeated blocks of the same name, e.g.
+        one block per batch. Rows not known up front can be added to the
+        yielded StageStats.
+        """
+        stats = self._stages.get(name)
+        if stats is None:
+            stats = self._stages[name] = StageStats(name)
+        self._current_stage = name
+        query_counter = QueryCounter()
+
+        started_at = time.perf_counter()
+        try:
+            with connection.execute_wrapper(query_counter):
+                yield stats
+        finally:
+            stats.seconds += time.perf_counter() - started_at
+            stats.rows += rows
+            stats.queries += query_counter.count
+            self._refresh()
+
+    def timed_iter(self, name: str, iterable: Iterable,
+                   count: Callable = len) -> Iterator:
+        """
+        Yield items of the iterable, accounting the time spent producing
+        them (e.g. reading and parsing batches) to the named stage.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as stats:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                stats.rows += count(item)
+            yield item
+
+    def advance(self, rows: int):
+        """Record rows that have been completely imported."""
+        self.rows += rows
+        self._refresh()
+
+    def finish(self):
+        if self._stream is not None:
+            self._refresh(force=True)
+            self._stream.write('\n')
+            self._stream.flush()
+
+    def summary(self) -> dict:
+        seconds = time.perf_counter() - self._started_at
+        return {
+            'seconds': round(seconds, 4),
+            'rows': self.rows,
+            'rows_per_second': round(self.rows / seconds, 1)
+            if self.rows else None,
+            # Of the whole process, including anything run before the import.
+            'peak_rss_kb': get_peak_rss_kb(),
+            'stages': [stats.as_dict() for stats in self._stages.values()],
+        }
+
+    def _refresh(self, force: bool = False):
+        if self._stream is None:
+            return
+        now = time.perf_counter()
+        if not force and now - self._refreshed_at < self.REFRESH_INTERVAL:
+            return
+        self._refreshed_at = now
+
+        seconds = now - self._started_at
+        line = (
+            f'{self.rows} rows imported in {seconds:.1f}s '
+            f'({self.rows / seconds:.0f} rows/s), '
+            f'peak memory {get_peak_rss_kb() // 1024} MB, '
+            f'stage: {self._current_stage}'
+        )
+        # Pad to overwrite the remainder of a longer previous line.
+        self._stream.write('\r' + line.ljust(79))
+        self._stream.flush()
+
+
+def get_peak_rss_kb() -> int:
+    """Peak resident memory of the process so far."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes everywhere else.
+    if sys.platform == 'darwin':
+        return peak_rss // 1024
+    return peak_rss
@@ -0,0 +1,337 @@
+"""
+Validation and conversion of raw resource entries.
+
+Nothing in this module touches the database (or Django at all), so parsing
+can be spread over a pool of worker processes regardless of the
+multiprocessing start method.
+"""
+import hashlib
+import json
+import multiprocessing
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, NamedTuple, \
+    Tuple
+
+# See: https://en.wikipedia.org/wiki/ISO/IEC_5218
+GENDER_TO_GENDER_CODE = {'male': 1, 'female': 2}
+
+# Integers of entries are stored in 64 bit database columns at most.
+MAX_INTEGER = 1 << 63
+
+EXPECTED_FIELDS_PEOPLE = {
+    '_id', 'index', 'guid', 'has_died', 'balance', 'picture', 'age',
+    'eyeColor', 'name', 'gender', 'company_id', 'email', 'phone', 'address',
+    'about', 'registered', 'tags', 'friends', 'greeting', 'favouriteFood'
+}
+
+
+class DataImportError(Exception):
+    pass
+
+
+class CitizenRecord(NamedTuple):
+    """
+    A validated citizen entry that doesn't depend on the database state.
+
+    Values of dimension tables (eye colour, address, food and tags) are kept
+    as raw values until they're resolved to ids for the whole batch.
+    """
+    citizen_fields: dict
+    eye_color: str
+    address: Tuple[str, str, str, str]
+    favourite_food: List[str]
+    tags: List[str]
+    friends: List[int]
+
+
+def parse_company_entry(entry: dict) -> Tuple[int, str]:
+    """Validate a raw company entry and return its index and name."""
+    try:
+        return entry['index'], entry['company']
+    except KeyError:
+        raise DataImportError(f'Found malformed company entry:\n{entry}')
+
+
+def parse_citizen_entry(entry: dict) -> CitizenRecord:
+    """Validate a raw citizen entry and convert it into a CitizenRecord."""
+    if set(entry.keys()) != EXPECTED_FIELDS_PEOPLE:
+        raise DataImportError(f'Found malformed citizen entry:\n{entry}')
+
+    citizen_fields = {
+        '_id': entry['_id'],
+        'id': entry['index'],
+        'guid': entry['guid'],
+        'has_died': entry['has_died'],
+        'picture_url': entry['picture'],
+        'age': entry['age'],
+        'name': entry['name'],
+        'email': entry['email'],
+        'about': entry['about'],
+        'greeting': entry['greeting'],
+        'gender_code': GENDER_TO_GENDER_CODE.get(entry['gender'], 0),
+        'registered_at': datetime.fromisoformat(entry['registered']),
+        'balance_in_cents': _raw_balance_to_cents(entry['balance']),
+        'phone_number': entry['phone'],
+        'company_id': _company_id_to_index(entry['company_id']),
+        'content_hash': get_entry_hash(entry),
+    }
+    return CitizenRecord(
+        citizen_fields=citizen_fields,
+        eye_color=entry['eyeColor'],
+        address=_parse_address(entry['address']),
+        favourite_food=entry['favouriteFood'],
+        tags=entry['tags'],
+        friends=[friend['index'] for friend in entry['friends']],
+    )
+
+
+def parse_friends_entry(entry: dict) -> Tuple[int, List[int]]:
+    """Return the index of a raw citizen entry and indexes of its friends."""
+    try:
+        return entry['index'], [friend['index'] for friend in entry['friends']]
+    except (KeyError, TypeError):
+        raise DataImportError(f'Found malformed citizen entry:\n{entry}')
+
+
+def get_entry_hash(entry: dict) -> str:
+    """Hash of the entry's content that doesn't depend on the key order."""
+    canonical_entry = json.dumps(entry, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical_entry.encode()).hexdigest()
+
+
+def parse_citizen_batches(json_data: Iterable[dict], batch_size: int,
+                          workers: int = 1) -> Iterator[List[CitizenRecord]]:
+    """
+    Split entries into batches and parse them into CitizenRecords.
+
+    With more than one worker, batches are parsed in a process pool. Results
+    are yielded in the input order, so they're identical to a serial run.
+    """
+    return map_batches(_parse_citizen_batch,
+                       _batched(json_data, batch_size), workers)
+
+
+def _parse_citizen_batch(entries: List[dict]) -> List[CitizenRecord]:
+    return [parse_citizen_entry(entry) for entry in entries]
+
+
+def map_batches(function: Callable, batches: Iterable[List],
+                workers: int = 1) -> Iterator:
+    """
+    Apply a module level function to every batch, in a process pool when
+    there's more than one worker.
+
+    Results are yielded in the input order and only a few batches per
+    worker are in flight at a time to keep memory usage bounded when the
+    batches come from a stream.
+    """
+    if workers <= 1:
+        yield from map(function, batches)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.apply_async(function, (batch,)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def find_citizen_entry_errors(entry: dict) -> List[str]:
+    """
+    Describe everything wrong with a raw citizen entry.
+
+    Unlike parse_citizen_entry(), which gives up on the first problem, every
+    missing, unexpected or malformed field is reported.
+    """
+    if not isinstance(entry, dict):
+        return [f'expected an object, got {_describe(entry)}']
+
+    errors = []
+    missing_fields = EXPECTED_FIELDS_PEOPLE.difference(entry)
+    if missing_fields:
+        errors.append(f'missing fields: {", ".join(sorted(missing_fields))}')
+    unexpected_fields = set(entry).difference(EXPECTED_FIELDS_PEOPLE)
+    if unexpected_fields:
+        errors.append(
+            f'unexpected fields: {", ".join(sorted(unexpected_fields))}'
+        )
+
+    for field, check in CITIZEN_FIELD_CHECKS.items():
+        if field in entry:
+            try:
+                check(entry[field])
+            except ValueError as error:
+                errors.append(f'{field}: {error}')
+    return errors
+
+
+def find_company_entry_errors(entry: dict) -> List[str]:
+    """Describe everything wrong with a raw company entry."""
+    if not isinstance(entry, dict):
+        return [f'expected an object, got {_describe(entry)}']
+
+    errors = []
+    for field, check in COMPANY_FIELD_CHECKS.items():
+        if field not in entry:
+            errors.append(f'missing field {field}')
+            continue
+        try:
+            check(entry[field])
+        except ValueError as error:
+            errors.append(f'{field}: {error}')
+    return errors
+
+
+def _batched(iterable: Iterable, batch_size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _parse_address(raw_address_entry: str) -> Tuple[str, str, str, str]:
+    (
+        street_address,
+        city_name,
+        state_name,
+        post_code
+    ) = raw_address_entry.split(',')
+    return (
+        _normalize_whitespace(street_address),
+        _normalize_whitespace(city_name),
+        _normalize_whitespace(state_name),
+        _normalize_whitespace(post_code),
+    )
+
+
+def _normalize_whitespace(value: str) -> str:
+    """
+    Strip and collapse whitespace, so addresses differing only in spacing
+    are stored once.
+    """
+    return ' '.join(value.split())
+
+
+def _raw_balance_to_cents(raw_balance: str) -> int:
+    """
+    Format a raw balance string into a number of cents.
+
+    NOTE:
+    Supports one format of balance only: $2,418.59
+    Needs refactoring if we ever need to support different balance string types
+    """
+    dollars, cents = raw_balance.replace('$', '').replace(',', '').split('.')
+    return int(dollars) * 100 + int(cents)
+
+
+def _company_id_to_index(company_id: int) -> int:
+    """
+    This is a very odd function that seem to make little sense. It exists since
+    after inspecting the provided resource files it looks like there's a
+    mismatch between the company_ids provided and the index values of the
+    companies themselves.
+
+    It looks like a safe guess that they are offset by one (the indexes go from
+    0 to 99 and the ids go from 1 to 100) but in a real life scenario this
+    would need confirmation and documentation.
+    """
+    return company_id - 1
+
+
+def _describe(value) -> str:
+    description = repr(value)
+    if len(description) > 40:
+        description = description[:37] + '...'
+    return f'{type(value).__name__} {description}'
+
+
+def _check_integer(value):
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f'expected an integer, got {_describe(value)}')
+    if not -MAX_INTEGER <= value < MAX_INTEGER:
+        raise ValueError(f'integer {value} is out of range')
+
+
+def _check_boolean(value):
+    if not isinstance(value, bool):
+        raise ValueError(f'expected a boolean, got {_describe(value)}')
+
+
+def _check_string(value):
+    if not isinstance(value, str):
+        raise ValueError(f'expected a string, got {_describe(value)}')
+
+
+def _check_strings(value):
+    if not isinstance(value, list) \
+            or not all(isinstance(item, str) for item in value):
+        raise ValueError(f'expected a list of strings, got {_describe(value)}')
+
+
+def _check_balance(value):
+    _check_string(value)
+    try:
+        _raw_balance_to_cents(value)
+    except ValueError:
+        raise ValueError(f'expected an amount like $2,418.59, got {value!r}')
+
+
+def _check_registered(value):
+    _check_string(value)
+    datetime.fromisoformat(value)
+
+
+def _check_address(value):
+    _check_string(value)
+    if value.count(',') != 3:
+        raise ValueError(
+            f'expected "street, city, state, post code", got {value!r}'
+        )
+
+
+def _check_friends(value):
+    if not isinstance(value, list) \
+            or not all(isinstance(friend, dict) for friend in value):
+        raise ValueError(
+            f'expected a list of {{"index": <integer>}}, got {_describe(value)}'
+        )
+    for friend in value:
+        if 'index' not in friend:
+            raise ValueError(f'missing index of a friend in {friend!r}')
+        _check_integer(friend['index'])
+
+
+CITIZEN_FIELD_CHECKS = {
+    '_id': _check_string,
+    'index': _check_integer,
+    'guid': _check_string,
+    'has_died': _check_boolean,
+    'balance': _check_balance,
+    'picture': _check_string,
+    'age': _check_integer,
+    'eyeColor': _check_string,
+    'name': _check_string,
+    'gender': _check_string,
+    'company_id': _check_integer,
+    'email': _check_string,
+    'phone': _check_string,
+    'address': _check_address,
+    'about': _check_string,
+    'registered': _check_registered,
+    'tags': _check_strings,
+    'friends': _check_friends,
+    'greeting': _check_string,
+    'favouriteFood': _check_strings,
+}
+
+COMPANY_FIELD_CHECKS = {
+    'index': _check_integer,
+    'company': _check_string,
+}
@@ -0,0 +1,234 @@
+"""
+Zero-downtime reloads of the dataset on PostgreSQL.
+
+A new generation of the dataset is loaded into empty copies of the dataset
+tables living in a staging schema, while the API keeps reading the live
+tables undisturbed. Once the shadow tables are complete and indexed, they're
+swapped with the live ones in a single short transaction. The replaced
+generation is kept in a separate schema so it can be swapped back quickly.
+"""
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+from django.db import connection, transaction
+
+from citizens.models import DatasetGeneration, DATASET_MODELS, \
+    get_dataset_tables
+
+STAGING_SCHEMA = 'citizens_staging'
+PREVIOUS_SCHEMA = 'citizens_previous'
+
+
+@contextmanager
+def shadow_tables():
+    """
+    Route all writes of the block into empty shadow copies of the dataset
+    tables.
+
+    Primary keys and unique constraints are created up front so the loaded
+    data is validated as usual. Remaining indexes and foreign keys are
+    created after the block, which is faster than maintaining them while
+    loading. Call swap_shadow_tables() afterwards to make the data live.
+    """
+    live_schema = _get_current_schema()
+    tables = get_dataset_tables()
+    definitions = _get_table_definitions(live_schema, tables)
+
+    # If the block raises, rolling back the transaction also drops the
+    # staging schema and restores search_path.
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE')
+        cursor.execute(f'CREATE SCHEMA {STAGING_SCHEMA}')
+
+        for table in tables:
+            cursor.execute(
+                f'CREATE TABLE {_qualify(STAGING_SCHEMA, table)} '
+                f'(LIKE {_qualify(live_schema, table)} '
+                f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+            )
+        _create_sequences(cursor)
+
+        for table, name, definition in definitions['unique_constraints']:
+            cursor.execute(
+                f'ALTER TABLE {_qualify(STAGING_SCHEMA, table)} '
+                f'ADD CONSTRAINT {_quote(name)} {definition}'
+            )
+
+        cursor.execute('SHOW search_path')
+        search_path = cursor.fetchone()[0]
+        cursor.execute(
+            f'SET search_path TO {STAGING_SCHEMA}, {_quote(live_schema)}'
+        )
+
+        yield
+
+        for table, name, is_unique, method in definitions['indexes']:
+            unique = 'UNIQUE ' if is_unique else ''
+            cursor.execute(
+                f'CREATE {unique}INDEX {_quote(name)} '
+                f'ON {_qualify(STAGING_SCHEMA, table)} USING {method}'
+            )
+        # Foreign key definitions reference tables without a schema, so with
+        # the staging schema first in search_path they point to the shadow
+        # tables.
+        for table, name, definition in definitions['foreign_keys']:
+            cursor.execute(
+                f'ALTER TABLE {_qualify(STAGING_SCHEMA, table)} '
+                f'ADD CONSTRAINT {_quote(name)} {definition}'
+            )
+        for table in tables:
+            cursor.execute(f'ANALYZE {_qualify(STAGING_SCHEMA, table)}')
+
+        cursor.execute(f'SET search_path TO {search_path}')
+
+
+@transaction.atomic
+def swap_shadow_tables():
+    """
+    Make the shadow tables live and keep the replaced generation in the
+    previous generation schema.
+
+    Readers only wait for the duration of this transaction, which consists
+    of renames only.
+    """
+    live_schema = _get_current_schema()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP SCHEMA IF EXISTS {PREVIOUS_SCHEMA} CASCADE')
+        cursor.execute(f'CREATE SCHEMA {PREVIOUS_SCHEMA}')
+        _move_tables(cursor, live_schema, PREVIOUS_SCHEMA)
+        _move_tables(cursor, STAGING_SCHEMA, live_schema)
+        cursor.execute(f'DROP SCHEMA {STAGING_SCHEMA}')
+    DatasetGeneration.bump()
+
+
+@transaction.atomic
+def rollback_to_previous_generation():
+    """Swap the live dataset with the previous generation."""
+    live_schema = _get_current_schema()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_namespace WHERE nspname = %s',
+            [PREVIOUS_SCHEMA]
+        )
+        if cursor.fetchone() is None:
+            raise LookupError('There is no previous generation of the dataset')
+
+        cursor.execute(f'DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE')
+        cursor.execute(f'CREATE SCHEMA {STAGING_SCHEMA}')
+        _move_tables(cursor, live_schema, STAGING_SCHEMA)
+        _move_tables(cursor, PREVIOUS_SCHEMA, live_schema)
+        _move_tables(cursor, STAGING_SCHEMA, PREVIOUS_SCHEMA)
+        cursor.execute(f'DROP SCHEMA {STAGING_SCHEMA}')
+    DatasetGeneration.bump()
+
+
+def _move_tables(cursor, from_schema: str, to_schema: str):
+    # Indexes, constraints and owned sequences are moved together with
+    # the tables.
+    for table in get_dataset_tables():
+        cursor.execute(
+            f'ALTER TABLE {_qualify(from_schema, table)} '
+            f'SET SCHEMA {_quote(to_schema)}'
+        )
+
+
+def _create_sequences(cursor):
+    """
+    Give shadow tables their own primary key sequences.
+
+    Tables created with LIKE share the sequences of the live tables, which
+    would be moved away together with the live tables on swap.
+    """
+    models = list(DATASET_MODELS)
+    models.extend(
+        field.remote_field.through
+        for model in DATASET_MODELS
+        for field in model._meta.local_many_to_many
+    )
+    for model in models:
+        table = model._meta.db_table
+        column = model._meta.pk.column
+        sequence = _qualify(STAGING_SCHEMA, f'{table}_{column}_seq')
+        staging_table = _qualify(STAGING_SCHEMA, table)
+        cursor.execute(
+            f'CREATE SEQUENCE {sequence} '
+            f'OWNED BY {staging_table}.{_quote(column)}'
+        )
+        cursor.execute(
+            f'ALTER TABLE {staging_table} ALTER COLUMN {_quote(column)} '
+            f"SET DEFAULT nextval('{sequence}')"
+        )
+
+
+def _get_table_definitions(schema: str,
+                           tables: List[str]) -> Dict[str, List[Tuple]]:
+    """Constraints and indexes of the given tables that LIKE doesn't copy."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT table_class.relname, conname, contype,
+                   pg_get_constraintdef(pg_constraint.oid)
+            FROM pg_constraint
+            JOIN pg_class table_class
+                ON table_class.oid = pg_constraint.conrelid
+            WHERE table_class.relname = ANY(%s)
+              AND table_class.relnamespace = to_regnamespace(%s)
+              AND contype IN ('p', 'u', 'f')
+            ORDER BY contype DESC, conname
+            """,
+            [tables, schema]
+        )
+        constraints = cursor.fetchall()
+
+        cursor.execute(
+            """
+            SELECT table_class.relname, index_class.relname,
+                   pg_index.indisunique, pg_get_indexdef(index_class.oid)
+            FROM pg_index
+            JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+            JOIN pg_class table_class ON table_class.oid = pg_index.indrelid
+            WHERE table_class.relname = ANY(%s)
+              AND table_class.relnamespace = to_regnamespace(%s)
+              AND NOT EXISTS (
+                  SELECT 1 FROM pg_constraint
+                  WHERE pg_constraint.conindid = pg_index.indexrelid
+                    AND pg_constraint.contype IN ('p', 'u', 'x')
+              )
+            ORDER BY index_class.relname
+            """,
+            [tables, schema]
+        )
+        indexes = [
+            # Only the access method and columns part of the definition is
+            # kept, as the rest refers to the live table.
+            (table, name, is_unique, definition.split(' USING ', 1)[1])
+            for table, name, is_unique, definition in cursor.fetchall()
+        ]
+
+    return {
+        'unique_constraints': [
+            (table, name, definition)
+            for table, name, constraint_type, definition in constraints
+            if constraint_type in ('p', 'u')
+        ],
+        'foreign_keys': [
+            (table, name, definition)
+            for table, name, constraint_type, definition in constraints
+            if constraint_type == 'f'
+        ],
+        'indexes': indexes,
+    }
+
+
+def _get_current_schema() -> str:
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT current_schema()')
+        return cursor.fetchone()[0]
+
+
+def _quote(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def _qualify(schema: str, name: str) -> str:
+    return f'{_quote(schema)}.{_quote(name)}'
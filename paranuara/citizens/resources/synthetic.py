@@ -0,0 +1,118 @@
+"""
+Generator of synthetic resources compatible with people.json and
+companies.json.
+
+The provided resources are too small to find scaling problems, so this
+module generates datasets of arbitrary size. Entries are generated lazily
+and written one at a time, so the size of a generated dataset isn't limited
+by memory.
+"""
+import json
+import math
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator
+
+from citizens.models import Food
+
+EYE_COLORS = ['brown', 'blue', 'green']
+GENDERS = ['male', 'female']
+FOOD = Food.KNOWN_FRUITS + Food.KNOWN_VEGETABLES
+WORDS = [
+    'lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing',
+    'elit', 'sed', 'do', 'eiusmod', 'tempor', 'incididunt', 'ut', 'labore',
+    'et', 'dolore', 'magna', 'aliqua', 'enim', 'ad', 'minim', 'veniam',
+    'quis', 'nostrud', 'exercitation', 'ullamco', 'laboris', 'nisi',
+    'aliquip', 'ex', 'ea', 'commodo', 'consequat',
+]
+FIRST_NAMES = [
+    'Carmella', 'Decker', 'Bonnie', 'Ahi', 'Grace', 'Rosales', 'Mindy',
+    'Luna', 'Hobbs', 'Tanner', 'Kirsten', 'Lynette', 'Vincent', 'Dolly',
+]
+LAST_NAMES = [
+    'Lambert', 'Mckenzie', 'Bass', 'Moss', 'Rowe', 'Frost', 'Carey',
+    'Holland', 'Valdez', 'Ochoa', 'Gentry', 'Wolfe', 'Mercer', 'Blair',
+]
+STREET_SUFFIXES = ['Street', 'Place', 'Avenue', 'Court', 'Road', 'Lane']
+STATES = [
+    'American Samoa', 'Guam', 'Mississippi', 'Ohio', 'Utah', 'Vermont',
+    'Nevada', 'Alaska', 'Georgia', 'Palau',
+]
+
+REGISTRATION_START = datetime(2014, 1, 1, tzinfo=timezone.utc)
+
+
+def generate_companies(number_of_companies: int) -> Iterator[dict]:
+    for index in range(number_of_companies):
+        yield {'index': index, 'company': f'COMPANY{index}'}
+
+
+def generate_people(number_of_citizens: int, number_of_companies: int,
+                    mean_friends: float = 10,
+                    seed: int = 0) -> Iterator[dict]:
+    """
+    Generate citizen entries with a heavy-tailed friend degree distribution.
+
+    Degrees follow a log-normal distribution with the given mean, so most
+    citizens have a handful of friends and a few have hundreds or thousands,
+    like in real social graphs. Friends are drawn with a preference for
+    lower indexes, which creates popular citizens that are friends of many.
+    """
+    rng = random.Random(seed)
+    sigma = 1.0
+    mu = math.log(mean_friends) - sigma ** 2 / 2
+
+    for index in range(number_of_citizens):
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        degree = min(int(rng.lognormvariate(mu, sigma)), number_of_citizens)
+        friends = {
+            int(number_of_citizens * rng.random() ** 2)
+            for _ in range(degree)
+        }
+        registered_at = REGISTRATION_START + timedelta(
+            seconds=rng.randrange(5 * 365 * 24 * 3600)
+        )
+
+        yield {
+            '_id': f'{rng.getrandbits(96):024x}',
+            'index': index,
+            'guid': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'has_died': rng.random() < 0.3,
+            'balance': f'${rng.randrange(400000) / 100:,.2f}',
+            'picture': 'http://placehold.it/32x32',
+            'age': rng.randrange(10, 100),
+            'eyeColor': rng.choice(EYE_COLORS),
+            'name': name,
+            'gender': rng.choice(GENDERS),
+            'company_id': rng.randrange(number_of_companies) + 1,
+            'email': f"{name.replace(' ', '').lower()}{index}@example.com",
+            'phone': f'+1 ({rng.randrange(800, 1000)}) '
+                     f'{rng.randrange(400, 600)}-{rng.randrange(10000):04}',
+            'address': f'{rng.randrange(1, 1000)} '
+                       f'{rng.choice(WORDS).title()} '
+                       f'{rng.choice(STREET_SUFFIXES)}, '
+                       f'{rng.choice(WORDS).title()}, '
+                       f'{rng.choice(STATES)}, {rng.randrange(1000, 10000)}',
+            'about': ' '.join(rng.choices(WORDS, k=40)).capitalize() + '.\r\n',
+            'registered': registered_at.strftime('%Y-%m-%dT%H:%M:%S +00:00'),
+            'tags': rng.sample(WORDS, 7),
+            'friends': [{'index': friend} for friend in sorted(friends)],
+            'greeting': f'Hello, {name}! You have '
+                        f'{rng.randrange(10)} unread messages.',
+            'favouriteFood': rng.sample(FOOD, rng.randrange(1, 5)),
+        }
+
+
+def write_json_array(filename: str, entries: Iterable[dict]) -> int:
+    """Write entries into a JSON array file one by one. Returns the count."""
+    count = 0
+    with open(filename, mode='w') as file:
+        file.write('[')
+        for count, entry in enumerate(entries, start=1):
+            if count > 1:
+                file.write(',')
+            file.write('\n')
+            json.dump(entry, file)
+        file.write('\n]\n')
+    return count
@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TransactionTestCase
+
+from citizens.models import Citizen, Company, ImportCheckpoint
+from citizens.resources import checkpoints, test_importers
+from citizens.resources.checkpoints import import_resumable
+from citizens.resources.importers import import_friends, import_people
+from citizens.resources.parsing import DataImportError
+
+TEST_CITIZEN_ENTRY = test_importers.CitizenImporterTest.TEST_CITIZEN_ENTRY
+
+
+def fail_on_call(function, failing_call):
+    """Wrap the function to raise KeyboardInterrupt on the given call."""
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == failing_call:
+            raise KeyboardInterrupt
+        return function(*args, **kwargs)
+
+    return wrapper
+
+
+class ImportResumableTest(TransactionTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.companies_filename = os.path.join(directory.name,
+                                               'companies.json')
+        self.people_filename = os.path.join(directory.name, 'people.json')
+
+        with open(self.companies_filename, mode='w') as file:
+            json.dump([{'index': 57, 'company': 'SOME_COMPANY'}], file)
+        # Every citizen is a friend of the last one, which is only imported
+        # in the last chunk.
+        self.entries = [
+            {
+                **TEST_CITIZEN_ENTRY,
+                'index': index,
+                '_id': f'id-{index}',
+                'guid': f'guid-{index}',
+                'friends': [{'index': 4}],
+            }
+            for index in range(5)
+        ]
+        with open(self.people_filename, mode='w') as file:
+            json.dump(self.entries, file)
+
+    def _import(self):
+        import_resumable(self.companies_filename, self.people_filename,
+                         chunk_size=2)
+
+    def test_imports_all_data(self):
+        self._import()
+
+        self.assertEqual(Company.objects.count(), 1)
+        self.assertEqual(
+            list(Citizen.objects.values_list('id', flat=True)),
+            [0, 1, 2, 3, 4]
+        )
+        self.assertEqual(Citizen.friends.through.objects.count(), 5)
+        self.assertEqual(ImportCheckpoint.objects.exists(), False)
+
+    def test_resumes_interrupted_citizens_phase(self):
+        with mock.patch.object(checkpoints, 'import_people',
+                               fail_on_call(import_people, 2)):
+            with self.assertRaises(KeyboardInterrupt):
+                self._import()
+
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual(checkpoint.phase, ImportCheckpoint.CITIZENS)
+        self.assertEqual(checkpoint.last_index, 1)
+        self.assertEqual(
+            list(Citizen.objects.values_list('id', flat=True)),
+            [0, 1]
+        )
+
+        self._import()
+
+        self.assertEqual(Company.objects.count(), 1)
+        self.assertEqual(Citizen.objects.count(), 5)
+        self.assertEqual(Citizen.friends.through.objects.count(), 5)
+        self.assertEqual(ImportCheckpoint.objects.exists(), False)
+
+    def test_resumes_interrupted_friends_phase(self):
+        with mock.patch.object(checkpoints, 'import_friends',
+                               fail_on_call(import_friends, 3)):
+            with self.assertRaises(KeyboardInterrupt):
+                self._import()
+
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual(checkpoint.phase, ImportCheckpoint.FRIENDS)
+        self.assertEqual(checkpoint.last_index, 3)
+        self.assertEqual(Citizen.objects.count(), 5)
+        self.assertEqual(Citizen.friends.through.objects.count(), 4)
+
+        self._import()
+
+        self.assertEqual(Citizen.friends.through.objects.count(), 5)
+        self.assertEqual(ImportCheckpoint.objects.exists(), False)
+
+    def test_raises_error_when_resource_changed(self):
+        with mock.patch.object(checkpoints, 'import_people',
+                               fail_on_call(import_people, 2)):
+            with self.assertRaises(KeyboardInterrupt):
+                self._import()
+        with open(self.people_filename, mode='w') as file:
+            json.dump(self.entries[:3], file)
+
+        with self.assertRaises(DataImportError):
+            self._import()
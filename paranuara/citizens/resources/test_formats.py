@@ -0,0 +1,93 @@
+import bz2
+import gzip
+import io
+import json
+import lzma
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from citizens.resources.formats import decompressed, open_resource
+from citizens.resources.importers import get_data_from_json_file, \
+    stream_data_from_json_file, JsonEntryReader
+from citizens.resources.parsing import DataImportError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ENTRIES = [{'index': index, 'company': f'Ĉompany {index}'}
+           for index in range(50)]
+
+
+def as_json_array(entries):
+    return json.dumps(entries, indent=2, ensure_ascii=False).encode()
+
+
+def as_ndjson(entries):
+    return ''.join(
+        json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries
+    ).encode()
+
+
+class ResourceFormatsTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, 'resource')
+
+    def _write(self, content: bytes):
+        with open(self.filename, mode='wb') as file:
+            file.write(content)
+
+    def test_reads_json_array_and_ndjson(self):
+        compressions = {
+            'none': lambda content: content,
+            'gzip': gzip.compress,
+            'bzip2': bz2.compress,
+            'xz': lzma.compress,
+        }
+        if zstandard is not None:
+            compressions['zstd'] = zstandard.ZstdCompressor().compress
+
+        for serialize in [as_json_array, as_ndjson]:
+            for name, compress in compressions.items():
+                with self.subTest(serialize.__name__, compression=name):
+                    self._write(compress(serialize(ENTRIES)))
+
+                    self.assertEqual(
+                        list(stream_data_from_json_file(self.filename)),
+                        ENTRIES
+                    )
+                    self.assertEqual(get_data_from_json_file(self.filename),
+                                     ENTRIES)
+
+    def test_resumes_compressed_ndjson(self):
+        self._write(gzip.compress(as_ndjson(ENTRIES)))
+        with open_resource(self.filename) as file:
+            reader = JsonEntryReader(file)
+            for entry in reader:
+                if entry['index'] == 9:
+                    break
+
+        self.assertEqual(
+            list(stream_data_from_json_file(self.filename,
+                                            offset=reader.offset)),
+            ENTRIES[10:]
+        )
+
+    def test_reads_standard_input(self):
+        stdin = io.TextIOWrapper(io.BytesIO(gzip.compress(as_ndjson(ENTRIES))))
+
+        with mock.patch('sys.stdin', stdin):
+            self.assertEqual(list(stream_data_from_json_file('-')), ENTRIES)
+
+    @unittest.skipIf(zstandard is not None, 'zstandard is installed')
+    def test_zstd_requires_zstandard_package(self):
+        with self.assertRaises(DataImportError):
+            decompressed(io.BytesIO(b'\x28\xb5\x2f\xfd\x00\x00'))
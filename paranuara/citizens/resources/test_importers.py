@@ -1,11 +1,16 @@
+import io
+import json
 from datetime import datetime
 
 import pytz
-from django.test import TransactionTestCase
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 
-from citizens.models import Company, Citizen, Food, Tag
+from citizens.models import Address, Company, Citizen, Food, Tag
 from citizens.resources.importers import import_companies, import_people, \
-    DataImportError, _company_id_to_index
+    DataImportError, DimensionCache, JsonEntryReader
+from citizens.resources.parsing import _company_id_to_index
 
 
 class CompaniesImporterTest(TransactionTestCase):
@@ -36,6 +41,116 @@ class CompaniesImporterTest(TransactionTestCase):
         self.assertEqual(Company.objects.exists(), False)
 
 
+class JsonEntryReaderTest(SimpleTestCase):
+
+    def test_reads_entries_split_across_chunks(self):
+        entries = [{'index': i, 'company': 'C' * i} for i in range(20)]
+        file = io.StringIO(json.dumps(entries, indent=2))
+
+        read_entries = list(JsonEntryReader(file, chunk_size=7))
+
+        self.assertEqual(read_entries, entries)
+
+    def test_numbers_are_not_cut_at_chunk_boundary(self):
+        file = io.StringIO('[12345, 678]')
+
+        self.assertEqual(list(JsonEntryReader(file, chunk_size=3)), [12345, 678])
+
+    def test_fractions_are_not_cut_at_chunk_boundary(self):
+        file = io.StringIO('-0.5\n1e-7')
+
+        self.assertEqual(list(JsonEntryReader(file, chunk_size=3)), [-0.5, 1e-7])
+
+    def test_empty_array(self):
+        file = io.StringIO(' [ ] ')
+
+        self.assertEqual(list(JsonEntryReader(file)), [])
+
+    def test_reads_newline_delimited_json(self):
+        file = io.StringIO('{"index": 0}\n\n{"index": 1}\r\n{"index": 2}')
+
+        self.assertEqual(list(JsonEntryReader(file, chunk_size=5)),
+                         [{'index': 0}, {'index': 1}, {'index': 2}])
+
+    def test_empty_file(self):
+        self.assertEqual(list(JsonEntryReader(io.StringIO(' \n'))), [])
+
+    def test_resumes_after_offset_of_read_entry(self):
+        entries = [{'index': i, 'name': 'Ĺuna ' * i} for i in range(6)]
+        content = json.dumps(entries, indent=2, ensure_ascii=False).encode()
+
+        reader = JsonEntryReader(io.BytesIO(content), chunk_size=5)
+        for entry in reader:
+            if entry['index'] == 2:
+                break
+        resumed_reader = JsonEntryReader(io.BytesIO(content), chunk_size=5,
+                                         offset=reader.offset)
+
+        self.assertEqual(list(resumed_reader), entries[3:])
+
+    def test_resuming_after_last_entry_reads_nothing(self):
+        content = b'[1, 2]'
+        reader = JsonEntryReader(io.BytesIO(content))
+        list(reader)
+
+        self.assertEqual(
+            list(JsonEntryReader(io.BytesIO(content), offset=reader.offset)),
+            []
+        )
+
+    def test_raises_error_on_malformed_json(self):
+        for malformed_json in ['{"index": 0} ]', '[{"index": 0}', '[{"ind',
+                               '[1 2]', '[1,]', '[1] 2']:
+            with self.subTest(malformed_json):
+                with self.assertRaises(DataImportError):
+                    list(JsonEntryReader(io.StringIO(malformed_json),
+                                         chunk_size=4))
+
+    def test_stops_reading_at_malformed_entry(self):
+        file = io.StringIO(
+            '[{"index": 0}, {"index": x}, '
+            + ', '.join('{"index": %d}' % index for index in range(1, 10000))
+            + ']'
+        )
+
+        with self.assertRaises(DataImportError):
+            list(JsonEntryReader(file, chunk_size=16))
+
+        # Only the chunks up to the malformed entry were read.
+        self.assertLess(file.tell(), 100)
+
+    def test_raises_error_on_too_long_entry(self):
+        file = io.StringIO('[{"index": 0}, {"name": "%s"}]' % ('a' * 100))
+
+        entries = iter(JsonEntryReader(file, chunk_size=8,
+                                       max_entry_length=50))
+
+        self.assertEqual(next(entries), {'index': 0})
+        with self.assertRaisesMessage(DataImportError,
+                                      'JSON entry longer than 50 characters'):
+            list(entries)
+
+
+class DimensionCacheTest(TransactionTestCase):
+
+    def test_resolves_names_to_ids(self):
+        existing_tag = Tag.objects.create(name='existing')
+        cache = DimensionCache(Tag, 'name', lambda name: Tag(name=name))
+
+        cache.resolve(['existing', 'new', 'new'])
+
+        self.assertEqual(cache['existing'], existing_tag.id)
+        self.assertEqual(cache['new'], Tag.objects.get(name='new').id)
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_known_names_are_not_queried_again(self):
+        cache = DimensionCache(Tag, 'name', lambda name: Tag(name=name))
+        cache.resolve(['some_tag', 'other_tag'])
+
+        with self.assertNumQueries(0):
+            cache.resolve(['other_tag', 'some_tag'])
+
+
 class CitizenImporterTest(TransactionTestCase):
     TEST_CITIZEN_ENTRY = {
         "_id": "595eeb9b96d80a5bc7afb106",
@@ -179,3 +294,72 @@ class CitizenImporterTest(TransactionTestCase):
             list(second_citizen.friends.all()),
             []
         )
+
+    def test_query_count_does_not_grow_with_citizens(self):
+        def import_and_count_queries(number_of_citizens):
+            entries = []
+            for index in range(number_of_citizens):
+                entries.append({
+                    **self.TEST_CITIZEN_ENTRY,
+                    'index': index,
+                    '_id': f'id-{index}',
+                    'guid': f'guid-{index}',
+                    'friends': [{'index': 0}, {'index': index}],
+                })
+            with CaptureQueriesContext(connection) as context:
+                import_people(entries)
+            Citizen.objects.all().delete()
+            return len(context.captured_queries)
+
+        self.assertEqual(import_and_count_queries(2),
+                         import_and_count_queries(20))
+
+    def test_duplicated_relations_are_imported_once(self):
+        entry = {
+            **self.TEST_CITIZEN_ENTRY,
+            'tags': ['test_tag', 'test_tag'],
+            'favouriteFood': ['apple', 'apple'],
+            'friends': [{'index': 0}, {'index': 0}],
+        }
+
+        import_people([entry])
+
+        citizen = Citizen.objects.get()
+        self.assertEqual(citizen.tags.count(), 1)
+        self.assertEqual(citizen.favourite_food.count(), 1)
+        self.assertEqual(list(citizen.friends.all()), [citizen])
+
+    def test_identical_addresses_are_stored_once(self):
+        entries = [
+            {
+                **self.TEST_CITIZEN_ENTRY,
+                'friends': [],
+                'address': '1  Some Street , City, State, 1234',
+            },
+            {
+                **self.SECOND_CITIZEN_ENTRY,
+                'friends': [],
+                'address': '1 Some Street, City, State, 1234',
+            },
+        ]
+
+        # Also across batches.
+        import_people(entries, batch_size=1)
+
+        address = Address.objects.get()
+        self.assertEqual(str(address), '1 Some Street, City, State, 1234')
+        self.assertEqual(
+            list(Citizen.objects.values_list('address_id', flat=True)),
+            [address.id, address.id]
+        )
+
+    def test_friends_across_batches(self):
+        first_entry = {**self.TEST_CITIZEN_ENTRY, 'friends': [{"index": 1}]}
+        second_entry = {**self.SECOND_CITIZEN_ENTRY, 'friends': [{"index": 0}]}
+
+        import_people(iter([first_entry, second_entry]), batch_size=1)
+
+        first_citizen = Citizen.objects.get(id=0)
+        second_citizen = Citizen.objects.get(id=1)
+        self.assertEqual(list(first_citizen.friends.all()), [second_citizen])
+        self.assertEqual(list(second_citizen.friends.all()), [first_citizen])
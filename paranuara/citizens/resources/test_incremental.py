@@ -0,0 +1,140 @@
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from citizens.models import Address, Citizen, Company
+from citizens.resources import test_importers
+from citizens.resources.importers import import_companies, import_people, \
+    DataImportError
+from citizens.resources.incremental import upsert_companies, upsert_people
+
+TEST_CITIZEN_ENTRY = test_importers.CitizenImporterTest.TEST_CITIZEN_ENTRY
+
+TRANSACTION_CONTROL = ['BEGIN', 'SAVEPOINT', 'RELEASE', 'COMMIT']
+
+
+class UpsertCompaniesTest(TransactionTestCase):
+
+    def test_creates_updates_and_deletes_companies(self):
+        import_companies([
+            {'index': 0, 'company': 'UNCHANGED'},
+            {'index': 1, 'company': 'OLD_NAME'},
+            {'index': 2, 'company': 'REMOVED'},
+        ])
+
+        summary = upsert_companies([
+            {'index': 0, 'company': 'UNCHANGED'},
+            {'index': 1, 'company': 'NEW_NAME'},
+            {'index': 3, 'company': 'NEW'},
+        ])
+
+        self.assertEqual(
+            list(Company.objects.order_by('id').values_list('id', 'name')),
+            [(0, 'UNCHANGED'), (1, 'NEW_NAME'), (3, 'NEW')]
+        )
+        self.assertEqual(
+            summary,
+            {'created': 1, 'updated': 1, 'unchanged': 1, 'deleted': 1}
+        )
+
+
+class UpsertPeopleTest(TransactionTestCase):
+
+    def setUp(self):
+        Company.objects.create(id=57, name="SOME_COMPANY")
+        self.entries = [
+            {
+                **TEST_CITIZEN_ENTRY,
+                'index': index,
+                '_id': f'id-{index}',
+                'guid': f'guid-{index}',
+                'friends': [{'index': 0}],
+            }
+            for index in range(4)
+        ]
+        import_people(self.entries)
+
+    def test_only_changed_citizens_are_written(self):
+        changed_entry = {
+            **self.entries[1],
+            'name': 'Changed Name',
+            'address': '1 New Street, New City, New State, 1234',
+            'tags': ['new_tag'],
+            'friends': [{'index': 2}],
+        }
+        new_entry = {
+            **TEST_CITIZEN_ENTRY,
+            'index': 4,
+            '_id': 'id-4',
+            'guid': 'guid-4',
+            'friends': [{'index': 1}],
+        }
+        entries = [self.entries[0], changed_entry, self.entries[2], new_entry]
+
+        summary = upsert_people(entries, batch_size=2)
+
+        self.assertEqual(
+            summary,
+            {'created': 1, 'updated': 1, 'unchanged': 2, 'deleted': 1}
+        )
+        self.assertEqual(
+            list(Citizen.objects.values_list('id', flat=True)),
+            [0, 1, 2, 4]
+        )
+        changed_citizen = Citizen.objects.get(id=1)
+        self.assertEqual(changed_citizen.name, 'Changed Name')
+        self.assertEqual(str(changed_citizen.address),
+                         '1 New Street, New City, New State, 1234')
+        self.assertEqual(
+            list(changed_citizen.tags.values_list('name', flat=True)),
+            ['new_tag']
+        )
+        self.assertEqual(
+            list(changed_citizen.friends.values_list('id', flat=True)),
+            [2]
+        )
+        self.assertEqual(
+            list(Citizen.objects.get(id=4).friends.values_list('id',
+                                                               flat=True)),
+            [1]
+        )
+        # The original address shared by the other citizens and the new one.
+        self.assertEqual(Address.objects.count(), 2)
+
+    def test_addresses_left_empty_are_deleted(self):
+        moved_entries = [
+            {**entry, 'address': '1 New Street, New City, New State, 1234'}
+            for entry in self.entries
+        ]
+
+        upsert_people(moved_entries, batch_size=2)
+
+        self.assertEqual(
+            [str(address) for address in Address.objects.all()],
+            ['1 New Street, New City, New State, 1234']
+        )
+
+    def test_unchanged_batches_are_not_written(self):
+        with CaptureQueriesContext(connection) as context:
+            summary = upsert_people(self.entries, batch_size=2)
+
+        # One lookup per batch and one listing of citizen ids for deletions,
+        # besides the transaction control some backends count as queries.
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].split()[0] not in TRANSACTION_CONTROL
+        ]
+        self.assertEqual(len(queries), 3)
+
+        self.assertEqual(
+            summary,
+            {'created': 0, 'updated': 0, 'unchanged': 4, 'deleted': 0}
+        )
+
+    def test_raises_error_when_index_of_citizen_changes(self):
+        entries = [{**self.entries[0], 'index': 10}]
+
+        with self.assertRaises(DataImportError):
+            upsert_people(entries)
+
+        self.assertEqual(Citizen.objects.count(), 4)
@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.test import TransactionTestCase
+
+from citizens.models import Company, Tag
+from citizens.resources import test_importers
+from citizens.resources.importers import import_companies, import_people
+from citizens.resources.instrumentation import ImportProgress
+
+TEST_CITIZEN_ENTRY = test_importers.CitizenImporterTest.TEST_CITIZEN_ENTRY
+
+
+class TerminalOutput(StringIO):
+
+    def isatty(self):
+        return True
+
+
+class ImportProgressTest(TransactionTestCase):
+
+    def test_stages_are_accumulated(self):
+        progress = ImportProgress()
+
+        for _ in range(2):
+            with progress.stage('tags', rows=3):
+                Tag.objects.count()
+        with progress.stage('companies') as stage:
+            stage.rows += 5
+
+        stages = {
+            stage['stage']: stage for stage in progress.summary()['stages']
+        }
+        self.assertEqual(list(stages), ['tags', 'companies'])
+        self.assertEqual(stages['tags']['rows'], 6)
+        self.assertEqual(stages['tags']['queries'], 2)
+        self.assertEqual(stages['companies']['rows'], 5)
+        self.assertEqual(stages['companies']['queries'], 0)
+        self.assertNotIn('peak_rss_kb', stages['tags'])
+        self.assertGreater(progress.summary()['peak_rss_kb'], 0)
+
+    def test_timed_iter_counts_items(self):
+        progress = ImportProgress()
+
+        batches = list(progress.timed_iter('parse', iter([[1, 2], [3]])))
+
+        self.assertEqual(batches, [[1, 2], [3]])
+        self.assertEqual(progress.summary()['stages'][0]['rows'], 3)
+
+    def test_progress_line_is_drawn_on_terminal_only(self):
+        terminal = TerminalOutput()
+        file = StringIO()
+
+        for stream in [terminal, file]:
+            progress = ImportProgress(stream=stream)
+            progress.advance(10)
+            progress.finish()
+
+        self.assertIn('10 rows imported', terminal.getvalue())
+        self.assertTrue(terminal.getvalue().endswith('\n'))
+        self.assertEqual(file.getvalue(), '')
+
+    def test_importers_report_stages(self):
+        progress = ImportProgress()
+
+        import_companies([{'index': 57, 'company': 'SOME_COMPANY'}],
+                         progress=progress)
+        import_people(
+            [{**TEST_CITIZEN_ENTRY, 'friends': [{'index': 0}]}],
+            progress=progress
+        )
+
+        summary = progress.summary()
+        self.assertEqual(summary['rows'], 2)
+        stages = {stage['stage']: stage for stage in summary['stages']}
+        self.assertEqual(
+            list(stages),
+            ['companies', 'people.parse', 'people.dimensions',
+             'people.citizens', 'people.relations', 'people.friends']
+        )
+        self.assertEqual(stages['people.citizens']['rows'], 1)
+        self.assertEqual(stages['people.friends']['rows'], 1)
+        self.assertEqual(stages['people.friends']['queries'], 1)
+        self.assertEqual(Company.objects.count(), 1)
@@ -0,0 +1,66 @@
+from django.test import SimpleTestCase
+
+from citizens.resources import test_importers
+from citizens.resources.parsing import DataImportError, \
+    find_citizen_entry_errors, parse_citizen_batches
+
+TEST_CITIZEN_ENTRY = test_importers.CitizenImporterTest.TEST_CITIZEN_ENTRY
+
+
+class ParseCitizenBatchesTest(SimpleTestCase):
+
+    def setUp(self):
+        self.entries = [
+            {
+                **TEST_CITIZEN_ENTRY,
+                'index': index,
+                '_id': f'id-{index}',
+                'guid': f'guid-{index}',
+                'balance': f'${index},000.{index % 100:02}',
+            }
+            for index in range(50)
+        ]
+
+    def test_parallel_results_are_identical_to_serial(self):
+        serial_batches = list(parse_citizen_batches(self.entries, 7))
+        parallel_batches = list(
+            parse_citizen_batches(iter(self.entries), 7, workers=3)
+        )
+
+        self.assertEqual(parallel_batches, serial_batches)
+        self.assertEqual([len(batch) for batch in serial_batches],
+                         [7, 7, 7, 7, 7, 7, 7, 1])
+
+    def test_raises_error_on_malformed_entry_in_worker(self):
+        entries = self.entries + [{'index': 50}]
+
+        with self.assertRaises(DataImportError):
+            list(parse_citizen_batches(entries, 7, workers=3))
+
+
+class FindCitizenEntryErrorsTest(SimpleTestCase):
+
+    def test_valid_entry_has_no_errors(self):
+        self.assertEqual(find_citizen_entry_errors(TEST_CITIZEN_ENTRY), [])
+
+    def test_reports_every_problem_of_the_entry(self):
+        entry = {
+            **TEST_CITIZEN_ENTRY,
+            'age': '33',
+            'balance': '12 dollars',
+            'friends': [{'index': 1}, {'idx': 2}],
+            'nickname': 'Bob',
+        }
+        del entry['guid']
+
+        self.assertEqual(find_citizen_entry_errors(entry), [
+            'missing fields: guid',
+            'unexpected fields: nickname',
+            "balance: expected an amount like $2,418.59, got '12 dollars'",
+            "age: expected an integer, got str '33'",
+            "friends: missing index of a friend in {'idx': 2}",
+        ])
+
+    def test_reports_entry_that_is_not_an_object(self):
+        self.assertEqual(find_citizen_entry_errors([1, 2]),
+                         ['expected an object, got list [1, 2]'])
@@ -0,0 +1,98 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TransactionTestCase
+
+from citizens.models import Address, Citizen, Company
+from citizens.resources import test_importers
+from citizens.resources.importers import DataImportError
+from citizens.resources.instrumentation import ImportProgress
+from citizens.resources.parsing import _company_id_to_index
+from citizens.resources.pg_copy import copy_people, LOADED_MODELS
+
+TEST_CITIZEN_ENTRY = test_importers.CitizenImporterTest.TEST_CITIZEN_ENTRY
+
+
+@skipUnless(connection.vendor == 'postgresql', "COPY needs PostgreSQL")
+class CopyPeopleTest(TransactionTestCase):
+
+    def setUp(self):
+        Company.objects.create(
+            id=_company_id_to_index(58),
+            name="SOME_COMPANY"
+        )
+        self.first_entry = {
+            **TEST_CITIZEN_ENTRY,
+            'about': 'Tabs\tnew lines\r\n and back\\slashes',
+            'friends': [{'index': 0}, {'index': 1}],
+        }
+        self.second_entry = {
+            **TEST_CITIZEN_ENTRY,
+            'index': 1,
+            '_id': 'second_id',
+            'guid': 'second_guid',
+            'tags': ['test_tag'],
+            'friends': [],
+        }
+
+    def test_copies_citizens_and_relations(self):
+        copy_people([self.first_entry, self.second_entry], batch_size=1)
+
+        first_citizen = Citizen.objects.get(id=0)
+        second_citizen = Citizen.objects.get(id=1)
+        self.assertEqual(first_citizen.about, self.first_entry['about'])
+        self.assertEqual(first_citizen.balance_in_cents, 241859)
+        self.assertEqual(first_citizen.has_died, True)
+        self.assertEqual(first_citizen.eye_color.color_name, 'blue')
+        self.assertEqual(str(first_citizen.address),
+                         '628 Sumner Place, Sperryville, American Samoa, 9819')
+        self.assertEqual(first_citizen.company.name, 'SOME_COMPANY')
+        self.assertEqual(
+            {food.name for food in first_citizen.favourite_food.all()},
+            {'beetroot', 'strawberry', 'mushroom'}
+        )
+        self.assertEqual(
+            list(first_citizen.tags.values_list('name', flat=True)),
+            ['test_tag', 'test_tag_two']
+        )
+        self.assertEqual(list(first_citizen.friends.all()),
+                         [first_citizen, second_citizen])
+        # Both entries have the same address, which is stored once.
+        self.assertEqual(first_citizen.address_id, second_citizen.address_id)
+        self.assertEqual(Address.objects.count(), 1)
+
+    def test_copy_statements_are_counted_as_queries(self):
+        progress = ImportProgress()
+
+        copy_people([self.first_entry, self.second_entry], batch_size=1,
+                    progress=progress)
+
+        stages = {stage['stage']: stage
+                  for stage in progress.summary()['stages']}
+        # One COPY per table and batch.
+        self.assertEqual(stages['people.citizens']['queries'], 2)
+        self.assertEqual(stages['people.relations']['queries'], 4)
+        self.assertEqual(stages['people.friends']['queries'], 2)
+
+    def test_secondary_indexes_are_rebuilt(self):
+        indexes_before = _get_index_definitions()
+
+        copy_people([self.first_entry, self.second_entry])
+
+        self.assertEqual(_get_index_definitions(), indexes_before)
+
+    def test_raises_error_on_malformed_citizen_data(self):
+        with self.assertRaises(DataImportError):
+            copy_people([self.first_entry, {'index': 1}])
+
+        self.assertEqual(Citizen.objects.exists(), False)
+
+
+def _get_index_definitions():
+    tables = [model._meta.db_table for model in LOADED_MODELS]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT indexdef FROM pg_indexes WHERE tablename = ANY(%s)',
+            [tables]
+        )
+        return sorted(row[0] for row in cursor.fetchall())
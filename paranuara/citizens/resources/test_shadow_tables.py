@@ -0,0 +1,128 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TransactionTestCase
+
+from citizens.models import Citizen, Company, get_dataset_tables
+from citizens.resources import test_importers
+from citizens.resources.importers import import_companies, import_people, \
+    DataImportError
+from citizens.resources.pg_copy import copy_people
+from citizens.resources.shadow_tables import shadow_tables, \
+    swap_shadow_tables, rollback_to_previous_generation, PREVIOUS_SCHEMA, \
+    STAGING_SCHEMA
+
+TEST_CITIZEN_ENTRY = test_importers.CitizenImporterTest.TEST_CITIZEN_ENTRY
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            "Shadow tables need PostgreSQL schemas")
+class ShadowTablesTest(TransactionTestCase):
+
+    def setUp(self):
+        import_companies([{'index': 57, 'company': 'OLD_COMPANY'}])
+        import_people([{**TEST_CITIZEN_ENTRY, 'friends': []}])
+        self.new_entries = [
+            {
+                **TEST_CITIZEN_ENTRY,
+                'index': index,
+                '_id': f'id-{index}',
+                'guid': f'guid-{index}',
+                'friends': [{'index': 1}],
+            }
+            for index in range(1, 3)
+        ]
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            for schema in [STAGING_SCHEMA, PREVIOUS_SCHEMA]:
+                cursor.execute(f'DROP SCHEMA IF EXISTS {schema} CASCADE')
+
+    def test_live_tables_are_untouched_until_swap(self):
+        with shadow_tables():
+            import_companies([{'index': 57, 'company': 'NEW_COMPANY'}])
+            copy_people(self.new_entries)
+
+            self.assertEqual(
+                list(Citizen.objects.values_list('id', flat=True)),
+                [1, 2]
+            )
+            self.assertEqual(_count_live_citizens(), 1)
+
+        self.assertEqual(
+            list(Citizen.objects.values_list('id', flat=True)),
+            [0]
+        )
+
+        swap_shadow_tables()
+
+        self.assertEqual(
+            list(Citizen.objects.values_list('id', flat=True)),
+            [1, 2]
+        )
+        self.assertEqual(Company.objects.get().name, 'NEW_COMPANY')
+        self.assertEqual(
+            list(Citizen.objects.get(id=2).friends.values_list('id',
+                                                               flat=True)),
+            [1]
+        )
+
+    def test_indexes_and_constraints_are_recreated(self):
+        indexes_before = _get_live_definitions()
+
+        with shadow_tables():
+            import_companies([{'index': 57, 'company': 'NEW_COMPANY'}])
+            import_people(self.new_entries)
+        swap_shadow_tables()
+
+        self.assertEqual(_get_live_definitions(), indexes_before)
+
+    def test_rollback_to_previous_generation(self):
+        with shadow_tables():
+            import_companies([{'index': 57, 'company': 'NEW_COMPANY'}])
+            import_people(self.new_entries)
+        swap_shadow_tables()
+
+        rollback_to_previous_generation()
+
+        self.assertEqual(
+            list(Citizen.objects.values_list('id', flat=True)),
+            [0]
+        )
+        self.assertEqual(Company.objects.get().name, 'OLD_COMPANY')
+
+    def test_failed_load_leaves_live_tables_untouched(self):
+        with self.assertRaises(DataImportError):
+            with shadow_tables():
+                import_people([{'index': 5}])
+
+        self.assertEqual(
+            list(Citizen.objects.values_list('id', flat=True)),
+            [0]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT current_schema()')
+            self.assertEqual(cursor.fetchone()[0], 'public')
+
+
+def _count_live_citizens():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM public.citizens_citizen')
+        return cursor.fetchone()[0]
+
+
+def _get_live_definitions():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = 'public' AND tablename = ANY(%s)",
+            [get_dataset_tables()]
+        )
+        indexes = {row[0] for row in cursor.fetchall()}
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid::regclass::text = ANY(%s)",
+            [get_dataset_tables()]
+        )
+        constraints = set(cursor.fetchall())
+    return indexes, constraints
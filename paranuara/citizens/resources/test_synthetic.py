@@ -0,0 +1,40 @@
+from django.test import SimpleTestCase
+
+from citizens.resources.parsing import parse_citizen_entry, \
+    parse_company_entry
+from citizens.resources.synthetic import generate_companies, generate_people
+
+
+class GeneratePeopleTest(SimpleTestCase):
+
+    def test_entries_can_be_parsed(self):
+        for entry in generate_people(50, 3):
+            record = parse_citizen_entry(entry)
+
+            self.assertTrue(0 <= record.citizen_fields['company_id'] < 3)
+            self.assertTrue(all(0 <= friend < 50
+                                for friend in record.friends))
+
+    def test_same_seed_generates_same_entries(self):
+        self.assertEqual(list(generate_people(20, 3, seed=1)),
+                         list(generate_people(20, 3, seed=1)))
+        self.assertNotEqual(list(generate_people(20, 3, seed=1)),
+                            list(generate_people(20, 3, seed=2)))
+
+    def test_friend_degrees_are_heavy_tailed(self):
+        degrees = [
+            len(entry['friends'])
+            for entry in generate_people(2000, 3, mean_friends=10)
+        ]
+
+        self.assertAlmostEqual(sum(degrees) / len(degrees), 10, delta=1.5)
+        self.assertGreater(max(degrees), 50)
+
+
+class GenerateCompaniesTest(SimpleTestCase):
+
+    def test_entries_can_be_parsed(self):
+        self.assertEqual(
+            [parse_company_entry(entry) for entry in generate_companies(2)],
+            [(0, 'COMPANY0'), (1, 'COMPANY1')]
+        )
@@ -0,0 +1,92 @@
+from django.test import SimpleTestCase
+
+from citizens.resources import test_importers
+from citizens.resources.validation import IndexSet, ValidationError, \
+    validate_resources
+
+TEST_CITIZEN_ENTRY = test_importers.CitizenImporterTest.TEST_CITIZEN_ENTRY
+
+
+class ValidateResourcesTest(SimpleTestCase):
+
+    def setUp(self):
+        self.companies = [{'index': 57, 'company': 'SOME_COMPANY'}]
+        self.people = [
+            {
+                **TEST_CITIZEN_ENTRY,
+                'index': index,
+                '_id': f'id-{index}',
+                'guid': f'guid-{index}',
+                'friends': [{'index': (index + 1) % 20}],
+            }
+            for index in range(20)
+        ]
+
+    def test_valid_resources_have_no_errors(self):
+        self.assertEqual(validate_resources(self.companies, self.people), [])
+
+    def test_reports_every_error_with_its_record(self):
+        self.people[3]['age'] = 'old'
+        self.people[3]['company_id'] = 7
+        self.people[11]['friends'] = [{'index': 0}, {'index': 404}]
+        self.people[15]['index'] = 4
+        del self.people[17]['name']
+
+        errors = validate_resources(self.companies, self.people, batch_size=6)
+
+        self.assertEqual(errors, [
+            ValidationError('people', 3, "age: expected an integer, got str "
+                                         "'old'"),
+            ValidationError('people', 3, "company_id 7 doesn't match any "
+                                         "company"),
+            ValidationError('people', 11, "friend index 404 doesn't match "
+                                          "any citizen"),
+            ValidationError('people', 14, "friend index 15 doesn't match any "
+                                          "citizen"),
+            ValidationError('people', 15, 'duplicated index 4'),
+            ValidationError('people', 17, 'missing fields: name'),
+        ])
+        self.assertEqual(str(errors[-1]),
+                         'people record 17: missing fields: name')
+
+    def test_malformed_entry_still_defines_its_index(self):
+        self.people[5]['balance'] = None
+
+        errors = validate_resources(self.companies, self.people)
+
+        self.assertEqual(errors, [ValidationError(
+            'people', 5, 'balance: expected a string, got NoneType None'
+        )])
+
+    def test_reports_malformed_companies(self):
+        self.companies += [{'index': 57, 'company': 'COPY'}, {'name': 'X'}]
+
+        self.assertEqual(validate_resources(self.companies, self.people), [
+            ValidationError('companies', 1, 'duplicated index 57'),
+            ValidationError('companies', 2, 'missing field index'),
+            ValidationError('companies', 2, 'missing field company'),
+        ])
+
+    def test_parallel_results_are_identical_to_serial(self):
+        self.people[2]['friends'] = [{'index': -1}]
+        self.people[9]['tags'] = 'tag'
+
+        self.assertEqual(
+            validate_resources(self.companies, iter(self.people),
+                               batch_size=3, workers=3),
+            validate_resources(self.companies, self.people, batch_size=3),
+        )
+
+
+class IndexSetTest(SimpleTestCase):
+
+    def test_contains_added_indexes(self):
+        indexes = IndexSet()
+        for index in [0, 9, 1000, -5, IndexSet.MAX_BITMAP_INDEX + 1]:
+            indexes.add(index)
+
+        self.assertEqual(
+            [index in indexes for index in
+             [0, 1, 9, 1000, 1001, -5, IndexSet.MAX_BITMAP_INDEX + 1]],
+            [True, False, True, True, False, True, True]
+        )
@@ -0,0 +1,233 @@
+"""
+Validation of resources without importing them.
+
+An import stops on the first malformed entry, possibly after a long partial
+run. Validation instead goes through the whole resources, reports every
+problem with the position of its record, and checks references between
+records the database would reject: duplicated indexes, friends that don't
+exist and company ids out of range.
+
+Entries are checked in a pool of worker processes. Only the references are
+sent back and resolved in this process, so nothing touches the database.
+"""
+from array import array
+from itertools import islice
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from citizens.resources.parsing import find_citizen_entry_errors, \
+    find_company_entry_errors, map_batches, CITIZEN_FIELD_CHECKS, \
+    _company_id_to_index
+
+DEFAULT_BATCH_SIZE = 1000
+
+PEOPLE = 'people'
+COMPANIES = 'companies'
+
+
+class ValidationError(NamedTuple):
+    resource: str
+    # Position of the entry in the resource, counted from 0.
+    record: int
+    message: str
+
+    def __str__(self):
+        return f'{self.resource} record {self.record}: {self.message}'
+
+
+class _BatchReport(NamedTuple):
+    """References found in a batch of citizen entries by a worker."""
+    errors: List[Tuple[int, str]]
+    # Pairs of record positions and the values they refer to.
+    indexes: List[Tuple[int, int]]
+    companies: List[Tuple[int, int]]
+    friend_records: array
+    friend_indexes: array
+
+
+class IndexSet:
+    """
+    Set of non-negative integers, such as citizen indexes, stored as a bitmap.
+
+    It takes a bit per index up to the largest one instead of tens of bytes
+    per member of a set. Indexes too large for the bitmap fall back to a set.
+    """
+
+    MAX_BITMAP_INDEX = 1 << 28
+
+    def __init__(self):
+        self._bitmap = bytearray()
+        self._other = set()
+
+    def add(self, index: int):
+        if 0 <= index < self.MAX_BITMAP_INDEX:
+            byte = index >> 3
+            if byte >= len(self._bitmap):
+                self._bitmap.extend(
+                    bytes(max(byte + 1, len(self._bitmap) * 2)
+                          - len(self._bitmap))
+                )
+            self._bitmap[byte] |= 1 << (index & 7)
+        else:
+            self._other.add(index)
+
+    def __contains__(self, index: int) -> bool:
+        if 0 <= index < self.MAX_BITMAP_INDEX:
+            byte = index >> 3
+            return byte < len(self._bitmap) \
+                and bool(self._bitmap[byte] & 1 << (index & 7))
+        return index in self._other
+
+
+def validate_resources(companies_data: Iterable[dict],
+                       people_data: Iterable[dict],
+                       batch_size: int = DEFAULT_BATCH_SIZE,
+                       workers: int = 1) -> List[ValidationError]:
+    """Return every problem found in the resources, in the order of records."""
+    errors = []
+    company_indexes = validate_companies(companies_data, errors)
+    validate_people(people_data, company_indexes, errors,
+                    batch_size=batch_size, workers=workers)
+    return errors
+
+
+def validate_companies(companies_data: Iterable[dict],
+                       errors: List[ValidationError]) -> Set[int]:
+    """
+    Check company entries, appending problems to errors. Returns indexes of
+    the companies.
+    """
+    indexes = set()
+    for record, entry in enumerate(companies_data):
+        entry_errors = find_company_entry_errors(entry)
+        errors.extend(
+            ValidationError(COMPANIES, record, message)
+            for message in entry_errors
+        )
+        if entry_errors:
+            continue
+
+        if entry['index'] in indexes:
+            errors.append(ValidationError(
+                COMPANIES, record, f'duplicated index {entry["index"]}'
+            ))
+        indexes.add(entry['index'])
+    return indexes
+
+
+def validate_people(people_data: Iterable[dict],
+                    company_indexes: Optional[Set[int]],
+                    errors: List[ValidationError],
+                    batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 1):
+    """
+    Check citizen entries, appending problems to errors. Company ids aren't
+    checked when company_indexes is None.
+    """
+    citizen_indexes = IndexSet()
+    # Friends that might be defined by a later record. Resolved references
+    # are dropped whenever the arrays double in size, so only references to
+    # records that haven't been read yet take memory.
+    pending_records = array('q')
+    pending_indexes = array('q')
+    next_compaction = batch_size * 100
+
+    for report in map_batches(_check_citizen_batch,
+                              _numbered_batches(people_data, batch_size),
+                              workers):
+        errors.extend(
+            ValidationError(PEOPLE, record, message)
+            for record, message in report.errors
+        )
+        for record, index in report.indexes:
+            if index in citizen_indexes:
+                errors.append(
+                    ValidationError(PEOPLE, record, f'duplicated index {index}')
+                )
+            citizen_indexes.add(index)
+        if company_indexes is not None:
+            errors.extend(
+                ValidationError(
+                    PEOPLE, record,
+                    f'company_id {company_id} doesn\'t match any company'
+                )
+                for record, company_id in report.companies
+                if _company_id_to_index(company_id) not in company_indexes
+            )
+
+        pending_records.extend(report.friend_records)
+        pending_indexes.extend(report.friend_indexes)
+        if len(pending_records) >= next_compaction:
+            pending_records, pending_indexes = _unresolved_friends(
+                pending_records, pending_indexes, citizen_indexes
+            )
+            next_compaction = max(next_compaction, len(pending_records) * 2)
+
+    pending_records, pending_indexes = _unresolved_friends(
+        pending_records, pending_indexes, citizen_indexes
+    )
+    errors.extend(
+        ValidationError(PEOPLE, record,
+                        f'friend index {index} doesn\'t match any citizen')
+        for record, index in zip(pending_records, pending_indexes)
+    )
+    # Errors found at the end belong to earlier records.
+    errors.sort(key=lambda error: (error.resource != COMPANIES, error.record))
+
+
+def _numbered_batches(iterable: Iterable,
+                      batch_size: int) -> Iterable[Tuple[int, List]]:
+    """Batches of entries together with the position of their first entry."""
+    iterator = iter(iterable)
+    first_record = 0
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield first_record, batch
+        first_record += len(batch)
+
+
+def _check_citizen_batch(numbered_batch: Tuple[int, List[dict]]) \
+        -> _BatchReport:
+    first_record, entries = numbered_batch
+    report = _BatchReport([], [], [], array('q'), array('q'))
+    for record, entry in enumerate(entries, start=first_record):
+        entry_errors = find_citizen_entry_errors(entry)
+        report.errors.extend((record, message) for message in entry_errors)
+        if not isinstance(entry, dict):
+            continue
+
+        # References of valid fields are still collected from malformed
+        # entries, so a single bad field doesn't cascade into errors of
+        # other records.
+        if _is_valid(entry, 'index', entry_errors):
+            report.indexes.append((record, entry['index']))
+        if _is_valid(entry, 'company_id', entry_errors):
+            report.companies.append((record, entry['company_id']))
+        if _is_valid(entry, 'friends', entry_errors):
+            for friend in entry['friends']:
+                report.friend_records.append(record)
+                report.friend_indexes.append(friend['index'])
+    return report
+
+
+def _is_valid(entry: dict, field: str, entry_errors: List[str]) -> bool:
+    if field not in entry:
+        return False
+    if not entry_errors:
+        return True
+    try:
+        CITIZEN_FIELD_CHECKS[field](entry[field])
+    except ValueError:
+        return False
+    return True
+
+
+def _unresolved_friends(records: array, indexes: array,
+                        citizen_indexes: IndexSet) -> Tuple[array, array]:
+    unresolved_records = array('q')
+    unresolved_indexes = array('q')
+    for record, index in zip(records, indexes):
+        if index not in citizen_indexes:
+            unresolved_records.append(record)
+            unresolved_indexes.append(index)
+    return unresolved_records, unresolved_indexes
@@ -4,3 +4,39 @@ NON_EXISTENT_RESOURCE_ERROR_PAYLOAD = {'detail': "Resource with given id doesn't
 
 # Concrete
 NO_EMPLOYEES_ERROR_PAYLOAD = {'detail': 'This company has no employees'}
+COMMON_FRIENDS_CITIZEN_COUNT_ERROR_PAYLOAD = {
+    'detail': 'Between 2 and 100 different citizen ids are required'
+}
+INVALID_COMMON_FRIENDS_FILTER_ERROR_PAYLOAD = {
+    'detail': 'Invalid filter, alive must be true or false and ages integers'
+}
+INVALID_BATCH_PAYLOAD_ERROR_PAYLOAD = {
+    'detail': 'A list of citizen ids is required, e.g. {"ids": [1, 2]}'
+}
+INVALID_EMPLOYEES_PAGE_ERROR_PAYLOAD = {
+    'detail': 'Invalid page, after must be an integer and limit between 1 '
+              'and 10000'
+}
+INVALID_CITIZEN_LIST_FILTER_ERROR_PAYLOAD = {
+    'detail': 'Invalid filter or page, alive must be true or false, ages, '
+              'company, gender_code and after integers and limit between 1 '
+              'and 1000'
+}
+BATCH_CITIZEN_COUNT_ERROR_PAYLOAD = {
+    'detail': 'Between 1 and 2000 different citizen ids are required'
+}
+# In place of details of citizens of a batch that don't exist.
+NON_EXISTENT_CITIZEN_MARKER = {
+    **NON_EXISTENT_RESOURCE_ERROR_PAYLOAD,
+    'status': 404,
+}
+
+# Limits
+MAX_COMMON_FRIENDS_CITIZENS = 100
+MAX_BATCH_CITIZENS = 2000
+DEFAULT_CITIZENS_PAGE_SIZE = 100
+MAX_CITIZENS_PAGE_SIZE = 1000
+DEFAULT_EMPLOYEES_PAGE_SIZE = 1000
+MAX_EMPLOYEES_PAGE_SIZE = 10000
+# Employees read at once by streamed responses.
+EMPLOYEES_STREAM_CHUNK_SIZE = 2000
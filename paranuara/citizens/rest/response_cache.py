@@ -0,0 +1,187 @@
+"""
+Cache of API responses.
+
+The API only serves data of the dataset, which changes with its generation
+(see DatasetGeneration), so responses are cached under the generation they
+were built from and never need to be invalidated: once an import, purge or
+swap bumps the generation, older entries are just no longer looked up.
+The current generation is kept in memory (see
+DatasetGeneration.current_token), so cached responses are served without
+any query.
+
+Entries are kept in a bounded in-process LRU tier and, when configured, in
+a cache shared by all processes, e.g. memcached. Responses carry strong
+ETags computed from their content, so a client revalidating with
+If-None-Match gets a 304 without the response being built again.
+
+Concurrent requests missing the same entry are coalesced (see
+single_flight): one request builds the response and the others wait for
+it, so a burst of requests for a popular response runs its queries once.
+"""
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from citizens.generations import track_previous_generations
+from citizens.models import DatasetGeneration
+from citizens.single_flight import SingleFlight
+
+DEFAULT_MAX_ENTRIES = 1024
+
+# Prefix of keys in the shared cache.
+SHARED_KEY_PREFIX = 'citizens-response'
+
+Key = Tuple[UUID, str, str]
+
+
+class CachedResponse(NamedTuple):
+    status: int
+    data: object
+    etag: str
+
+
+class ResponseCache:
+    """
+    Two tier cache of responses: an LRU of at most max_entries responses in
+    this process in front of the optional Django cache named shared_cache.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 shared_cache: Optional[str] = None):
+        self.max_entries = max_entries
+        self.shared_cache = shared_cache
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Key) -> Optional[CachedResponse]:
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+                return response
+
+        if self.shared_cache is None:
+            return None
+        response = caches[self.shared_cache].get(_get_shared_key(key))
+        if response is not None:
+            response = CachedResponse(*response)
+            self._set_local(key, response)
+        return response
+
+    def set(self, key: Key, response: CachedResponse):
+        self._set_local(key, response)
+        if self.shared_cache is not None:
+            caches[self.shared_cache].set(_get_shared_key(key),
+                                          tuple(response))
+
+    def clear(self):
+        """Drop responses of this process. The shared cache is kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _set_local(self, key: Key, response: CachedResponse):
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _get_shared_key(key: Key) -> str:
+    # Keys of memcached are limited in length and characters.
+    generation, media_type, uri = key
+    digest = hashlib.sha1(f'{media_type} {uri}'.encode()).hexdigest()
+    return f'{SHARED_KEY_PREFIX}:{generation.hex}:{digest}'
+
+
+def _get_response_cache() -> ResponseCache:
+    options = getattr(settings, 'CITIZENS_RESPONSE_CACHE', {})
+    return ResponseCache(
+        max_entries=options.get('MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+        shared_cache=options.get('SHARED_CACHE'),
+    )
+
+
+response_cache = _get_response_cache()
+
+# Responses being built, by their keys in the response cache.
+responses_in_flight = SingleFlight()
+
+
+def cache_response(view: Callable) -> Callable:
+    """
+    Cache responses of a view method taking the request as its first
+    argument, and answer If-None-Match requests matching their ETag with
+    304 Not Modified. Concurrent requests for the same response share a
+    single call of the view.
+    """
+    @functools.wraps(view)
+    def get(request, *args, **kwargs):
+        key = (
+            DatasetGeneration.current_token(),
+            request.accepted_media_type,
+            request.build_absolute_uri(),
+        )
+        cached = response_cache.get(key)
+        if cached is None:
+            cached = responses_in_flight.do(
+                key, lambda: _build_response(key, view, request, args, kwargs)
+            )
+
+        headers = {'ETag': cached.etag}
+        if _matches(request.META.get('HTTP_IF_NONE_MATCH'), cached.etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers=headers)
+        return Response(cached.data, status=cached.status, headers=headers)
+
+    return get
+
+
+def _build_response(key: Key, view: Callable, request, args,
+                    kwargs) -> CachedResponse:
+    # The response might have been cached by a leader that finished just
+    # before this one started.
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with track_previous_generations() as previous_generations:
+        response = view(request, *args, **kwargs)
+    cached = CachedResponse(
+        response.status_code, response.data,
+        _get_etag(request.accepted_media_type, response.data)
+    )
+    # Responses built while structures of the current generation are being
+    # rebuilt aren't responses of the current generation yet.
+    if response.status_code < status.HTTP_500_INTERNAL_SERVER_ERROR \
+            and not previous_generations.used:
+        response_cache.set(key, cached)
+    return cached
+
+
+def _get_etag(media_type: str, data) -> str:
+    content = JSONRenderer().render(data)
+    digest = hashlib.sha1(media_type.encode() + b'\n' + content).hexdigest()
+    return f'"{digest}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison.
+    etags = [tag[2:] if tag.startswith('W/') else tag
+             for tag in parse_etags(if_none_match)]
+    return '*' in etags or etag in etags
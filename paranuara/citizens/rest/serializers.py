@@ -1,6 +1,12 @@
+from typing import Iterable, List, Tuple
+
+from django.db.models import Prefetch
+from django.urls import reverse
 from rest_framework import serializers
 
-from citizens.models import Citizen, Food, Company
+from citizens.models import Citizen, Food
+
+CITIZEN_ID_PLACEHOLDER = 'citizen-id'
 
 
 class CitizenSerializer(serializers.ModelSerializer):
@@ -13,18 +19,24 @@ class CitizenSerializer(serializers.ModelSerializer):
     vegetables = serializers.SerializerMethodField()
 
     @staticmethod
-    def get_fruits(citizen):
-        return list(
-            citizen.favourite_food.filter(type=Food.FRUIT)
-                .values_list('name', flat=True)
+    def setup_eager_loading(queryset):
+        """
+        Load the favourite food of all serialized citizens in one query, so
+        it's split into fruits and vegetables in memory.
+        """
+        return queryset.only('name', 'age').prefetch_related(
+            Prefetch('favourite_food',
+                     queryset=Food.objects.only('name', 'type')
+                     .order_by('name'))
         )
 
+    @staticmethod
+    def get_fruits(citizen):
+        return _get_favourite_food_names(citizen, Food.FRUIT)
+
     @staticmethod
     def get_vegetables(citizen):
-        return list(
-            citizen.favourite_food.filter(type=Food.VEGETABLE)
-                .values_list('name', flat=True)
-        )
+        return _get_favourite_food_names(citizen, Food.VEGETABLE)
 
 
 class MultiCitizenSerializer(serializers.ModelSerializer):
@@ -35,19 +47,46 @@ class MultiCitizenSerializer(serializers.ModelSerializer):
     username = serializers.ReadOnlyField(source="name")
     address = serializers.SerializerMethodField()
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load only the serialized columns, joined with the address."""
+        return queryset.select_related('address').only(
+            'name', 'age', 'phone_number',
+            'address__street_address', 'address__city_name',
+            'address__state_name', 'address__post_code',
+        )
+
     def get_address(self, citizen):
         return str(citizen.address)
 
 
-class CompanySerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Company
-        fields = ['employees']
-
-    employees = serializers.HyperlinkedRelatedField(
-        source='citizen_set',
-        view_name='single_citizen',
-        many=True,
-        read_only=True,
-        lookup_url_kwarg='citizen_id',
+class CitizenListSerializer(MultiCitizenSerializer):
+    class Meta(MultiCitizenSerializer.Meta):
+        fields = ['id'] + MultiCitizenSerializer.Meta.fields
+
+
+def get_citizen_url_parts(request) -> Tuple[str, str]:
+    """
+    Prefix and suffix of absolute URLs of citizen details around the id, so
+    URLs of many citizens are built without resolving the URL for each.
+    """
+    url = request.build_absolute_uri(
+        reverse('single_citizen', kwargs={'citizen_id': CITIZEN_ID_PLACEHOLDER})
     )
+    prefix, suffix = url.rsplit(CITIZEN_ID_PLACEHOLDER, 1)
+    return prefix, suffix
+
+
+def get_citizen_urls(citizen_ids: Iterable[int],
+                     url_parts: Tuple[str, str]) -> List[str]:
+    prefix, suffix = url_parts
+    return [f'{prefix}{citizen_id}{suffix}' for citizen_id in citizen_ids]
+
+
+def _get_favourite_food_names(citizen, food_type):
+    # all() is served from the prefetched food when the citizen was loaded
+    # with CitizenSerializer.setup_eager_loading().
+    return [
+        food.name for food in citizen.favourite_food.all()
+        if food.type == food_type
+    ]
@@ -0,0 +1,58 @@
+import uuid
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from citizens.rest.response_cache import CachedResponse, ResponseCache
+
+SHARED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared-responses',
+    },
+}
+
+
+class ResponseCacheTest(SimpleTestCase):
+    GENERATION = uuid.uuid4()
+
+    def get_key(self, path):
+        return self.GENERATION, 'application/json', f'http://testserver{path}'
+
+    def get_response(self, number):
+        return CachedResponse(200, {'number': number}, f'"{number}"')
+
+    def test_least_recently_used_responses_are_dropped(self):
+        cache = ResponseCache(max_entries=2)
+        cache.set(self.get_key('/1'), self.get_response(1))
+        cache.set(self.get_key('/2'), self.get_response(2))
+        cache.get(self.get_key('/1'))
+
+        cache.set(self.get_key('/3'), self.get_response(3))
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get(self.get_key('/1')), self.get_response(1))
+        self.assertIsNone(cache.get(self.get_key('/2')))
+        self.assertEqual(cache.get(self.get_key('/3')), self.get_response(3))
+
+    def test_responses_are_keyed_by_generation(self):
+        cache = ResponseCache()
+        cache.set(self.get_key('/1'), self.get_response(1))
+
+        self.assertIsNone(
+            cache.get((uuid.uuid4(), 'application/json',
+                       'http://testserver/1'))
+        )
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_shared_cache_is_shared_by_processes(self):
+        caches['shared'].clear()
+        cache = ResponseCache(shared_cache='shared')
+        cache.set(self.get_key('/1'), self.get_response(1))
+        other_process_cache = ResponseCache(shared_cache='shared')
+
+        self.assertEqual(other_process_cache.get(self.get_key('/1')),
+                         self.get_response(1))
+        # Responses found in the shared cache are kept locally as well.
+        self.assertEqual(len(other_process_cache), 1)
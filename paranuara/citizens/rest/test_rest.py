@@ -1,13 +1,115 @@
+import json
+import time
+import uuid
 from collections import OrderedDict
+from unittest import mock
+from urllib.parse import urlencode
 
 from django.urls import reverse
 from django.utils.timezone import now
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 
-from citizens.models import Citizen, Food, Address, EyeColor, Company
+from citizens.generations import clear_generation_caches, \
+    wait_for_rebuilds
+from citizens.models import Citizen, Food, Address, EyeColor, Company, \
+    DatasetGeneration, Tag
 from citizens.rest.constants import INVALID_ID_FORMAT_ERROR_PAYLOAD, \
-    NON_EXISTENT_RESOURCE_ERROR_PAYLOAD, NO_EMPLOYEES_ERROR_PAYLOAD
+    NON_EXISTENT_RESOURCE_ERROR_PAYLOAD, NO_EMPLOYEES_ERROR_PAYLOAD, \
+    COMMON_FRIENDS_CITIZEN_COUNT_ERROR_PAYLOAD, \
+    INVALID_COMMON_FRIENDS_FILTER_ERROR_PAYLOAD, \
+    INVALID_BATCH_PAYLOAD_ERROR_PAYLOAD, BATCH_CITIZEN_COUNT_ERROR_PAYLOAD, \
+    NON_EXISTENT_CITIZEN_MARKER, INVALID_EMPLOYEES_PAGE_ERROR_PAYLOAD, \
+    INVALID_CITIZEN_LIST_FILTER_ERROR_PAYLOAD
+from citizens.rest.response_cache import response_cache, \
+    responses_in_flight
+from citizens.rest.serializers import MultiCitizenSerializer
+
+
+class CitizenListViewTest(APITestCase):
+
+    def setUp(self):
+        brown = EyeColor.objects.create(color_name='brown')
+        self.company = Company.objects.create(name='TEST COMPANY')
+        self.citizens = [
+            _create_test_citizen(id=1, age=20),
+            _create_test_citizen(id=2, age=35, eye_color=brown),
+            _create_test_citizen(id=3, age=35, eye_color=brown,
+                                 company=self.company, gender_code=2),
+            _create_test_citizen(id=4, age=35, eye_color=brown,
+                                 company=self.company, has_died=True),
+            _create_test_citizen(id=5, age=50, company=self.company),
+        ]
+        tag = Tag.objects.create(name='tag')
+        for citizen in self.citizens[1:4]:
+            citizen.tags.add(tag)
+        DatasetGeneration.bump()
+
+    def get_ids(self, url):
+        return [citizen['id'] for citizen in self.client.get(url).data['citizens']]
+
+    def test_happy_path(self):
+        response = self.client.get(_get_citizens_url())
+
+        self.assertEqual(
+            response.data,
+            {
+                'citizens': [
+                    OrderedDict([('id', citizen.id),
+                                 *MultiCitizenSerializer(citizen).data.items()])
+                    for citizen in self.citizens
+                ],
+                'next': None,
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_filters(self):
+        for filters, expected_ids in [
+            ({'eye_color': 'brown'}, [2, 3, 4]),
+            ({'alive': 'false'}, [4]),
+            ({'min_age': 30, 'max_age': 40}, [2, 3, 4]),
+            ({'company': self.company.id}, [3, 4, 5]),
+            ({'gender_code': 2}, [3]),
+            ({'tag': 'tag'}, [2, 3, 4]),
+            ({'eye_color': 'brown', 'alive': 'true', 'min_age': 30,
+              'max_age': 40, 'company': self.company.id, 'tag': 'tag'}, [3]),
+        ]:
+            with self.subTest(filters):
+                self.assertEqual(self.get_ids(_get_citizens_url(**filters)),
+                                 expected_ids)
+
+    def test_pages_follow_next_links(self):
+        pages = []
+        url = _get_citizens_url(limit=2, min_age=30)
+        while url:
+            response = self.client.get(url)
+            pages.append([citizen['id'] for citizen in response.data['citizens']])
+            url = response.data['next']
+
+        self.assertEqual(pages, [[2, 3], [4, 5]])
+
+    def test_query_count_does_not_depend_on_citizens(self):
+        for citizen_id in range(6, 56):
+            _create_test_citizen(id=citizen_id)
+
+        # The dataset generation and the citizens with addresses.
+        with self.assertNumQueries(2):
+            response = self.client.get(_get_citizens_url(limit=1000))
+
+        self.assertEqual(len(response.data['citizens']), 55)
+
+    def test_invalid_filter(self):
+        for filters in [{'alive': 'maybe'}, {'min_age': 'old'},
+                        {'company': 'ACME'}, {'gender_code': 'f'},
+                        {'after': 'first'}, {'limit': 1001}]:
+            with self.subTest(filters):
+                response = self.client.get(_get_citizens_url(**filters))
+
+                self.assertEqual(response.data,
+                                 INVALID_CITIZEN_LIST_FILTER_ERROR_PAYLOAD)
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
 
 
 class SingleCitizenViewTest(APITestCase):
@@ -26,6 +128,7 @@ class SingleCitizenViewTest(APITestCase):
                 Food.objects.create(name='mushroom', type='other')
             ]
         )
+        DatasetGeneration.bump()
 
     def test_happy_path(self):
         url = _get_single_citizen_url(self.citizen.id)
@@ -43,6 +146,20 @@ class SingleCitizenViewTest(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_food_is_loaded_in_one_query(self):
+        self.citizen.favourite_food.add(
+            Food.objects.create(name='banana', type='fruit'),
+            Food.objects.create(name='celery', type='vegetable'),
+        )
+        url = _get_single_citizen_url(self.citizen.id)
+
+        # The dataset generation, the citizen and all of its favourite food.
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+
+        self.assertEqual(response.data['fruits'], ['apple', 'banana'])
+        self.assertEqual(response.data['vegetables'], ['carrot', 'celery'])
+
     def test_user_does_not_exist(self):
         non_existent_citizen_id = 42
         url = _get_single_citizen_url(non_existent_citizen_id)
@@ -53,13 +170,17 @@ class SingleCitizenViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_id_in_invalid_format(self):
-        invalid_format_id = "this_is_totally_invalid"
-        url = _get_single_citizen_url(invalid_format_id)
+        for invalid_format_id in ['this_is_totally_invalid', '-1', '+1',
+                                  '1.0']:
+            with self.subTest(invalid_format_id):
+                url = _get_single_citizen_url(invalid_format_id)
 
-        response = self.client.get(url)
+                response = self.client.get(url)
 
-        self.assertEqual(response.data, INVALID_ID_FORMAT_ERROR_PAYLOAD)
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(response.data,
+                                 INVALID_ID_FORMAT_ERROR_PAYLOAD)
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
 
     def test_only_get_requests_allowed(self):
         url = _get_single_citizen_url(self.citizen.id)
@@ -72,9 +193,101 @@ class SingleCitizenViewTest(APITestCase):
                                  status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
+class CitizensBatchViewTest(APITestCase):
+
+    def setUp(self):
+        self.citizens = [
+            _create_test_citizen(id=citizen_id, name=f'Citizen {citizen_id}')
+            for citizen_id in [1, 2, 3]
+        ]
+        self.citizens[0].favourite_food.set([
+            Food.objects.create(name='apple', type='fruit'),
+            Food.objects.create(name='carrot', type='vegetable'),
+        ])
+        DatasetGeneration.bump()
+
+    def test_happy_path(self):
+        response = self.client.post(_get_citizens_batch_url(),
+                                    {'ids': [3, 42, 1, '2', 1]}, format='json')
+
+        self.assertEqual(list(response.data), ['3', '42', '1', '2'])
+        self.assertEqual(response.data['42'], NON_EXISTENT_CITIZEN_MARKER)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_details_are_the_same_as_of_single_citizen(self):
+        response = self.client.post(_get_citizens_batch_url(),
+                                    {'ids': [1, 2]}, format='json')
+
+        for citizen in self.citizens[:2]:
+            with self.subTest(citizen.id):
+                self.assertEqual(
+                    response.data[str(citizen.id)],
+                    self.client.get(_get_single_citizen_url(citizen.id)).data
+                )
+
+    def test_query_count_does_not_depend_on_citizens(self):
+        food = Food.objects.create(name='banana', type='fruit')
+        for citizen_id in range(4, 104):
+            _create_test_citizen(id=citizen_id).favourite_food.add(food)
+
+        # The citizens and their favourite food.
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                _get_citizens_batch_url(), {'ids': list(range(1, 105))},
+                format='json'
+            )
+
+        self.assertEqual(response.data['103']['fruits'], ['banana'])
+        self.assertEqual(response.data['104'], NON_EXISTENT_CITIZEN_MARKER)
+
+    def test_too_few_or_too_many_citizens(self):
+        for citizen_ids in [[], list(range(1, 2002))]:
+            with self.subTest(len(citizen_ids)):
+                response = self.client.post(_get_citizens_batch_url(),
+                                            {'ids': citizen_ids},
+                                            format='json')
+
+                self.assertEqual(response.data,
+                                 BATCH_CITIZEN_COUNT_ERROR_PAYLOAD)
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_payload(self):
+        for payload in [{}, {'ids': 1}, [1, 2]]:
+            with self.subTest(payload):
+                response = self.client.post(_get_citizens_batch_url(),
+                                            payload, format='json')
+
+                self.assertEqual(response.data,
+                                 INVALID_BATCH_PAYLOAD_ERROR_PAYLOAD)
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+    def test_id_in_invalid_format(self):
+        for citizen_id in ['this_is_totally_invalid', None, {}, 1.5, True,
+                           '1.0', '-1', -1]:
+            with self.subTest(citizen_id):
+                response = self.client.post(_get_citizens_batch_url(),
+                                            {'ids': [1, citizen_id]},
+                                            format='json')
+
+                self.assertEqual(response.data,
+                                 INVALID_ID_FORMAT_ERROR_PAYLOAD)
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+    def test_only_post_requests_allowed(self):
+        response = self.client.get(_get_citizens_batch_url())
+
+        self.assertEqual(response.status_code,
+                         status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
 class TwoCitizensViewTest(APITestCase):
 
     def setUp(self):
+        # Structures of earlier tests would be served while rebuilt.
+        clear_generation_caches()
         blue = EyeColor.objects.create(color_name='blue')
         brown = EyeColor.objects.create(color_name='brown')
 
@@ -140,6 +353,7 @@ class TwoCitizensViewTest(APITestCase):
         self.citizen_2.friends.add(self.citizen_3)
         self.citizen_2.friends.add(self.citizen_4)
         self.citizen_2.friends.add(self.citizen_5)
+        DatasetGeneration.bump()
 
     def test_happy_path(self):
         url = _get_two_citizens_url(self.citizen_1.id, self.citizen_2.id)
@@ -176,6 +390,28 @@ class TwoCitizensViewTest(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_query_count_does_not_depend_on_friends(self):
+        for citizen_id in range(6, 26):
+            friend = _create_test_citizen(
+                id=citizen_id, has_died=False,
+                eye_color=self.OK_COMMON_FRIEND['eye_color'],
+            )
+            self.citizen_1.friends.add(friend)
+            self.citizen_2.friends.add(friend)
+        DatasetGeneration.bump()
+        url = _get_two_citizens_url(self.citizen_1.id, self.citizen_2.id)
+        # Build the friend graph of the new generation.
+        self.client.get(url)
+        response_cache.clear()
+
+        # The two citizens and their common friends with addresses.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(
+            len(response.data['common_live_brown_eyed_friends']), 21
+        )
+
     def test_user_does_not_exist(self):
         non_existent_citizen_id = 42
         url = _get_two_citizens_url(self.citizen_1.id, non_existent_citizen_id)
@@ -205,6 +441,119 @@ class TwoCitizensViewTest(APITestCase):
                                  status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
+class CommonFriendsViewTest(APITestCase):
+
+    def setUp(self):
+        # Structures of earlier tests would be served while rebuilt.
+        clear_generation_caches()
+        brown = EyeColor.objects.create(color_name='brown')
+        self.citizens = [
+            _create_test_citizen(id=citizen_id, name=f'Citizen {citizen_id}')
+            for citizen_id in [1, 2, 3]
+        ]
+        self.friends = [
+            _create_test_citizen(id=4, age=20, eye_color=brown),
+            _create_test_citizen(id=5, age=40, eye_color=brown),
+            _create_test_citizen(id=6, age=40, eye_color=brown,
+                                 has_died=True),
+            _create_test_citizen(id=7, age=40),
+        ]
+        for citizen in self.citizens:
+            citizen.friends.set(self.friends)
+        # Only friend of the first two citizens.
+        self.citizens[0].friends.add(self.citizens[2])
+        self.citizens[1].friends.add(self.citizens[2])
+        DatasetGeneration.bump()
+
+    def test_happy_path(self):
+        url = _get_common_friends_url([1, 2, 3])
+
+        response = self.client.get(url)
+
+        self.assertEqual(
+            [citizen['username'] for citizen in response.data['citizens']],
+            ['Citizen 1', 'Citizen 2', 'Citizen 3']
+        )
+        self.assertEqual(
+            response.data['common_friends'],
+            MultiCitizenSerializer(self.friends, many=True).data
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_filters(self):
+        for filters, expected_ids in [
+            ({'eye_color': 'brown'}, [4, 5, 6]),
+            ({'eye_color': 'green'}, []),
+            ({'alive': 'true'}, [4, 5, 7]),
+            ({'alive': 'false'}, [6]),
+            ({'min_age': 30}, [5, 6, 7]),
+            ({'min_age': 30, 'max_age': 39}, []),
+            ({'eye_color': 'brown', 'alive': 'true', 'max_age': 30}, [4]),
+        ]:
+            with self.subTest(filters):
+                response = self.client.get(
+                    _get_common_friends_url([1, 2, 3], **filters)
+                )
+
+                self.assertEqual(
+                    [friend['username'] for friend in
+                     response.data['common_friends']],
+                    [self.friends[friend_id - 4].name
+                     for friend_id in expected_ids]
+                )
+
+    def test_query_count_does_not_depend_on_citizens(self):
+        for citizen_ids in [[1, 2], [1, 2, 3]]:
+            url = _get_common_friends_url(citizen_ids, eye_color='brown')
+            # Build the in-memory indexes of the generation.
+            self.client.get(url)
+            response_cache.clear()
+
+            # The citizens and their common friends.
+            with self.subTest(citizen_ids), self.assertNumQueries(2):
+                response = self.client.get(url)
+
+            self.assertEqual(len(response.data['common_friends']), 3)
+
+    def test_too_few_or_too_many_citizens(self):
+        for citizen_ids in [[], [1], [1, 1], list(range(1, 102))]:
+            with self.subTest(len(citizen_ids)):
+                response = self.client.get(_get_common_friends_url(citizen_ids))
+
+                self.assertEqual(response.data,
+                                 COMMON_FRIENDS_CITIZEN_COUNT_ERROR_PAYLOAD)
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_filter(self):
+        for filters in [{'alive': 'maybe'}, {'min_age': 'old'}]:
+            with self.subTest(filters):
+                response = self.client.get(
+                    _get_common_friends_url([1, 2], **filters)
+                )
+
+                self.assertEqual(response.data,
+                                 INVALID_COMMON_FRIENDS_FILTER_ERROR_PAYLOAD)
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+    def test_user_does_not_exist(self):
+        url = _get_common_friends_url([1, 2, 42])
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.data, NON_EXISTENT_RESOURCE_ERROR_PAYLOAD)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_id_in_invalid_format(self):
+        url = _get_common_friends_url([1, 'this_is_totally_invalid'])
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.data, INVALID_ID_FORMAT_ERROR_PAYLOAD)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class CompaniesViewTest(APITestCase):
 
     def setUp(self):
@@ -225,6 +574,7 @@ class CompaniesViewTest(APITestCase):
 
         self.citizen_1 = _create_test_citizen(**self.TEST_CITIZEN_1_DATA)
         self.citizen_2 = _create_test_citizen(**self.TEST_CITIZEN_2_DATA)
+        DatasetGeneration.bump()
 
     def test_happy_path(self):
         url = _get_company_employees_url(self.company.id)
@@ -237,11 +587,83 @@ class CompaniesViewTest(APITestCase):
                 'employees': [
                     'http://testserver' + _get_single_citizen_url(self.citizen_1.id),
                     'http://testserver' + _get_single_citizen_url(self.citizen_2.id),
-                ]
+                ],
+                'next': None,
             }
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_pages_follow_next_links(self):
+        for citizen_id in range(3, 8):
+            _create_test_citizen(id=citizen_id, company=self.company)
+        DatasetGeneration.bump()
+
+        pages = []
+        url = _get_company_employees_url(self.company.id) + '?limit=3'
+        while url:
+            response = self.client.get(url)
+            pages.append([employee.rsplit('/', 2)[1]
+                          for employee in response.data['employees']])
+            url = response.data['next']
+
+        self.assertEqual(pages, [['1', '2', '3'], ['4', '5', '6'], ['7']])
+
+    def test_query_count_does_not_depend_on_employees(self):
+        for citizen_id in range(3, 53):
+            _create_test_citizen(id=citizen_id, company=self.company)
+        url = _get_company_employees_url(self.company.id)
+
+        # The dataset generation, the company and ids of its employees.
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.data['employees']), 52)
+
+    def test_page_after_last_employee_is_empty(self):
+        url = _get_company_employees_url(self.company.id) + '?after=2'
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.data, {'employees': [], 'next': None})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_page(self):
+        for query in ['after=first', 'limit=0', 'limit=10001', 'limit=many']:
+            with self.subTest(query):
+                url = _get_company_employees_url(self.company.id) + '?' + query
+
+                response = self.client.get(url)
+
+                self.assertEqual(response.data,
+                                 INVALID_EMPLOYEES_PAGE_ERROR_PAYLOAD)
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+    def test_streamed_employees_are_the_same_as_a_page(self):
+        for citizen_id in range(3, 8):
+            _create_test_citizen(id=citizen_id, company=self.company)
+        url = _get_company_employees_url(self.company.id)
+        page = self.client.get(url).data
+
+        # Employees are read in several chunks.
+        with mock.patch('citizens.rest.views.EMPLOYEES_STREAM_CHUNK_SIZE', 2):
+            response = self.client.get(url + '?stream=true')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(
+            json.loads(b''.join(response.streaming_content)), page
+        )
+
+    def test_streamed_company_has_not_employees(self):
+        empty_company = Company.objects.create(name='EMPTY COMPANY')
+        url = _get_company_employees_url(empty_company.id) + '?stream=true'
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.data, NO_EMPLOYEES_ERROR_PAYLOAD)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
     def test_company_has_not_employees(self):
         empty_company = Company.objects.create(name='EMPTY COMPANY')
         url = _get_company_employees_url(empty_company.id)
@@ -280,6 +702,130 @@ class CompaniesViewTest(APITestCase):
                                  status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
+class CachedResponsesTest(APITestCase):
+
+    def setUp(self):
+        self.citizen = _create_test_citizen(id=1, name='Test Citizen 1')
+        DatasetGeneration.bump()
+        self.url = _get_single_citizen_url(self.citizen.id)
+
+    def test_response_is_cached_within_generation(self):
+        response = self.client.get(self.url)
+        Citizen.objects.filter(id=self.citizen.id).update(name='Renamed')
+
+        # The current generation is kept in memory.
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(self.url)
+
+        self.assertEqual(cached_response.data, response.data)
+        self.assertEqual(cached_response['ETag'], response['ETag'])
+
+    def test_only_missing_responses_are_built_in_flight(self):
+        leaders = responses_in_flight.leaders
+
+        self.client.get(self.url)
+        self.client.get(self.url)
+
+        self.assertEqual(responses_in_flight.leaders, leaders + 1)
+
+    def test_response_is_rebuilt_when_generation_changes(self):
+        response = self.client.get(self.url)
+        Citizen.objects.filter(id=self.citizen.id).update(name='Renamed')
+        DatasetGeneration.bump()
+
+        new_response = self.client.get(self.url)
+
+        self.assertEqual(new_response.data['username'], 'Renamed')
+        self.assertNotEqual(new_response['ETag'], response['ETag'])
+
+    def test_generation_bumped_by_other_process_is_seen_once_kept_expires(
+            self):
+        response = self.client.get(self.url)
+        Citizen.objects.filter(id=self.citizen.id).update(name='Renamed')
+        # Like a bump committed by another process.
+        DatasetGeneration.objects.filter(id=1).update(token=uuid.uuid4())
+
+        self.assertEqual(self.client.get(self.url).data, response.data)
+        expired_at = time.monotonic() + DatasetGeneration.TOKEN_TTL
+        with mock.patch('citizens.models.time.monotonic',
+                        return_value=expired_at):
+            new_response = self.client.get(self.url)
+
+        self.assertEqual(new_response.data['username'], 'Renamed')
+
+    def test_not_modified_when_etag_matches(self):
+        etag = self.client.get(self.url)['ETag']
+
+        for if_none_match in [etag, f'W/{etag}', f'"other", {etag}', '*']:
+            with self.subTest(if_none_match), self.assertNumQueries(0):
+                response = self.client.get(self.url,
+                                           HTTP_IF_NONE_MATCH=if_none_match)
+
+                self.assertEqual(response.status_code,
+                                 status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response.content, b'')
+
+    def test_modified_when_etag_does_not_match(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['username'], 'Test Citizen 1')
+
+    def test_etag_only_depends_on_content(self):
+        etag = self.client.get(self.url)['ETag']
+        DatasetGeneration.bump()
+
+        self.assertEqual(self.client.get(self.url)['ETag'], etag)
+
+
+class PreviousGenerationResponsesTest(APITransactionTestCase):
+
+    def setUp(self):
+        clear_generation_caches()
+        self.citizens = [
+            _create_test_citizen(id=citizen_id, name=f'Citizen {citizen_id}')
+            for citizen_id in [1, 2, 3]
+        ]
+        DatasetGeneration.bump()
+        self.url = _get_common_friends_url([1, 2])
+
+    def test_responses_built_while_rebuilding_are_not_cached(self):
+        self.client.get(self.url)
+        self.citizens[0].friends.add(self.citizens[2])
+        self.citizens[1].friends.add(self.citizens[2])
+        DatasetGeneration.bump()
+
+        # Built from the friend graph of the previous generation.
+        response = self.client.get(self.url)
+        wait_for_rebuilds()
+        new_response = self.client.get(self.url)
+
+        self.assertEqual(response.data['common_friends'], [])
+        self.assertEqual(
+            [friend['username']
+             for friend in new_response.data['common_friends']],
+            ['Citizen 3']
+        )
+
+
+class ResponseStatsViewTest(APITestCase):
+
+    def test_reports_coalescing_of_responses(self):
+        citizen = _create_test_citizen(id=1)
+        DatasetGeneration.bump()
+        leaders = responses_in_flight.leaders
+        self.client.get(_get_single_citizen_url(citizen.id))
+
+        response = self.client.get(reverse('response_stats'))
+
+        self.assertEqual(response.data['coalescing']['leaders'], leaders + 1)
+        self.assertEqual(set(response.data['coalescing']),
+                         {'leaders', 'followers', 'in_flight', 'hit_rate'})
+        self.assertGreaterEqual(response.data['response_cache']['entries'], 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
 # Test helper methods below.
 # Might be extracted to a separate module if they are to be reused.
 
@@ -301,12 +847,12 @@ def _create_test_citizen(**kwargs):
         'balance_in_cents': 0,
         'eye_color': eye_color,
         'phone_number': '+1 (123) 456 789',
-        'address': Address.objects.create(
+        'address': Address.objects.get_or_create(
             street_address='1 Street',
             city_name='City',
             state_name='State',
             post_code='2017'
-        ),
+        )[0],
         **kwargs
     }
 
@@ -317,6 +863,14 @@ def _get_single_citizen_url(citizen_id):
     return reverse('single_citizen', kwargs={"citizen_id": citizen_id})
 
 
+def _get_citizens_url(**query_params):
+    return f"{reverse('citizens')}?{urlencode(query_params)}"
+
+
+def _get_citizens_batch_url():
+    return reverse('citizens_batch')
+
+
 def _get_two_citizens_url(citizen_a_id, citizen_b_id):
     return reverse(
         'two_citizens',
@@ -324,5 +878,13 @@ def _get_two_citizens_url(citizen_a_id, citizen_b_id):
     )
 
 
+def _get_common_friends_url(citizen_ids, **filters):
+    query = urlencode({
+        'ids': ','.join(str(citizen_id) for citizen_id in citizen_ids),
+        **filters
+    })
+    return f"{reverse('common_friends')}?{query}"
+
+
 def _get_company_employees_url(company_id):
     return reverse('company_employees', kwargs={"company_id": company_id})
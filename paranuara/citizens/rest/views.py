@@ -1,26 +1,86 @@
+import json
+from collections import OrderedDict
+
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
 from citizens.models import Citizen, Company
 from citizens.rest.constants import INVALID_ID_FORMAT_ERROR_PAYLOAD, \
-    NO_EMPLOYEES_ERROR_PAYLOAD
+    NO_EMPLOYEES_ERROR_PAYLOAD, COMMON_FRIENDS_CITIZEN_COUNT_ERROR_PAYLOAD, \
+    INVALID_COMMON_FRIENDS_FILTER_ERROR_PAYLOAD, MAX_COMMON_FRIENDS_CITIZENS, \
+    INVALID_BATCH_PAYLOAD_ERROR_PAYLOAD, BATCH_CITIZEN_COUNT_ERROR_PAYLOAD, \
+    NON_EXISTENT_CITIZEN_MARKER, MAX_BATCH_CITIZENS, \
+    INVALID_EMPLOYEES_PAGE_ERROR_PAYLOAD, DEFAULT_EMPLOYEES_PAGE_SIZE, \
+    MAX_EMPLOYEES_PAGE_SIZE, EMPLOYEES_STREAM_CHUNK_SIZE, \
+    INVALID_CITIZEN_LIST_FILTER_ERROR_PAYLOAD, DEFAULT_CITIZENS_PAGE_SIZE, \
+    MAX_CITIZENS_PAGE_SIZE
 from citizens.rest.constants import NON_EXISTENT_RESOURCE_ERROR_PAYLOAD
+from citizens.rest.response_cache import cache_response, response_cache, \
+    responses_in_flight
 from citizens.rest.serializers import CitizenSerializer, MultiCitizenSerializer, \
-    CompanySerializer
-from citizens.use_cases import get_common_live_brown_eyed_friends
+    CitizenListSerializer, get_citizen_url_parts, get_citizen_urls
+from citizens.use_cases import get_common_live_brown_eyed_friends, \
+    get_common_friends, get_citizens
+
+
+class CitizenListView(APIView):
+    """
+    Citizens in the order of their ids, optionally filtered by eye_color,
+    alive (true or false), min_age, max_age, company, gender_code and tag,
+    which can be given several times. Citizens come in pages of up to
+    ?limit= citizens with ids greater than ?after=, the next page is linked
+    by next.
+    """
+
+    @staticmethod
+    @cache_response
+    def get(request):
+        try:
+            filters = _get_citizen_list_filters(request.query_params)
+            after, limit = _get_page_params(
+                request.query_params, DEFAULT_CITIZENS_PAGE_SIZE,
+                MAX_CITIZENS_PAGE_SIZE
+            )
+        except ValueError:
+            return Response(
+                data=INVALID_CITIZEN_LIST_FILTER_ERROR_PAYLOAD,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        citizens = CitizenListSerializer.setup_eager_loading(
+            get_citizens(tags=request.query_params.getlist('tag'),
+                         after=after, **filters)
+        )
+
+        # One more citizen than requested tells whether there's a next page.
+        citizens = list(citizens[:limit + 1])
+        next_url = None
+        if len(citizens) > limit:
+            citizens = citizens[:limit]
+            next_url = _get_next_page_url(request, citizens[-1].id)
+
+        data = {
+            'citizens': CitizenListSerializer(citizens, many=True).data,
+            'next': next_url,
+        }
+        return Response(data)
 
 
 class SingleCitizenDetailsView(APIView):
     @staticmethod
+    @cache_response
     def get(request, citizen_id):
         error_response = _validate_params_format(citizen_id)
 
         if error_response:
             return error_response
 
+        citizens = CitizenSerializer.setup_eager_loading(Citizen.objects)
         try:
-            citizen = Citizen.objects.get(id=citizen_id)
+            citizen = citizens.get(id=citizen_id)
         except Citizen.DoesNotExist:
             return Response(
                 data=NON_EXISTENT_RESOURCE_ERROR_PAYLOAD,
@@ -31,15 +91,65 @@ class SingleCitizenDetailsView(APIView):
         return Response(serializer.data)
 
 
+class CitizensBatchView(APIView):
+    """
+    Details of citizens whose ids are posted as {"ids": [1, 2, 3]}, by id in
+    the order of the ids. Details are the same as of SingleCitizenDetailsView
+    and citizens that don't exist get a 404 marker instead.
+    """
+
+    @staticmethod
+    def post(request):
+        citizen_ids = request.data.get('ids') \
+            if isinstance(request.data, dict) else None
+        if not isinstance(citizen_ids, list):
+            return Response(
+                data=INVALID_BATCH_PAYLOAD_ERROR_PAYLOAD,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not all(map(_is_id, citizen_ids)):
+            return Response(
+                data=INVALID_ID_FORMAT_ERROR_PAYLOAD,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        citizen_ids = list(dict.fromkeys(map(int, citizen_ids)))
+        if not 1 <= len(citizen_ids) <= MAX_BATCH_CITIZENS:
+            return Response(
+                data=BATCH_CITIZEN_COUNT_ERROR_PAYLOAD,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        citizens = CitizenSerializer.setup_eager_loading(
+            Citizen.objects.filter(id__in=citizen_ids)
+        )
+        citizens_by_id = {citizen.id: citizen for citizen in citizens}
+
+        data = OrderedDict(
+            (
+                str(citizen_id),
+                CitizenSerializer(citizens_by_id[citizen_id]).data
+                if citizen_id in citizens_by_id
+                else NON_EXISTENT_CITIZEN_MARKER
+            )
+            for citizen_id in citizen_ids
+        )
+        return Response(data)
+
+
 class TwoCitizensDetailsView(APIView):
     @staticmethod
+    @cache_response
     def get(request, citizen_a_id, citizen_b_id):
         error_response = _validate_params_format(citizen_a_id, citizen_b_id)
 
         if error_response:
             return error_response
 
-        citizens = Citizen.objects.filter(id__in=[citizen_a_id, citizen_b_id])
+        citizens = MultiCitizenSerializer.setup_eager_loading(
+            Citizen.objects.filter(id__in=[citizen_a_id, citizen_b_id])
+        )
         if len(citizens) != 2:
             return Response(
                 data=NON_EXISTENT_RESOURCE_ERROR_PAYLOAD,
@@ -48,7 +158,9 @@ class TwoCitizensDetailsView(APIView):
 
         citizens_serializer = MultiCitizenSerializer(citizens, many=True)
 
-        common_friends = get_common_live_brown_eyed_friends(*citizens)
+        common_friends = MultiCitizenSerializer.setup_eager_loading(
+            get_common_live_brown_eyed_friends(*citizens)
+        )
         common_friends_serializer = MultiCitizenSerializer(common_friends, many=True)
 
         data = {
@@ -59,39 +171,255 @@ class TwoCitizensDetailsView(APIView):
         return Response(data)
 
 
-class CompanyEmployeesView(APIView):
+class CommonFriendsView(APIView):
+    """
+    Common friends of all citizens given as comma separated ids, e.g.
+    ?ids=1,2,3, optionally filtered by eye_color, alive (true or false),
+    min_age and max_age.
+    """
+
     @staticmethod
-    def get(request, company_id):
-        error_response = _validate_params_format(company_id)
+    @cache_response
+    def get(request):
+        citizen_ids = [
+            citizen_id for citizen_id in
+            request.query_params.get('ids', '').split(',') if citizen_id
+        ]
+        error_response = _validate_params_format(*citizen_ids)
 
         if error_response:
             return error_response
 
+        citizen_ids = set(map(int, citizen_ids))
+        if not 2 <= len(citizen_ids) <= MAX_COMMON_FRIENDS_CITIZENS:
+            return Response(
+                data=COMMON_FRIENDS_CITIZEN_COUNT_ERROR_PAYLOAD,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
-            company = Company.objects.get(id=company_id)
-        except Company.DoesNotExist:
+            filters = _get_common_friends_filters(request.query_params)
+        except ValueError:
             return Response(
-                data=NON_EXISTENT_RESOURCE_ERROR_PAYLOAD,
-                status=status.HTTP_404_NOT_FOUND
+                data=INVALID_COMMON_FRIENDS_FILTER_ERROR_PAYLOAD,
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-        if not company.citizen_set.exists():
+        citizens = MultiCitizenSerializer.setup_eager_loading(
+            Citizen.objects.filter(id__in=citizen_ids)
+        )
+        if len(citizens) != len(citizen_ids):
             return Response(
-                data=NO_EMPLOYEES_ERROR_PAYLOAD,
-                status=status.HTTP_204_NO_CONTENT
+                data=NON_EXISTENT_RESOURCE_ERROR_PAYLOAD,
+                status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = CompanySerializer(company, context={'request': request})
-        return Response(serializer.data)
+        common_friends = MultiCitizenSerializer.setup_eager_loading(
+            get_common_friends(citizens, **filters)
+        )
+
+        data = {
+            'citizens': MultiCitizenSerializer(citizens, many=True).data,
+            'common_friends':
+                MultiCitizenSerializer(common_friends, many=True).data,
+        }
+
+        return Response(data)
+
+
+class CompanyEmployeesView(APIView):
+    """
+    Links to details of employees of a company in the order of their ids,
+    in pages of up to ?limit= employees with ids greater than ?after=. The
+    next page is linked by next. With ?stream=true all the employees are
+    streamed in a single response instead.
+    """
+
+    @staticmethod
+    def get(request, company_id):
+        if request.query_params.get('stream', '').lower() == 'true':
+            return _stream_company_employees(request, company_id)
+        return _get_company_employees_page(request, company_id)
+
+
+@cache_response
+def _get_company_employees_page(request, company_id):
+    error_response = _validate_params_format(company_id)
+
+    if error_response:
+        return error_response
+
+    try:
+        after, limit = _get_page_params(
+            request.query_params, DEFAULT_EMPLOYEES_PAGE_SIZE,
+            MAX_EMPLOYEES_PAGE_SIZE
+        )
+    except ValueError:
+        return Response(
+            data=INVALID_EMPLOYEES_PAGE_ERROR_PAYLOAD,
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if not Company.objects.filter(id=company_id).exists():
+        return Response(
+            data=NON_EXISTENT_RESOURCE_ERROR_PAYLOAD,
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    # One more employee than requested tells whether there's a next page.
+    employee_ids = list(_get_employee_ids(company_id, after, limit + 1))
+    if not employee_ids and after is None:
+        return Response(
+            data=NO_EMPLOYEES_ERROR_PAYLOAD,
+            status=status.HTTP_204_NO_CONTENT
+        )
+
+    next_url = None
+    if len(employee_ids) > limit:
+        employee_ids = employee_ids[:limit]
+        next_url = _get_next_page_url(request, employee_ids[-1])
+
+    data = {
+        'employees': get_citizen_urls(employee_ids,
+                                      get_citizen_url_parts(request)),
+        'next': next_url,
+    }
+    return Response(data)
+
+
+class ResponseStatsView(APIView):
+    """
+    Usage of the response cache and coalescing of responses built by
+    requests in flight, in the process serving the request.
+    """
+
+    @staticmethod
+    def get(request):
+        data = {
+            'response_cache': {
+                'entries': len(response_cache),
+                'max_entries': response_cache.max_entries,
+            },
+            'coalescing': responses_in_flight.stats(),
+        }
+        return Response(data)
+
+
+def _stream_company_employees(request, company_id):
+    error_response = _validate_params_format(company_id)
+
+    if error_response:
+        return error_response
+
+    if not Company.objects.filter(id=company_id).exists():
+        return Response(
+            data=NON_EXISTENT_RESOURCE_ERROR_PAYLOAD,
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    if not Citizen.objects.filter(company_id=company_id).exists():
+        return Response(
+            data=NO_EMPLOYEES_ERROR_PAYLOAD,
+            status=status.HTTP_204_NO_CONTENT
+        )
+
+    return StreamingHttpResponse(
+        _generate_employees_json(company_id, get_citizen_url_parts(request)),
+        content_type='application/json'
+    )
+
+
+def _generate_employees_json(company_id, url_parts):
+    """
+    JSON of all the employees, the same as of a single page of them, read
+    in chunks so only a chunk of employees is held in memory at a time.
+    """
+    yield '{"employees":['
+    after = None
+    while True:
+        employee_ids = list(_get_employee_ids(company_id, after,
+                                              EMPLOYEES_STREAM_CHUNK_SIZE))
+        if not employee_ids:
+            break
+        separator = '' if after is None else ','
+        yield separator + ','.join(
+            map(json.dumps, get_citizen_urls(employee_ids, url_parts))
+        )
+        after = employee_ids[-1]
+    yield '],"next":null}'
+
+
+def _get_employee_ids(company_id, after, limit):
+    employees = Citizen.objects.filter(company_id=company_id)
+    if after is not None:
+        employees = employees.filter(id__gt=after)
+    return employees.order_by('id').values_list('id', flat=True)[:limit]
+
+
+def _get_page_params(query_params, default_limit, max_limit):
+    """
+    The id pages start after and their size limit, raising ValueError on
+    invalid values.
+    """
+    after = None
+    if 'after' in query_params:
+        after = int(query_params['after'])
+    limit = int(query_params.get('limit', default_limit))
+    if not 1 <= limit <= max_limit:
+        raise ValueError(f'Invalid limit {limit}')
+    return after, limit
+
+
+def _get_next_page_url(request, last_id):
+    return replace_query_param(request.build_absolute_uri(), 'after', last_id)
+
+
+def _get_citizen_list_filters(query_params):
+    """
+    Filters of the citizen list other than tags, raising ValueError on
+    invalid values.
+    """
+    # Common friends are filtered by the same attributes.
+    filters = _get_common_friends_filters(query_params)
+    if 'company' in query_params:
+        filters['company_id'] = int(query_params['company'])
+    if 'gender_code' in query_params:
+        filters['gender_code'] = int(query_params['gender_code'])
+    return filters
+
+
+def _get_common_friends_filters(query_params):
+    """Filters of common friends, raising ValueError on invalid values."""
+    filters = {}
+    if 'eye_color' in query_params:
+        filters['eye_color'] = query_params['eye_color']
+    if 'alive' in query_params:
+        alive = query_params['alive'].lower()
+        if alive not in ['true', 'false']:
+            raise ValueError(f'Invalid alive filter {alive}')
+        filters['has_died'] = alive == 'false'
+    for age_filter in ['min_age', 'max_age']:
+        if age_filter in query_params:
+            filters[age_filter] = int(query_params[age_filter])
+    return filters
+
+
+def _is_id(value):
+    """
+    Non-negative integers and strings of decimal digits. Values int() would
+    convert as well, like 1.5, true, '-1' or ' 1', aren't ids.
+    """
+    if isinstance(value, str):
+        return value.isascii() and value.isdecimal()
+    return isinstance(value, int) and not isinstance(value, bool) \
+        and value >= 0
 
 
 def _validate_params_format(*args):
-    """All parameters must be integers"""
+    """All parameters must be ids"""
 
     for param in args:
-        try:
-            int(param)
-        except ValueError:
+        if not _is_id(param):
             return Response(
                 data=INVALID_ID_FORMAT_ERROR_PAYLOAD,
                 status=status.HTTP_400_BAD_REQUEST
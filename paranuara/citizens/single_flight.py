@@ -0,0 +1,75 @@
+"""
+Coalescing of identical computations running at the same time.
+
+The first thread asking for a key becomes its leader and computes it, while
+threads asking for the same key before the leader finishes follow it: they
+wait and get the leader's result, or its exception, instead of computing it
+again. Nothing is kept once the computation finishes, so later calls compute
+the key anew; caching results is up to the caller.
+"""
+import threading
+from typing import Callable, Dict, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Group of computations coalesced by their keys."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        # Numbers of calls that computed their key and that waited for
+        # another call computing it.
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key: Hashable, function: Callable[[], T]) -> T:
+        """Return function(), shared with concurrent calls of the key."""
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of calls that got the result of another call."""
+        calls = self.leaders + self.followers
+        return self.followers / calls if calls else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'leaders': self.leaders,
+            'followers': self.followers,
+            'in_flight': len(self._calls),
+            'hit_rate': self.hit_rate,
+        }
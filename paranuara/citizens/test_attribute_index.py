@@ -0,0 +1,75 @@
+from django.test import TransactionTestCase
+
+from citizens.attribute_index import get_attribute_index
+from citizens.generations import clear_generation_caches, \
+    wait_for_rebuilds
+from citizens.models import DatasetGeneration
+from citizens.resources import test_importers
+from citizens.resources.importers import import_companies, import_people
+
+TEST_CITIZEN_ENTRY = test_importers.CitizenImporterTest.TEST_CITIZEN_ENTRY
+
+
+class AttributeIndexTest(TransactionTestCase):
+
+    def setUp(self):
+        # Structures of earlier tests would be served while rebuilt.
+        clear_generation_caches()
+        import_companies([{'index': 0, 'company': 'A'},
+                          {'index': 1, 'company': 'B'}])
+        self.import_citizens([
+            {'index': 0, 'eyeColor': 'brown', 'company_id': 1,
+             'tags': ['a', 'b']},
+            {'index': 1, 'eyeColor': 'blue', 'company_id': 2, 'tags': ['b'],
+             'has_died': True},
+            {'index': 2, 'eyeColor': 'brown', 'company_id': 2, 'tags': []},
+        ])
+
+    @staticmethod
+    def import_citizens(entries):
+        import_people([
+            {
+                **TEST_CITIZEN_ENTRY,
+                'has_died': False,
+                '_id': f'id-{entry["index"]}',
+                'guid': f'guid-{entry["index"]}',
+                'friends': [],
+                **entry,
+            }
+            for entry in entries
+        ])
+        DatasetGeneration.bump()
+
+    def test_bitmaps_of_attributes(self):
+        index = get_attribute_index()
+
+        self.assertEqual(list(index.with_eye_color('brown')), [0, 2])
+        self.assertEqual(list(index.with_has_died(False)), [0, 2])
+        self.assertEqual(list(index.in_company(1)), [1, 2])
+        self.assertEqual(list(index.with_tag('b')), [0, 1])
+        self.assertEqual(list(index.with_eye_color('green')), [])
+        self.assertEqual(
+            list(index.with_eye_color('brown') & index.in_company(1)), [2]
+        )
+
+    def test_index_is_rebuilt_when_generation_changes(self):
+        get_attribute_index()
+
+        self.import_citizens([{'index': 3, 'eyeColor': 'brown',
+                               'company_id': 1, 'tags': ['b']}])
+
+        get_attribute_index()
+        wait_for_rebuilds()
+        index = get_attribute_index()
+        self.assertEqual(list(index.with_eye_color('brown')), [0, 2, 3])
+        self.assertEqual(list(index.with_tag('b')), [0, 1, 3])
+
+    def test_memory_usage(self):
+        # Every bitmap holds a single sparse container of 2 byte members.
+        self.assertEqual(get_attribute_index().memory_usage(), {
+            'eye_colors': 3 * 2,
+            'has_died': 3 * 2,
+            'companies': 3 * 2,
+            'tags': 3 * 2,
+            'total': 4 * 3 * 2,
+        })
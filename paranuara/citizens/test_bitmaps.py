@@ -0,0 +1,46 @@
+import random
+
+from django.test import SimpleTestCase
+
+from citizens.bitmaps import Bitmap, BITMAP_CONTAINER_BYTES
+
+
+class BitmapTest(SimpleTestCase):
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.sets = {
+            'empty': set(),
+            'sparse': set(rng.sample(range(300000), 50)),
+            'dense': set(rng.sample(range(70000), 30000)),
+            'mixed': set(range(0, 65536, 2)) | {70000, 200000, 200001},
+        }
+
+    def test_matches_set_operations(self):
+        for name, values in self.sets.items():
+            bitmap = Bitmap.from_sorted(sorted(values))
+            with self.subTest(name):
+                self.assertEqual(list(bitmap), sorted(values))
+                self.assertEqual(len(bitmap), len(values))
+                self.assertEqual(bool(bitmap), bool(values))
+
+            for other_name, other_values in self.sets.items():
+                other_bitmap = Bitmap.from_sorted(sorted(other_values))
+                with self.subTest(f'{name} & {other_name}'):
+                    self.assertEqual(list(bitmap & other_bitmap),
+                                     sorted(values & other_values))
+
+    def test_contains(self):
+        bitmap = Bitmap.from_sorted(sorted(self.sets['mixed']))
+
+        self.assertEqual(
+            [value in bitmap for value in [0, 1, 65534, 70000, 70001, 10 ** 9]],
+            [True, False, True, True, False, False]
+        )
+
+    def test_dense_containers_are_bitmaps(self):
+        sparse = Bitmap.from_sorted([1, 5, 9])
+        dense = Bitmap.from_sorted(range(0, 65536, 2))
+
+        self.assertEqual(sparse.nbytes, 3 * 2)
+        self.assertEqual(dense.nbytes, BITMAP_CONTAINER_BYTES)
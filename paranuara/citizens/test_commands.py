@@ -0,0 +1,277 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import TransactionTestCase
+
+from citizens.generations import clear_generation_caches
+from citizens.models import Address, Citizen, Company, EyeColor, Food, Tag, \
+    DatasetGeneration, ImportCheckpoint
+from citizens.resources import test_importers
+from citizens.resources.importers import import_companies, import_people, \
+    get_data_from_json_file, DEFAULT_BATCH_SIZE
+from citizens.resources.pg_copy import DEFAULT_COPY_BATCH_SIZE
+
+TEST_CITIZEN_ENTRY = test_importers.CitizenImporterTest.TEST_CITIZEN_ENTRY
+
+
+class PurgeDatabaseCommandTest(TransactionTestCase):
+
+    def setUp(self):
+        import_companies([{'index': 57, 'company': 'SOME_COMPANY'}])
+        import_people([{**TEST_CITIZEN_ENTRY, 'friends': [{'index': 0}]}])
+
+    def test_removes_all_data(self):
+        output = StringIO()
+
+        call_command('purge_database', stdout=output)
+
+        for model in [Citizen, Citizen.friends.through, Citizen.tags.through,
+                      Citizen.favourite_food.through, Address, Company,
+                      EyeColor, Food, Tag]:
+            with self.subTest(model.__name__):
+                self.assertEqual(model.objects.exists(), False)
+        self.assertIn('Purged the database in', output.getvalue())
+
+    def test_removes_import_checkpoints(self):
+        ImportCheckpoint.objects.create(resource='people.json',
+                                        resource_size=1,
+                                        phase=ImportCheckpoint.CITIZENS)
+
+        call_command('purge_database', stdout=StringIO())
+
+        self.assertEqual(ImportCheckpoint.objects.exists(), False)
+
+    def test_starts_new_dataset_generation(self):
+        generation = DatasetGeneration.current()
+
+        call_command('purge_database', stdout=StringIO())
+
+        self.assertEqual(DatasetGeneration.current().number,
+                         generation.number + 1)
+
+    @skipUnless(connection.vendor == 'postgresql',
+                "Only TRUNCATE on PostgreSQL resets sequences")
+    def test_sequences_are_reset(self):
+        call_command('purge_database', stdout=StringIO())
+
+        tag = Tag.objects.create(name='new_tag')
+
+        self.assertEqual(tag.id, 1)
+
+
+class GenerateDatasetCommandTest(TransactionTestCase):
+
+    def test_generated_resources_can_be_imported(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('generate_dataset', output_dir, citizens=30,
+                         companies=2, stdout=StringIO())
+
+            import_companies(get_data_from_json_file(
+                os.path.join(output_dir, 'companies.json')
+            ))
+            import_people(get_data_from_json_file(
+                os.path.join(output_dir, 'people.json')
+            ))
+
+        self.assertEqual(Company.objects.count(), 2)
+        self.assertEqual(Citizen.objects.count(), 30)
+
+
+class BenchmarkImportCommandTest(TransactionTestCase):
+
+    def test_reports_stages_as_json(self):
+        output = StringIO()
+        token = DatasetGeneration.current().token
+
+        with tempfile.TemporaryDirectory() as resources_dir:
+            call_command('generate_dataset', resources_dir, citizens=30,
+                         companies=2, stdout=StringIO())
+            call_command('benchmark_import', resources_dir, interactive=False,
+                         methods=['orm', 'incremental'], stdout=output)
+
+        results = json.loads(output.getvalue())
+        self.assertEqual(results['people'], 30)
+        self.assertEqual(
+            [stage['stage'] for stage in results['stages']],
+            ['parse_people', 'orm.purge', 'orm.import_companies',
+             'orm.import_people', 'incremental.import_people']
+        )
+        orm_import = results['stages'][3]
+        self.assertEqual(orm_import['rows'], 30)
+        self.assertGreater(orm_import['queries'], 0)
+        self.assertNotIn('peak_rss_kb', orm_import)
+        self.assertGreater(results['peak_rss_kb'], 0)
+        self.assertEqual(Citizen.objects.count(), 30)
+        # Bumped by the purge and after the import of every method.
+        self.assertNotEqual(DatasetGeneration.current().token, token)
+        self.assertEqual(DatasetGeneration.current().number, 3)
+
+
+class IndexStatsCommandTest(TransactionTestCase):
+
+    def test_reports_memory_usage_as_json(self):
+        import_companies([{'index': 57, 'company': 'SOME_COMPANY'}])
+        import_people([{**TEST_CITIZEN_ENTRY, 'friends': [{'index': 0}]}])
+        output = StringIO()
+
+        call_command('index_stats', stdout=output)
+
+        stats = json.loads(output.getvalue())
+        self.assertEqual(stats['friend_graph']['citizens'], 1)
+        self.assertEqual(stats['friend_graph']['friendships'], 1)
+        self.assertGreater(stats['friend_graph']['bytes'], 0)
+        self.assertEqual(stats['attribute_index']['bytes']['eye_colors'], 2)
+
+
+class CommonFriendCountsCommandTest(TransactionTestCase):
+
+    def setUp(self):
+        # Structures of earlier tests would be served while rebuilt.
+        clear_generation_caches()
+        import_companies([{'index': 57, 'company': 'SOME_COMPANY'}])
+        friends = {0: [2, 3], 1: [2, 3], 2: [0, 1], 3: [0, 1, 4], 4: [3]}
+        import_people([
+            {
+                **TEST_CITIZEN_ENTRY,
+                'index': index,
+                '_id': f'id-{index}',
+                'guid': f'guid-{index}',
+                'has_died': index == 3,
+                'friends': [{'index': friend} for friend in friend_indexes],
+            }
+            for index, friend_indexes in friends.items()
+        ])
+        DatasetGeneration.bump()
+
+    def call_command(self, cohort, **options):
+        output = StringIO()
+        with tempfile.NamedTemporaryFile(mode='w') as file:
+            file.write(cohort)
+            file.flush()
+            call_command('common_friend_counts', file.name, stdout=output,
+                         **options)
+        return output.getvalue()
+
+    def test_writes_counts_of_every_pair_as_csv(self):
+        output = self.call_command('0, 1, 3\n4\n')
+
+        self.assertEqual(output, (
+            'citizen_a_id,citizen_b_id,common_friends\n'
+            '0,1,2\n'
+            '0,4,1\n'
+            '1,4,1\n'
+        ))
+
+    def test_writes_top_pairs_of_filtered_friends(self):
+        output = self.call_command('0 1 2 3 4', alive=True, top=2)
+
+        self.assertEqual(output, (
+            'citizen_a_id,citizen_b_id,common_friends\n'
+            '2,3,2\n'
+            '0,1,1\n'
+        ))
+
+    def test_rejects_unknown_citizens(self):
+        with self.assertRaisesMessage(CommandError,
+                                      'Unknown citizen ids: 5, 404'):
+            self.call_command('0 5 404')
+
+
+class ImportResourcesCommandTest(TransactionTestCase):
+
+    def test_reads_compressed_ndjson_from_standard_input(self):
+        people = ''.join(
+            json.dumps({**TEST_CITIZEN_ENTRY, 'friends': [], 'index': index,
+                        '_id': f'id-{index}', 'guid': f'guid-{index}'}) + '\n'
+            for index in range(3)
+        )
+        stdin = io.TextIOWrapper(io.BytesIO(gzip.compress(people.encode())))
+        output = StringIO()
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json') as file:
+            json.dump([{'index': 57, 'company': 'SOME_COMPANY'}], file)
+            file.flush()
+            with mock.patch('sys.stdin', stdin):
+                call_command('import_resources', people='-',
+                             companies=file.name, stream=True, stdout=output)
+
+        self.assertEqual(json.loads(output.getvalue())['rows'], 4)
+        self.assertEqual(DatasetGeneration.current().number, 1)
+        self.assertEqual(
+            list(Citizen.objects.values_list('id', flat=True)),
+            [0, 1, 2]
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', "COPY needs PostgreSQL")
+    def test_batch_size_defaults_depend_on_import_method(self):
+        module = 'citizens.management.commands.import_resources'
+        with mock.patch(f'{module}.import_companies'), \
+                mock.patch(f'{module}.import_people') as import_people_mock, \
+                mock.patch(f'{module}.copy_people') as copy_people_mock:
+            call_command('import_resources', stdout=StringIO())
+            call_command('import_resources', copy=True, stdout=StringIO())
+            call_command('import_resources', copy=True, batch_size=50,
+                         stdout=StringIO())
+
+        self.assertEqual(import_people_mock.call_args.kwargs['batch_size'],
+                         DEFAULT_BATCH_SIZE)
+        self.assertEqual(
+            [call.kwargs['batch_size']
+             for call in copy_people_mock.call_args_list],
+            [DEFAULT_COPY_BATCH_SIZE, 50]
+        )
+
+    def test_incremental_import_without_changes_keeps_generation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            people_filename = os.path.join(directory, 'people.json')
+            companies_filename = os.path.join(directory, 'companies.json')
+            with open(people_filename, 'w') as file:
+                json.dump([{**TEST_CITIZEN_ENTRY, 'friends': []}], file)
+            with open(companies_filename, 'w') as file:
+                json.dump([{'index': 57, 'company': 'SOME_COMPANY'}], file)
+
+            for _ in range(2):
+                output = StringIO()
+                call_command('import_resources', people=people_filename,
+                             companies=companies_filename, incremental=True,
+                             stdout=output)
+
+        changes = json.loads(output.getvalue())['changes']
+        self.assertEqual(changes['people'], {'created': 0, 'updated': 0,
+                                             'unchanged': 1, 'deleted': 0})
+        self.assertEqual(DatasetGeneration.current().number, 1)
+
+    def test_validate_only_reports_errors_without_touching_database(self):
+        people = [
+            {**TEST_CITIZEN_ENTRY, 'friends': [{'index': 5}]},
+            {**TEST_CITIZEN_ENTRY, 'index': 1, '_id': 'id-1', 'guid': 'guid-1',
+             'friends': [], 'company_id': 1},
+        ]
+        output = StringIO()
+
+        with tempfile.TemporaryDirectory() as directory:
+            people_filename = os.path.join(directory, 'people.json')
+            companies_filename = os.path.join(directory, 'companies.json')
+            with open(people_filename, 'w') as file:
+                json.dump(people, file)
+            with open(companies_filename, 'w') as file:
+                json.dump([{'index': 57, 'company': 'SOME_COMPANY'}], file)
+
+            with self.assertNumQueries(0), \
+                    self.assertRaisesMessage(CommandError,
+                                             'Found 2 errors in the resources'):
+                call_command('import_resources', people=people_filename,
+                             companies=companies_filename, validate_only=True,
+                             stdout=output)
+
+        self.assertEqual(output.getvalue().splitlines(), [
+            "people record 0: friend index 5 doesn't match any citizen",
+            "people record 1: company_id 1 doesn't match any company",
+        ])
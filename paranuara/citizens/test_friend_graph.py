@@ -0,0 +1,123 @@
+import random
+from array import array
+from itertools import combinations
+
+from django.test import SimpleTestCase, TransactionTestCase
+
+from citizens.bitmaps import Bitmap
+from citizens.friend_graph import get_friend_graph, intersect_sorted
+from citizens.generations import clear_generation_caches, \
+    wait_for_rebuilds
+from citizens.models import DatasetGeneration
+from citizens.resources import test_importers
+from citizens.resources.importers import import_companies, import_people
+
+TEST_CITIZEN_ENTRY = test_importers.CitizenImporterTest.TEST_CITIZEN_ENTRY
+
+
+class FriendGraphTest(TransactionTestCase):
+
+    def setUp(self):
+        # Structures of earlier tests would be served while rebuilt.
+        clear_generation_caches()
+        import_companies([{'index': 57, 'company': 'SOME_COMPANY'}])
+        self.import_citizens({
+            # Ids with gaps are looked up by bisection.
+            0: [3, 5, 7, 9],
+            3: [0, 7, 9, 12],
+            5: [0, 3, 7, 9, 12],
+            7: [],
+            9: [0],
+            12: [],
+        })
+
+    @staticmethod
+    def import_citizens(friends):
+        import_people([
+            {
+                **TEST_CITIZEN_ENTRY,
+                'index': index,
+                '_id': f'id-{index}',
+                'guid': f'guid-{index}',
+                'friends': [{'index': friend} for friend in friend_indexes],
+            }
+            for index, friend_indexes in friends.items()
+        ])
+        DatasetGeneration.bump()
+
+    def test_common_friends(self):
+        graph = get_friend_graph()
+
+        self.assertEqual(list(graph.get_friend_ids(5)), [0, 3, 7, 9, 12])
+        self.assertEqual(list(graph.get_friend_ids(7)), [])
+        self.assertEqual(list(graph.get_common_friend_ids([0, 5])), [3, 7, 9])
+        self.assertEqual(list(graph.get_common_friend_ids([3, 5, 0])), [7, 9])
+        self.assertEqual(list(graph.get_common_friend_ids([0, 5, 9])), [])
+        self.assertEqual(list(graph.get_common_friend_ids([0, 404])), [])
+        self.assertEqual(list(graph.get_friend_bitmap(3)), [0, 7, 9, 12])
+
+    def test_common_friend_counts_of_every_pair(self):
+        graph = get_friend_graph()
+        citizen_ids = [12, 0, 3, 5, 9, 404]
+
+        counts = list(graph.iter_common_friend_counts(citizen_ids))
+
+        expected = [
+            (a, b, len(graph.get_common_friend_ids([a, b])))
+            for a, b in combinations(sorted(citizen_ids), 2)
+            if graph.get_common_friend_ids([a, b])
+        ]
+        self.assertEqual(counts, expected)
+        self.assertEqual(counts[:2], [(0, 3, 2), (0, 5, 3)])
+
+    def test_common_friend_counts_only_count_filtered_friends(self):
+        graph = get_friend_graph()
+
+        counts = graph.iter_common_friend_counts(
+            [0, 3, 5], friends_filter=Bitmap.from_sorted([7, 12])
+        )
+
+        self.assertEqual(list(counts), [(0, 3, 1), (0, 5, 1), (3, 5, 2)])
+
+    def test_graph_is_reused_within_generation(self):
+        graph = get_friend_graph()
+
+        # The current generation is kept in memory.
+        with self.assertNumQueries(0):
+            self.assertIs(get_friend_graph(), graph)
+
+    def test_graph_is_rebuilt_when_generation_changes(self):
+        previous_graph = get_friend_graph()
+        self.assertEqual(list(previous_graph.get_friend_ids(20)), [])
+
+        self.import_citizens({20: [7, 21], 21: [20]})
+
+        # The previous graph is served until the new one is built.
+        self.assertIs(get_friend_graph(), previous_graph)
+        wait_for_rebuilds()
+        graph = get_friend_graph()
+        self.assertEqual(list(graph.get_friend_ids(20)), [7, 21])
+        self.assertEqual(list(graph.get_common_friend_ids([0, 20])), [7])
+
+    def test_memory_per_friendship(self):
+        graph = get_friend_graph()
+
+        self.assertEqual(len(graph.friends), 14)
+        self.assertEqual(graph.nbytes, 14 * 4 + 6 * 12 + 8)
+
+
+class IntersectSortedTest(SimpleTestCase):
+
+    def test_matches_set_intersection(self):
+        rng = random.Random(0)
+        for a_size, b_size in [(0, 5), (5, 0), (3, 1000), (1, 1000),
+                               (200, 300), (1, 1)]:
+            with self.subTest(a_size=a_size, b_size=b_size):
+                a = sorted(rng.sample(range(2000), a_size))
+                b = sorted(rng.sample(range(2000), b_size))
+                values = array('i', [-1] + b + [-1])
+
+                self.assertEqual(
+                    intersect_sorted(a, values, 1, 1 + b_size),
+                    sorted(set(a) & set(b))
+                )
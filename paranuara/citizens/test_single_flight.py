@@ -0,0 +1,75 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from citizens.single_flight import SingleFlight
+
+FOLLOWERS = 5
+
+
+class SingleFlightTest(SimpleTestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.computations = 0
+        self.release = threading.Event()
+
+    def compute(self):
+        self.computations += 1
+        self.release.wait()
+        return self.computations
+
+    def run_concurrently(self, function):
+        """Call function in a leader and followers, return their results."""
+        results = []
+
+        def call():
+            try:
+                results.append(self.flight.do('key', function))
+            except Exception as error:
+                results.append(error)
+
+        threads = [threading.Thread(target=call)
+                   for _ in range(FOLLOWERS + 1)]
+        for thread in threads:
+            thread.start()
+        # Let the leader finish once everyone follows it.
+        while self.flight.followers < FOLLOWERS:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_calls_share_the_result(self):
+        results = self.run_concurrently(self.compute)
+
+        self.assertEqual(results, [1] * (FOLLOWERS + 1))
+        self.assertEqual(self.computations, 1)
+        self.assertEqual(self.flight.stats(), {
+            'leaders': 1,
+            'followers': FOLLOWERS,
+            'in_flight': 0,
+            'hit_rate': FOLLOWERS / (FOLLOWERS + 1),
+        })
+
+    def test_concurrent_calls_share_the_error(self):
+        def fail():
+            self.compute()
+            raise ValueError('failed')
+
+        results = self.run_concurrently(fail)
+
+        self.assertEqual(len(results), FOLLOWERS + 1)
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+        self.assertEqual(self.computations, 1)
+
+    def test_later_calls_compute_again(self):
+        self.release.set()
+
+        self.assertEqual(self.flight.do('key', self.compute), 1)
+        self.assertEqual(self.flight.do('key', self.compute), 2)
+        self.assertEqual(self.flight.do('other', self.compute), 3)
+        self.assertEqual(self.flight.hit_rate, 0)
@@ -0,0 +1,84 @@
+from unittest import skipUnless
+
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+
+from citizens.models import DatasetGeneration, Tag
+from citizens.resources import test_importers
+from citizens.resources.importers import import_companies, import_people
+from citizens.use_cases import get_citizens
+
+TEST_CITIZEN_ENTRY = test_importers.CitizenImporterTest.TEST_CITIZEN_ENTRY
+
+
+class GetCitizensTest(TransactionTestCase):
+
+    def setUp(self):
+        import_companies([{'index': 57, 'company': 'SOME_COMPANY'},
+                          {'index': 58, 'company': 'OTHER_COMPANY'}])
+        import_people([
+            {
+                **TEST_CITIZEN_ENTRY,
+                'index': index,
+                '_id': f'id-{index}',
+                'guid': f'guid-{index}',
+                'age': 25 + index * 5,
+                'eyeColor': 'brown' if index % 2 else 'blue',
+                'has_died': index == 3,
+                'company_id': 58 + index % 2,
+                'tags': ['tag'] if index < 4 else [],
+                'friends': [],
+            }
+            for index in range(6)
+        ])
+        DatasetGeneration.bump()
+
+    def get_ids(self, **filters):
+        return list(get_citizens(**filters).values_list('id', flat=True))
+
+    def test_filters(self):
+        # Resources refer to the company with index 58 as company_id 59.
+        company_id = 58
+        for filters, expected_ids in [
+            ({}, [0, 1, 2, 3, 4, 5]),
+            ({'eye_color': 'brown'}, [1, 3, 5]),
+            ({'has_died': True}, [3]),
+            ({'min_age': 30, 'max_age': 40}, [1, 2, 3]),
+            ({'company_id': company_id}, [1, 3, 5]),
+            ({'tags': ['tag']}, [0, 1, 2, 3]),
+            ({'tags': ['tag', 'other']}, []),
+            ({'after': 3}, [4, 5]),
+            ({'eye_color': 'brown', 'has_died': False, 'min_age': 30,
+              'company_id': company_id, 'tags': ['tag']}, [1]),
+        ]:
+            with self.subTest(filters):
+                self.assertEqual(self.get_ids(**filters), expected_ids)
+
+    @skipUnless(connection.vendor == 'postgresql',
+                "Query plans are checked on PostgreSQL")
+    def test_common_filters_use_index_scans(self):
+        Tag.objects.create(name='other')
+        for filters, index in [
+            ({'company_id': 58, 'after': 1}, 'citizen_company_id_idx'),
+            ({'eye_color': 'brown', 'min_age': 30, 'max_age': 40},
+             'citizen_eye_color_age_idx'),
+            ({'has_died': False, 'min_age': 30, 'max_age': 40},
+             'citizen_alive_age_idx'),
+            ({'has_died': True}, 'citizen_dead_idx'),
+            ({'gender_code': 1, 'min_age': 30}, 'citizen_gender_age_idx'),
+            ({'tags': ['tag']}, 'citizens_citizen_tags_tag_id'),
+        ]:
+            with self.subTest(filters):
+                plan = self.explain(get_citizens(**filters)[:100])
+
+                self.assertIn(index, plan)
+                self.assertNotIn('Seq Scan', plan)
+
+    @staticmethod
+    def explain(queryset):
+        # Tables of tests are too small for the planner to prefer indexes
+        # over reading the whole table.
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
@@ -2,16 +2,36 @@ from django.urls import path
 from citizens.rest import views
 
 urlpatterns = [
+    path(
+        'citizens/',
+        views.CitizenListView.as_view(),
+        name='citizens'
+    ),
     path(
         'citizens/<citizen_a_id>/<citizen_b_id>/',
         views.TwoCitizensDetailsView.as_view(),
         name='two_citizens'
     ),
+    path(
+        'citizens/batch/',
+        views.CitizensBatchView.as_view(),
+        name='citizens_batch'
+    ),
     path(
         'citizens/<citizen_id>/',
         views.SingleCitizenDetailsView.as_view(),
         name='single_citizen'
     ),
+    path(
+        'common_friends/',
+        views.CommonFriendsView.as_view(),
+        name='common_friends'
+    ),
+    path(
+        'response_stats/',
+        views.ResponseStatsView.as_view(),
+        name='response_stats'
+    ),
     path(
         'company_employees/<company_id>/',
         views.CompanyEmployeesView.as_view(),
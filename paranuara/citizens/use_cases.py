@@ -1,20 +1,129 @@
-from typing import Set
+import heapq
+from typing import Iterable, Optional, Sequence, Tuple
 
-from citizens.models import Citizen
+from django.db.models import QuerySet
+
+from citizens.attribute_index import get_attribute_index
+from citizens.bitmaps import Bitmap
+from citizens.friend_graph import get_friend_graph
+from citizens.models import Citizen, DatasetGeneration
 
 
 def get_common_live_brown_eyed_friends(
         citizen_a: Citizen,
         citizen_b: Citizen
-) -> Set[Citizen]:
+) -> QuerySet:
     """Get common friends of two citizens that are alive and have brown eyes."""
+    return get_common_friends([citizen_a, citizen_b], eye_color='brown',
+                              has_died=False)
+
+
+def get_common_friends(
+        citizens: Sequence[Citizen],
+        eye_color: Optional[str] = None,
+        has_died: Optional[bool] = None,
+        min_age: Optional[int] = None,
+        max_age: Optional[int] = None,
+) -> QuerySet:
+    """
+    Get friends common to all the citizens, optionally filtered by their
+    eye colour, whether they're alive and their age.
+
+    Friend lists are intersected in the in-memory friend graph and filtered
+    with the attribute bitmaps, so the database is only queried for the
+    resulting citizens. Ages are filtered by that query.
+    """
+    generation = DatasetGeneration.current_token()
+    common_friend_ids = get_friend_graph(generation).get_common_friend_ids(
+        [citizen.id for citizen in citizens]
+    )
+
+    if common_friend_ids and (eye_color is not None or has_died is not None):
+        index = get_attribute_index(generation)
+        common_friends = Bitmap.from_sorted(common_friend_ids)
+        if eye_color is not None:
+            common_friends &= index.with_eye_color(eye_color)
+        if has_died is not None:
+            common_friends &= index.with_has_died(has_died)
+        common_friend_ids = list(common_friends)
+
+    friends = Citizen.objects.filter(id__in=list(common_friend_ids))
+    if min_age is not None:
+        friends = friends.filter(age__gte=min_age)
+    if max_age is not None:
+        friends = friends.filter(age__lte=max_age)
+    return friends
+
+
+def get_citizens(
+        eye_color: Optional[str] = None,
+        has_died: Optional[bool] = None,
+        min_age: Optional[int] = None,
+        max_age: Optional[int] = None,
+        company_id: Optional[int] = None,
+        gender_code: Optional[int] = None,
+        tags: Sequence[str] = (),
+        after: Optional[int] = None,
+) -> QuerySet:
+    """
+    Get citizens with ids greater than after, if given, in the order of ids,
+    optionally filtered by their attributes. Citizens must have all the
+    tags.
+
+    Filters match the indexes of Citizen, so pages of filtered citizens are
+    read by index scans.
+    """
+    citizens = Citizen.objects.order_by('id')
+    if eye_color is not None:
+        citizens = citizens.filter(eye_color__color_name=eye_color)
+    if has_died is not None:
+        citizens = citizens.filter(has_died=has_died)
+    if min_age is not None:
+        citizens = citizens.filter(age__gte=min_age)
+    if max_age is not None:
+        citizens = citizens.filter(age__lte=max_age)
+    if company_id is not None:
+        citizens = citizens.filter(company_id=company_id)
+    if gender_code is not None:
+        citizens = citizens.filter(gender_code=gender_code)
+    for tag in tags:
+        citizens = citizens.filter(tags__name=tag)
+    if after is not None:
+        citizens = citizens.filter(id__gt=after)
+    return citizens
+
+
+def get_common_friend_counts(
+        citizen_ids: Iterable[int],
+        eye_color: Optional[str] = None,
+        has_died: Optional[bool] = None,
+        top: Optional[int] = None,
+) -> Iterable[Tuple[int, int, int]]:
+    """
+    Get numbers of common friends of every pair of the citizens, optionally
+    counting only friends with the eye colour and state of life.
 
-    filter_kwargs = {
-        'eye_color__color_name': 'brown',
-        'has_died': False
-    }
+    Pairs are (citizen_a_id, citizen_b_id, count) ordered by ids, or the
+    top pairs with most common friends in descending order of the count.
+    Pairs without common friends are left out.
+    """
+    generation = DatasetGeneration.current_token()
+    graph = get_friend_graph(generation)
 
-    a_friends = citizen_a.friends.filter(**filter_kwargs)
-    b_friends = citizen_b.friends.filter(**filter_kwargs)
+    friends_filter = None
+    if eye_color is not None or has_died is not None:
+        index = get_attribute_index(generation)
+        if eye_color is not None:
+            friends_filter = index.with_eye_color(eye_color)
+        if has_died is not None:
+            alive_filter = index.with_has_died(has_died)
+            friends_filter = alive_filter if friends_filter is None \
+                else friends_filter & alive_filter
 
-    return set(a_friends).intersection(b_friends)
+    counts = graph.iter_common_friend_counts(citizen_ids, friends_filter)
+    if top is None:
+        return counts
+    # Only the top pairs are kept while counting. Pairs with equal counts
+    # are ordered by ids.
+    return heapq.nsmallest(top, counts,
+                           key=lambda pair: (-pair[2], pair[0], pair[1]))
@@ -98,3 +98,11 @@ USE_L10N = True
 USE_TZ = True
 
 STATIC_URL = '/static/'
+
+# Cache of API responses, see citizens.rest.response_cache. SHARED_CACHE is
+# the alias of a cache in CACHES shared by all processes, e.g. memcached.
+
+CITIZENS_RESPONSE_CACHE = {
+    'MAX_ENTRIES': 1024,
+    'SHARED_CACHE': None,
+}